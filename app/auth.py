@@ -1,17 +1,21 @@
 # app/auth.py
 import logging
+import re
 from datetime import datetime, timedelta
-from typing import Optional, Union, Dict, Any
-from passlib.context import CryptContext
+from typing import Optional, Union, Dict, Any, Tuple
 from jose import JWTError, jwt
 from fastapi import Depends, HTTPException, status, Cookie, Request
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel, EmailStr, validator
 
 from .config import settings
-from .database import get_db, pwd_context
+from .database import get_async_db
+from .passwords import PasswordHasherBusy, password_hasher
 from .models.user import User
+from .principal_cache import Principal, PrincipalCache
 
 # Configure module logger
 logger = logging.getLogger(__name__)
@@ -24,6 +28,12 @@ ACCESS_TOKEN_EXPIRE_MINUTES = settings.ACCESS_TOKEN_EXPIRE_MINUTES
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
 
+# Validated tokens -> user snapshots, so authenticated requests skip the database
+principal_cache = PrincipalCache(
+    max_entries=settings.PRINCIPAL_CACHE_SIZE,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
+
 # Models
 class Token(BaseModel):
     """Token response model."""
@@ -65,18 +75,32 @@ class UserResponse(BaseModel):
         from_attributes = True
 
 # Authentication functions
-def verify_password(plain_password: str, hashed_password: str) -> bool:
-    """Verify a password against a hash."""
+def password_queue_full() -> HTTPException:
+    """503 returned when the password worker pool is saturated."""
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Server busy, please try again",
+        headers={"Retry-After": "1"}
+    )
+
+async def verify_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Verify a password against a hash; also returns a replacement hash if the cost changed."""
     try:
-        return pwd_context.verify(plain_password, hashed_password)
+        return await password_hasher.verify_and_update(plain_password, hashed_password)
+    except PasswordHasherBusy:
+        logger.warning("Password verification rejected: worker pool is full")
+        raise password_queue_full()
     except Exception as e:
         logger.error(f"Password verification error: {str(e)}")
-        return False
+        return False, None
 
-def get_password_hash(password: str) -> str:
+async def get_password_hash(password: str) -> str:
     """Generate a password hash."""
     try:
-        return pwd_context.hash(password)
+        return await password_hasher.hash(password)
+    except PasswordHasherBusy:
+        logger.warning("Password hashing rejected: worker pool is full")
+        raise password_queue_full()
     except Exception as e:
         logger.error(f"Password hashing error: {str(e)}")
         raise HTTPException(
@@ -84,22 +108,40 @@ def get_password_hash(password: str) -> str:
             detail="Error processing password"
         )
 
-def authenticate_user(db: Session, username: str, password: str) -> Union[User, bool]:
+async def authenticate_user(db: AsyncSession, username: str, password: str) -> Union[User, bool]:
     """Authenticate a user with username and password."""
     try:
-        user = User.get_by_username(db, username)
+        user = await User.get_by_username_async(db, username)
         if not user:
             logger.warning(f"Authentication failed: User '{username}' not found")
             return False
-        if not verify_password(password, user.hashed_password):
+        valid, new_hash = await verify_password(password, user.hashed_password)
+        if not valid:
             logger.warning(f"Authentication failed: Invalid password for '{username}'")
             return False
+        if not user.is_active:
+            logger.warning(f"Authentication failed: User '{username}' is inactive")
+            return False
+        if new_hash:
+            await rehash_password(db, user, new_hash)
         logger.info(f"User '{username}' authenticated successfully")
         return user
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Authentication error: {str(e)}")
         return False
 
+async def rehash_password(db: AsyncSession, user: User, new_hash: str):
+    """Store a hash produced with the current bcrypt cost; failures don't block login."""
+    try:
+        user.hashed_password = new_hash
+        await db.commit()
+        logger.info(f"Rehashed password for '{user.username}' with the configured cost")
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Password rehash failed for '{user.username}': {str(e)}")
+
 def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta] = None) -> str:
     """Create a JWT access token."""
     try:
@@ -131,16 +173,31 @@ def create_access_token(data: Dict[str, Any], expires_delta: Optional[timedelta]
 #         logger.error(f"Error decoding token: {str(e)}")
 #         return None
 
-def get_user_from_token(db: Session, token: str) -> Optional[User]:
+async def load_principal(db: AsyncSession, token: str, payload: Dict[str, Any]) -> Optional[Principal]:
+    """Load the user named by a decoded token and cache its snapshot (see PrincipalCache.put)."""
+    username = payload.get("sub")
+    if username is None:
+        return None
+    user = await User.get_by_username_async(db, username)
+    if user is None:
+        return None
+    principal = Principal.from_user(user)
+    expires_at = payload.get("exp")
+    if expires_at is not None:
+        principal_cache.put(token, principal, float(expires_at))
+    return principal
+
+async def get_user_from_token(db: AsyncSession, token: str) -> Optional[Principal]:
+    if not token:
+        return None
+    cached = principal_cache.get(token)
+    if cached is not None:
+        return cached
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username = payload.get("sub")
-        if username is None:
-            return None
-        return User.get_by_username(db, username)
+        return await load_principal(db, token, payload)
     except Exception as e:
-        import logging
-        logging.getLogger(__name__).error(f"Error decoding token: {str(e)}")
+        logger.error(f"Error decoding token: {str(e)}")
         return None
 
 # def get_token_from_cookie(access_token: Optional[str] = Cookie(None)) -> Optional[str]:
@@ -160,11 +217,11 @@ def get_token_from_request(request: Request) -> Optional[str]:
         return access_token.replace("Bearer ", "")
     return None
 
-def get_current_user(
+async def get_current_user(
     token: str = Depends(oauth2_scheme), 
     cookie_token: Optional[str] = Depends(get_token_from_cookie),
-    db: Session = Depends(get_db)
-) -> User:
+    db: AsyncSession = Depends(get_async_db)
+) -> Principal:
     """Get the current user from the JWT token."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
@@ -177,6 +234,11 @@ def get_current_user(
     if not final_token:
         logger.warning("Authentication failed: No token provided")
         raise credentials_exception
+
+    cached = principal_cache.get(final_token)
+    if cached is not None:
+        logger.debug(f"User '{cached.username}' authenticated via cached token")
+        return cached
     
     try:
         payload = jwt.decode(final_token, SECRET_KEY, algorithms=[ALGORITHM])
@@ -184,13 +246,12 @@ def get_current_user(
         if username is None:
             logger.warning("Authentication failed: Invalid token payload")
             raise credentials_exception
-        token_data = TokenData(username=username)
     except JWTError as e:
         logger.warning(f"JWT decode error: {str(e)}")
         raise credentials_exception
     
     try:
-        user = User.get_by_username(db, username=token_data.username)
+        user = await load_principal(db, final_token, payload)
         if user is None:
             logger.warning(f"Authentication failed: User from token not found")
             raise credentials_exception
@@ -200,7 +261,7 @@ def get_current_user(
         logger.error(f"User lookup error: {str(e)}")
         raise credentials_exception
 
-def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
+def get_current_active_user(current_user: Principal = Depends(get_current_user)) -> Principal:
     """Get the current user and verify that they are active."""
     if not current_user.is_active:
         logger.warning(f"Access denied: User '{current_user.username}' is inactive")
@@ -208,38 +269,69 @@ def get_current_active_user(current_user: User = Depends(get_current_user)) -> U
     return current_user
 
 # User management functions
-def create_user(db: Session, user: UserCreate) -> User:
-    """Create a new user."""
+async def deactivate_user(db: AsyncSession, user_id: int) -> bool:
+    """
+    Deactivate a user and drop their cached principals in this process.
+
+    Tokens stop working here at once; other workers reload the user, and
+    reject it, within settings.PRINCIPAL_CACHE_TTL_SECONDS.
+    """
+    try:
+        result = await db.execute(
+            update(User).where(User.id == user_id).values(is_active=False)
+        )
+        await db.commit()
+    except Exception as e:
+        await db.rollback()
+        logger.error(f"Error deactivating user {user_id}: {str(e)}")
+        raise
+    principal_cache.invalidate_user(user_id)
+    logger.info(f"User {user_id} deactivated")
+    return result.rowcount > 0
+
+async def create_user(db: AsyncSession, user: UserCreate) -> User:
+    """
+    Create a new user with a single INSERT.
+
+    Uniqueness is enforced by the database; a violated constraint is mapped
+    back to the same messages the API returned when it looked users up first.
+    """
     try:
-        # Check if user already exists
-        existing_email = User.get_by_email(db, user.email)
-        if existing_email:
-            logger.warning(f"User creation failed: Email '{user.email}' already registered")
-            raise ValueError("Email already registered")
-        
-        existing_username = User.get_by_username(db, user.username)
-        if existing_username:
-            logger.warning(f"User creation failed: Username '{user.username}' already taken")
-            raise ValueError("Username already taken")
-        
-        # Create new user
         db_user = User(
             username=user.username,
             email=user.email,
-            hashed_password=get_password_hash(user.password)
+            hashed_password=await get_password_hash(user.password)
         )
         db.add(db_user)
-        db.commit()
-        db.refresh(db_user)
+        await db.commit()
         logger.info(f"User '{user.username}' created successfully")
         return db_user
-    except ValueError as e:
-        # Re-raise validation errors for the API
-        raise HTTPException(status_code=400, detail=str(e))
+    except IntegrityError as e:
+        await db.rollback()
+        message = duplicate_user_message(e)
+        logger.warning(f"User creation failed for '{user.username}': {message}")
+        raise HTTPException(status_code=400, detail=message)
+    except HTTPException:
+        raise
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         logger.error(f"Error creating user: {str(e)}")
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail="Error creating user"
-        )
\ No newline at end of file
+        )
+
+def duplicate_user_message(error: IntegrityError) -> str:
+    """Map a unique-constraint violation on users to a user-facing message."""
+    # MySQL: "Duplicate entry '<value>' for key 'users.ix_users_email'"
+    # SQLite: "UNIQUE constraint failed: users.email"
+    detail = str(error.orig).lower()
+    # MySQL quotes the duplicate value, so only the key name after it can be trusted
+    key = re.search(r"for key '([^']*)'", detail)
+    if key is not None:
+        detail = key.group(1)
+    if re.search(r"\b(?:ix_users_|users\.)email\b", detail):
+        return "Email already registered"
+    if re.search(r"\b(?:ix_users_|users\.)username\b", detail):
+        return "Username already taken"
+    return "User already exists"
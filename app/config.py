@@ -20,33 +20,107 @@ class Settings(BaseSettings):
         SECRET_KEY: Secret key for JWT token generation
         ALGORITHM: Algorithm used for JWT
         ACCESS_TOKEN_EXPIRE_MINUTES: Token expiration time in minutes
+        PRINCIPAL_CACHE_SIZE: Maximum number of validated tokens kept in memory
+        PRINCIPAL_CACHE_TTL_SECONDS: How long a cached principal is trusted; bounds how long
+            other workers keep accepting a deactivated user
+        BCRYPT_ROUNDS: bcrypt cost; stored hashes with another cost are rehashed on login
+        PASSWORD_HASH_WORKERS: Threads dedicated to password hashing
+        PASSWORD_HASH_MAX_PENDING: Hash/verify calls allowed to queue for or run on the pool
+        PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS: How long a login or signup waits for a pool slot before a 503
+        DB_BACKEND: Database backend, "mysql" or "sqlite"
         DB_HOST: Database host address
         DB_PORT: Database port
         DB_NAME: Database name
         DB_USER: Database username
         DB_PASSWORD: Database password
+        SQLITE_PATH: Database file used when DB_BACKEND is "sqlite"
+        DB_POOL_SIZE: Connections kept open in the pool
+        DB_MAX_OVERFLOW: Extra connections allowed beyond the pool size
+        DB_POOL_TIMEOUT: Seconds to wait for a pooled connection
+        DB_POOL_RECYCLE: Seconds after which pooled connections are recycled
+        WRITE_BEHIND_MAX_QUEUE: Rows buffered for background persistence before dropping
+        WRITE_BEHIND_BATCH_SIZE: Maximum rows per background flush
+        WRITE_BEHIND_FLUSH_INTERVAL: Seconds the flusher waits to fill a batch
         OPENAI_API_KEY: Optional OpenAI API key
         LLM_MODEL: The name of the language model to use
         TAVILY_API_KEY: Optional Tavily API key for search functionality
+        TAVILY_API_URL: Tavily API base URL (point at app.search.stub_server for local runs)
+        SEARCH_BACKEND: Web search backend, "llm" (LLM-generated facts only) or "tavily"
+        SEARCH_BACKEND_TIMEOUT: Seconds allowed per backend HTTP request
+        SEARCH_CONTEXT_REUSE_THRESHOLD: Keyword overlap at which a conversation's stored search results are reused as-is
+        SEARCH_CONTEXT_EXTEND_THRESHOLD: Keyword overlap at which only the missing keywords are searched
+        SEARCH_INDEX_DIR: Directory where per-user post search indexes are persisted
+        SEARCH_INDEX_MAX_USERS: Per-user search indexes kept in memory
+        FACT_STORE_DIR: Directory of the local search fact corpus
+        FACT_STORE_MAX_AGE_DAYS: Stored facts older than this are not reused
+        FACT_STORE_MIN_COVERAGE: Fraction of query terms a stored fact must contain to be reused
+        FACT_STORE_MERGE_THRESHOLD: New facts buffered in memory before merging into the mapped index
+        DEDUP_THRESHOLD: Estimated Jaccard similarity at which a request counts as a near-duplicate
+        DEDUP_NUM_PERM: MinHash signature length
+        DEDUP_BANDS: LSH bands (DEDUP_NUM_PERM must be divisible by it)
+        DEDUP_INDEX_DIR: Directory where per-user request signatures are persisted
+        QUALITY_GATE_ENABLED: Skip the LLM critic when the local quality score is confidently high
+        QUALITY_GATE_THRESHOLD: Local score (1-10) a post needs before the critic can be skipped
+        QUALITY_GATE_MARGIN: Band above the threshold in which the critic is still called (a calibrated model's error replaces it)
+        QUALITY_MODEL_PATH: Calibrated local scorer weights written by calibrate_quality.py
+        GENERATION_CANDIDATES: Drafts requested per platform in one completion; the best by local score is refined
+        CRITIC_OUTPUT_FORMAT: Critic output, "rewrite" (full improved version) or "patch" (small edits applied locally)
+        BATCH_POLL_SECONDS: Wait between status polls of a submitted Batch API job
+        SCHEDULER_ENABLED: Run the publish scheduler in this process (enable it in exactly one)
+        SCHEDULER_TICK_SECONDS: Resolution of the publish scheduler's timing wheel
+        SCHEDULER_HORIZON_SECONDS: How far ahead scheduled posts are held in memory
+        SCHEDULER_REFILL_SECONDS: Interval between rescans for posts scheduled by other processes
+        SCHEDULER_CLAIM_LEASE_SECONDS: Unrenewed age after which a 'publishing' claim counts as abandoned
+        SCHEDULER_WORKERS: Concurrent publisher workers
         TWITTER_API_KEY: Optional Twitter API key
         TWITTER_API_SECRET: Optional Twitter API secret
+        TWITTER_ACCESS_TOKEN: OAuth 2.0 user-context access token (tweet.write) the Twitter connector posts with
         FACEBOOK_ACCESS_TOKEN: Optional Facebook access token
         LINKEDIN_ACCESS_TOKEN: Optional LinkedIn access token
         REDDIT_CLIENT_ID: Optional Reddit client ID
         REDDIT_CLIENT_SECRET: Optional Reddit client secret
+        REDDIT_USERNAME: Reddit account the script app posts as
+        REDDIT_PASSWORD: Password of that Reddit account
+        REDDIT_SUBREDDIT: Subreddit Reddit posts are submitted to
+        LINKEDIN_AUTHOR_URN: Member or organization URN LinkedIn posts are authored by
+        FACEBOOK_PAGE_ID: Facebook Page whose feed posts are published to
+        INSTAGRAM_USER_ID: Instagram business account id (uses FACEBOOK_ACCESS_TOKEN)
+        INSTAGRAM_IMAGE_URL: Image published with Instagram posts that don't carry their own
+        PUBLISH_API_BASE_URL: Send every publisher connector to this host (the mock server) instead of the real APIs
+        PUBLISH_MAX_ATTEMPTS: Attempts per publish before a post is marked failed
+        PUBLISH_TIMEOUT: Seconds per publishing HTTP request
+        TEMPLATE_BYTECODE_CACHE_DIR: Directory where compiled templates are cached between runs
+        TEMPLATE_AUTO_RELOAD: Re-check template files for changes on every render (development)
+        PAGE_CACHE_SIZE: Rendered user-independent pages kept in memory
+        METRICS_TOKEN: Bearer token required by /metrics; the endpoint is disabled (404) when unset
     """
     # Authentication settings
     SECRET_KEY: str = "YOUR_SECRET_KEY_HERE"  # Should be overridden in production
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    PRINCIPAL_CACHE_SIZE: int = 10000
+    PRINCIPAL_CACHE_TTL_SECONDS: int = 60
+    BCRYPT_ROUNDS: int = 12
+    PASSWORD_HASH_WORKERS: int = 4
+    PASSWORD_HASH_MAX_PENDING: int = 64
+    PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS: float = 2.0
     
     # Database settings
+    DB_BACKEND: str = "mysql"  # "mysql" or "sqlite" for local runs
     DB_HOST: str = "localhost"
     DB_PORT: str = "3306"
     DB_NAME: str = "ai_social_poster"
     DB_USER: str = "root"
     DB_PASSWORD: str = ""
-    
+    SQLITE_PATH: str = "ai_social_poster.db"
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: int = 30
+    DB_POOL_RECYCLE: int = 3600
+    WRITE_BEHIND_MAX_QUEUE: int = 10000
+    WRITE_BEHIND_BATCH_SIZE: int = 500
+    WRITE_BEHIND_FLUSH_INTERVAL: float = 1.0
+
     # OpenAI settings
     OPENAI_API_KEY: Optional[str] = None
     LLM_MODEL: str = "gpt-4"  # Default model, can be overridden via environment variable
@@ -55,14 +129,61 @@ class Settings(BaseSettings):
     SEARCH_API_KEY: Optional[str] = None
     SEARCH_API_URL: str = "https://api.search.example.com/v1/search"  # Default URL
     TAVILY_API_KEY: Optional[str] = None  # Added for Tavily search integration
+    TAVILY_API_URL: str = "https://api.tavily.com"
+    SEARCH_BACKEND: str = "llm"
+    SEARCH_BACKEND_TIMEOUT: float = 10.0
+    SEARCH_CONTEXT_REUSE_THRESHOLD: float = 0.6
+    SEARCH_CONTEXT_EXTEND_THRESHOLD: float = 0.2
+    SEARCH_INDEX_DIR: str = "data/search_index"
+    SEARCH_INDEX_MAX_USERS: int = 1000
+    FACT_STORE_DIR: str = "data/fact_store"
+    FACT_STORE_MAX_AGE_DAYS: float = 30
+    FACT_STORE_MIN_COVERAGE: float = 0.5
+    FACT_STORE_MERGE_THRESHOLD: int = 1000
+    DEDUP_THRESHOLD: float = 0.8
+    DEDUP_NUM_PERM: int = 128
+    DEDUP_BANDS: int = 16
+    DEDUP_INDEX_DIR: str = "data/dedup_index"
+    QUALITY_GATE_ENABLED: bool = True
+    QUALITY_GATE_THRESHOLD: float = 8.0
+    QUALITY_GATE_MARGIN: float = 1.0
+    QUALITY_MODEL_PATH: str = "data/quality_model.json"
+    GENERATION_CANDIDATES: int = 1
+    CRITIC_OUTPUT_FORMAT: str = "rewrite"
+    BATCH_POLL_SECONDS: float = 30.0
+    SCHEDULER_ENABLED: bool = False
+    SCHEDULER_TICK_SECONDS: float = 1.0
+    SCHEDULER_HORIZON_SECONDS: float = 86400.0
+    SCHEDULER_REFILL_SECONDS: float = 60.0
+    SCHEDULER_CLAIM_LEASE_SECONDS: float = 600.0
+    SCHEDULER_WORKERS: int = 4
     
     # Social media API keys
     TWITTER_API_KEY: Optional[str] = None
     TWITTER_API_SECRET: Optional[str] = None
+    TWITTER_ACCESS_TOKEN: Optional[str] = None
     FACEBOOK_ACCESS_TOKEN: Optional[str] = None
     LINKEDIN_ACCESS_TOKEN: Optional[str] = None
     REDDIT_CLIENT_ID: Optional[str] = None
     REDDIT_CLIENT_SECRET: Optional[str] = None
+    REDDIT_USERNAME: Optional[str] = None
+    REDDIT_PASSWORD: Optional[str] = None
+    REDDIT_SUBREDDIT: Optional[str] = None
+    LINKEDIN_AUTHOR_URN: Optional[str] = None
+    FACEBOOK_PAGE_ID: Optional[str] = None
+    INSTAGRAM_USER_ID: Optional[str] = None
+    INSTAGRAM_IMAGE_URL: Optional[str] = None
+    PUBLISH_API_BASE_URL: Optional[str] = None
+    PUBLISH_MAX_ATTEMPTS: int = 5
+    PUBLISH_TIMEOUT: float = 15.0
+
+    # Template settings
+    TEMPLATE_BYTECODE_CACHE_DIR: str = "data/template_cache"
+    TEMPLATE_AUTO_RELOAD: bool = False
+    PAGE_CACHE_SIZE: int = 256
+    
+    # Internal metrics endpoint
+    METRICS_TOKEN: Optional[str] = None
     
     # Log level
     LOG_LEVEL: str = "INFO"
@@ -70,8 +191,17 @@ class Settings(BaseSettings):
     @property
     def DATABASE_URL(self) -> str:
         """Constructs database connection URL from components."""
+        if self.DB_BACKEND == "sqlite":
+            return f"sqlite:///{self.SQLITE_PATH}"
         return f"mysql+pymysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
-    
+
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        """Constructs the async driver URL (aiomysql, or aiosqlite for local runs)."""
+        if self.DB_BACKEND == "sqlite":
+            return f"sqlite+aiosqlite:///{self.SQLITE_PATH}"
+        return f"mysql+aiomysql://{self.DB_USER}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+
     model_config = SettingsConfigDict(
         env_file=".env",
         extra="ignore"
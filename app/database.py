@@ -1,10 +1,14 @@
 # app/database.py
 import logging
+import time
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker, AsyncSession
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from passlib.context import CryptContext
 from .config import settings
+from .metrics import metrics
 
 # Configure module logger
 logger = logging.getLogger(__name__)
@@ -15,7 +19,10 @@ try:
     engine = create_engine(
         SQLALCHEMY_DATABASE_URL,
         pool_pre_ping=True,
-        pool_recycle=3600,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
         echo=False
     )
     logger.info(f"Database engine created for {settings.DB_HOST}:{settings.DB_PORT}/{settings.DB_NAME}")
@@ -31,11 +38,58 @@ except Exception as e:
     logger.error(f"Failed to create session factory: {str(e)}")
     raise
 
+class TimedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that records how long each connection checkout waits."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except Exception:
+            metrics.counter("db.pool.checkout_errors").inc()
+            raise
+        finally:
+            metrics.histogram("db.pool.checkout_seconds").observe(time.perf_counter() - start)
+
+# Create async engine for request handlers (aiomysql, or aiosqlite locally)
+try:
+    ASYNC_SQLALCHEMY_DATABASE_URL = settings.ASYNC_DATABASE_URL
+    async_engine = create_async_engine(
+        ASYNC_SQLALCHEMY_DATABASE_URL,
+        poolclass=TimedAsyncQueuePool,
+        pool_pre_ping=True,
+        pool_size=settings.DB_POOL_SIZE,
+        max_overflow=settings.DB_MAX_OVERFLOW,
+        pool_timeout=settings.DB_POOL_TIMEOUT,
+        pool_recycle=settings.DB_POOL_RECYCLE,
+        echo=False
+    )
+    AsyncSessionLocal = async_sessionmaker(
+        bind=async_engine,
+        class_=AsyncSession,
+        autoflush=False,
+        expire_on_commit=False
+    )
+    logger.info(
+        f"Async database engine created (pool_size={settings.DB_POOL_SIZE}, "
+        f"max_overflow={settings.DB_MAX_OVERFLOW})"
+    )
+except Exception as e:
+    logger.error(f"Failed to create async database engine: {str(e)}")
+    raise
+
 # Create base class for models
 Base = declarative_base()
 
-# Password context for hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password context for hashing. Pinning min/max rounds to the configured cost
+# makes verify_and_update() report hashes created with any other cost.
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__max_rounds=settings.BCRYPT_ROUNDS
+)
 
 # Helper functions
 def get_db():
@@ -48,8 +102,22 @@ def get_db():
         db.close()
         logger.debug("Database session closed")
 
+async def get_async_db():
+    """Dependency for async database session management."""
+    async with AsyncSessionLocal() as db:
+        logger.debug("Async database session created")
+        try:
+            yield db
+        finally:
+            logger.debug("Async database session closed")
+
 def initialize_db():
-    """Initialize database by creating all tables if they don't exist."""
+    """
+    Initialize database by creating all tables if they don't exist.
+
+    This is a migration step run by ``create_tables.py``; the application
+    no longer calls it on startup.
+    """
     try:
         # Import models to ensure they're registered with SQLAlchemy
         from .models.user import User
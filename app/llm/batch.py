@@ -0,0 +1,574 @@
+"""
+Multi-stage generation through the OpenAI Batch API.
+
+Every stage compiles one request per item into a batch JSONL file, submits
+it, polls until the batch finishes and parses its output into the next
+stage's requests:
+
+    classify (per prompt) -> search (per prompt) -> generate (per prompt and
+    platform) -> critique (per post, one batch per reflexion round)
+
+Requests are built by the same code the live pipeline uses
+(PostGenerator.build_request, CriticAgent.build_evaluation_request, ...), and
+constraint enforcement, best-of-n picking and the local quality gate run
+between stages exactly as they do live. Search goes straight to the LLM
+(web backends are live-only), though its facts still feed the fact store.
+
+The pipeline checkpoints state.json in its work directory after every
+submission and every finished stage, so a restarted run polls the batch it
+already submitted instead of paying for it twice.
+
+Requests that fail inside a batch are tracked per row. Rows whose
+classification or search failed aren't sent to later stages, and every
+row with a failed stage is returned with status "error" so a rerun with
+--retry-failed generates it again.
+
+LocalBatchClient answers batches offline with canned, deterministic
+responses so the orchestration can be exercised without the API.
+"""
+import json
+import logging
+import os
+import re
+import time
+from types import SimpleNamespace
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from openai import OpenAI
+
+from ..config import settings
+from ..metrics import metrics
+from ..search.engine import SearchEngine
+from .classify_prompt import build_classification_request, fallback_classification
+from .constraints import enforce_constraints
+from .critic_agent import CriticAgent
+from .post_generator import PostGenerator, fallback_post
+from .quality import quality_scorer
+from .usage import record_usage
+
+logger = logging.getLogger(__name__)
+
+ENDPOINT = "/v1/chat/completions"
+# Batches in these states won't change any more; expired batches still return what they finished
+FINISHED = ("completed", "expired")
+FAILED = ("failed", "cancelled")
+
+def write_batch_file(path: str, requests: Sequence[Tuple[str, Dict[str, Any]]]):
+    """Write (custom_id, request body) pairs as a batch input file."""
+    with open(path, "w", encoding="utf-8") as f:
+        for custom_id, body in requests:
+            f.write(json.dumps({"custom_id": custom_id, "method": "POST", "url": ENDPOINT, "body": body}) + "\n")
+
+def parse_output_lines(lines: Sequence[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Map custom_id to its chat completion body from batch output lines.
+
+    Requests that failed map to {"error": ...} instead.
+    """
+    results = {}
+    for line in lines:
+        if not line.strip():
+            continue
+        record = json.loads(line)
+        response = record.get("response") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            results[record["custom_id"]] = {"error": record.get("error") or response.get("body")}
+        else:
+            results[record["custom_id"]] = response["body"]
+    return results
+
+def _contents(body: Dict[str, Any]) -> List[str]:
+    """Message contents of every choice in a chat completion body."""
+    return [
+        choice["message"]["content"]
+        for choice in body.get("choices", [])
+        if choice.get("message", {}).get("content")
+    ]
+
+class OpenAIBatchClient:
+    """Submits batch files to the OpenAI Batch API."""
+
+    def __init__(self, api_key=None, completion_window: str = "24h"):
+        self.client = OpenAI(api_key=api_key or settings.OPENAI_API_KEY)
+        self.completion_window = completion_window
+
+    def submit(self, input_path: str, description: str = "") -> str:
+        """Upload an input file and create its batch, returning the batch id."""
+        with open(input_path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=ENDPOINT,
+            completion_window=self.completion_window,
+            metadata={"description": description} if description else None
+        )
+        return batch.id
+
+    def status(self, batch_id: str) -> str:
+        return self.client.batches.retrieve(batch_id).status
+
+    def results(self, batch_id: str) -> Dict[str, Dict[str, Any]]:
+        """Download a finished batch's output and error files."""
+        batch = self.client.batches.retrieve(batch_id)
+        lines = []
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id:
+                lines.extend(self.client.files.content(file_id).text.splitlines())
+        return parse_output_lines(lines)
+
+def local_response(custom_id: str, body: Dict[str, Any]) -> List[str]:
+    """
+    Canned, deterministic answers for LocalBatchClient, one per requested choice.
+
+    The stage is the custom_id prefix; answers are just shaped like what the
+    pipeline parses, with a critic score that rises each round.
+    """
+    stage = custom_id.split(":", 1)[0]
+    system, user = body["messages"][0]["content"], body["messages"][-1]["content"]
+    if stage == "classify":
+        prompt = user.rsplit("Prompt:", 1)[-1].strip()
+        words = [word.strip(".,!?").lower() for word in prompt.split() if len(word) > 4]
+        return [json.dumps({
+            "category": "Technology",
+            "intent": "Inform",
+            "subtopics": words[:3],
+            "focus": prompt[:30],
+            "confidence": 0.8
+        })]
+    if stage == "search":
+        query = user.removeprefix("Search query: ")
+        return [json.dumps({"results": [
+            {"fact": f"Finding {number} about {query}.", "source": "Local batch"} for number in range(1, 4)
+        ]})]
+    if stage == "generate":
+        request = re.search(r"Original request: (.*)", user)
+        topic = request.group(1).strip() if request else "this topic"
+        return [
+            f"Draft {number}: here is what I learned about {topic}. The latest findings are worth a look."
+            for number in range(1, body.get("n", 1) + 1)
+        ]
+    iteration = re.search(r"iteration (\d+)/", system)
+    post = user.split("):", 1)[-1].rsplit("Please evaluate", 1)[0].strip()
+    evaluation = {
+        "score": min(10, 6 + int(iteration.group(1) if iteration else 1)),
+        "strengths": ["Clear topic"],
+        "weaknesses": ["Could be more specific"],
+        "improvement_suggestions": ["Add a concrete example"]
+    }
+    if "- edits:" in system:
+        evaluation["edits"] = [{"op": "insert", "after": post.split(".")[0], "text": " (revised)"}]
+    else:
+        evaluation["improved_version"] = f"{post} Revised."
+    return [json.dumps(evaluation)]
+
+class LocalBatchClient:
+    """
+    Offline stand-in for the Batch API.
+
+    Answers every request of a submitted batch with a responder function and
+    writes input and output files in the Batch API's formats to its work
+    directory. A batch reports in_progress for pending_polls polls before it
+    completes, so callers' polling is exercised too.
+    """
+
+    def __init__(self, work_dir: str, responder: Callable[[str, Dict[str, Any]], List[str]] = local_response,
+                 pending_polls: int = 1):
+        self.work_dir = work_dir
+        self.responder = responder
+        self.pending_polls = pending_polls
+        self._polls = {}
+        os.makedirs(work_dir, exist_ok=True)
+
+    def _output_path(self, batch_id: str) -> str:
+        return os.path.join(self.work_dir, f"{batch_id}_output.jsonl")
+
+    def submit(self, input_path: str, description: str = "") -> str:
+        batch_id = f"local_batch_{len(os.listdir(self.work_dir)) + 1}_{int(time.time() * 1000)}"
+        with open(input_path, encoding="utf-8") as f:
+            requests = [json.loads(line) for line in f if line.strip()]
+        with open(self._output_path(batch_id), "w", encoding="utf-8") as out:
+            for number, request in enumerate(requests):
+                body = request["body"]
+                try:
+                    contents = self.responder(request["custom_id"], body)
+                    response = {"status_code": 200, "request_id": f"local_{number}", "body": {
+                        "object": "chat.completion",
+                        "model": body.get("model"),
+                        "choices": [
+                            {"index": index, "message": {"role": "assistant", "content": content},
+                             "finish_reason": "stop"}
+                            for index, content in enumerate(contents)
+                        ],
+                        "usage": {
+                            "prompt_tokens": sum(len(m["content"]) for m in body["messages"]) // 4,
+                            "completion_tokens": sum(len(content) for content in contents) // 4
+                        }
+                    }}
+                    error = None
+                except Exception as e:
+                    response, error = None, {"code": "local_error", "message": str(e)}
+                out.write(json.dumps({"id": f"local_req_{number}", "custom_id": request["custom_id"],
+                                      "response": response, "error": error}) + "\n")
+        self._polls[batch_id] = 0
+        return batch_id
+
+    def status(self, batch_id: str) -> str:
+        polls = self._polls.get(batch_id, self.pending_polls)
+        self._polls[batch_id] = polls + 1
+        return "completed" if polls >= self.pending_polls else "in_progress"
+
+    def results(self, batch_id: str) -> Dict[str, Dict[str, Any]]:
+        with open(self._output_path(batch_id), encoding="utf-8") as f:
+            return parse_output_lines(f.readlines())
+
+class BatchPipeline:
+    """Runs classify, search, generate and critique rounds for many prompts as batches."""
+
+    def __init__(self,
+                 client,
+                 work_dir: str,
+                 iterations: int = 5,
+                 candidates: Optional[int] = None,
+                 critic_format: Optional[str] = None,
+                 poll_seconds: Optional[float] = None,
+                 api_key=None):
+        """
+        Initialize the pipeline.
+
+        Args:
+            client: OpenAIBatchClient or LocalBatchClient
+            work_dir: Directory for batch files and the state checkpoint
+            iterations: Maximum critique rounds
+            candidates: Drafts requested per platform (defaults to settings.GENERATION_CANDIDATES)
+            critic_format: Critic output format (defaults to settings.CRITIC_OUTPUT_FORMAT)
+            poll_seconds: Wait between status polls (defaults to settings.BATCH_POLL_SECONDS)
+            api_key: OpenAI API key (defaults to settings)
+        """
+        self.client = client
+        self.work_dir = work_dir
+        self.iterations = iterations
+        self.candidates = candidates or settings.GENERATION_CANDIDATES
+        self.poll_seconds = settings.BATCH_POLL_SECONDS if poll_seconds is None else poll_seconds
+        self.generator = PostGenerator(api_key=api_key)
+        self.critic = CriticAgent(api_key=api_key, output_format=critic_format)
+        self.search_engine = SearchEngine(api_key=api_key, backend=None)
+        self.state_path = os.path.join(work_dir, "state.json")
+        os.makedirs(work_dir, exist_ok=True)
+        self.state = self._load()
+
+    def _load(self) -> Dict[str, Any]:
+        if os.path.exists(self.state_path):
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        return {}
+
+    def _save(self):
+        # Replace atomically so a crash never leaves a half-written checkpoint
+        temp_path = self.state_path + ".tmp"
+        with open(temp_path, "w", encoding="utf-8") as f:
+            json.dump(self.state, f)
+        os.replace(temp_path, self.state_path)
+
+    def clear(self):
+        """Forget the checkpoint once its results have been written out."""
+        if os.path.exists(self.state_path):
+            os.remove(self.state_path)
+        self.state = {}
+
+    def _wait(self, batch_id: str) -> str:
+        started = time.perf_counter()
+        while True:
+            status = self.client.status(batch_id)
+            if status in FINISHED:
+                return status
+            if status in FAILED:
+                raise RuntimeError(f"Batch {batch_id} {status}")
+            logger.info(f"Batch {batch_id} is {status} after {time.perf_counter() - started:.0f}s")
+            time.sleep(self.poll_seconds)
+
+    def _run_stage(self, name: str, usage_stage: str,
+                   requests: List[Tuple[str, Dict[str, Any]]]) -> Dict[str, Dict[str, Any]]:
+        """
+        Submit one stage's requests (unless already submitted) and wait for its results.
+
+        Returns:
+            custom_id -> chat completion body (or {"error": ...})
+        """
+        stage = self.state["stages"].get(name)
+        if stage is None:
+            path = os.path.join(self.work_dir, f"{name}_input.jsonl")
+            write_batch_file(path, requests)
+            stage = {"batch_id": self.client.submit(path, description=name), "submitted_at": time.time()}
+            self.state["stages"][name] = stage
+            self._save()
+            logger.info(f"Submitted {name} batch {stage['batch_id']} with {len(requests)} requests")
+        else:
+            logger.info(f"Resuming {name} batch {stage['batch_id']}")
+
+        status = self._wait(stage["batch_id"])
+        results = self.client.results(stage["batch_id"])
+        metrics.histogram(f"batch.{usage_stage}.seconds").observe(time.time() - stage["submitted_at"])
+        for body in results.values():
+            if "error" not in body:
+                usage = SimpleNamespace(**body["usage"]) if body.get("usage") else None
+                record_usage(f"batch.{usage_stage}", SimpleNamespace(usage=usage))
+        failed = sum(1 for body in results.values() if "error" in body)
+        logger.info(f"{name} batch {status}: {len(results) - failed} answered, {failed} failed")
+        return results
+
+    def _finish(self, name: str):
+        self.state["done"].append(name)
+        self._save()
+
+    def _fail(self, stage: str, row_id: Optional[str] = None, prompt: Optional[str] = None):
+        """Record that a stage failed for one row, or for every row with prompt."""
+        # Checkpoints written before failures were tracked don't have the key
+        fallbacks = self.state.setdefault("fallbacks", {})
+        row_ids = [row_id] if row_id is not None else [row["id"] for row in self.state["rows"] if row["prompt"] == prompt]
+        for failed_id in row_ids:
+            fallbacks.setdefault(failed_id, []).append(stage)
+
+    def _failed_prompts(self) -> set:
+        fallbacks = self.state.get("fallbacks", {})
+        return {row["prompt"] for row in self.state["rows"] if row["id"] in fallbacks}
+
+    def _classify(self):
+        if "classify" in self.state["done"]:
+            return
+        prompts = list(dict.fromkeys(row["prompt"] for row in self.state["rows"]))
+        requests = [(f"classify:{index}", build_classification_request(prompt)) for index, prompt in enumerate(prompts)]
+        results = self._run_stage("classify", "classify", requests)
+        for index, prompt in enumerate(prompts):
+            classification = None
+            contents = _contents(results.get(f"classify:{index}", {}))
+            if contents:
+                try:
+                    classification = json.loads(contents[0])
+                except ValueError:
+                    logger.warning(f"Unparseable classification for prompt {index}")
+            if not classification:
+                self._fail("classification", prompt=prompt)
+            self.state["classification"][prompt] = classification or fallback_classification(prompt)
+        self._finish("classify")
+
+    def _search(self):
+        if "search" in self.state["done"]:
+            return
+        failed = self._failed_prompts()
+        prompts = [prompt for prompt in self.state["classification"] if prompt not in failed]
+        requests = []
+        for index, prompt in enumerate(prompts):
+            classification = self.state["classification"][prompt]
+            requests.append((f"search:{index}", self.search_engine.build_llm_request(
+                prompt, classification.get("category"), classification.get("subtopics"), classification.get("intent")
+            )))
+        results = self._run_stage("search", "search", requests)
+        for index, prompt in enumerate(prompts):
+            classification = self.state["classification"][prompt]
+            category = classification.get("category")
+            enhanced_query = SearchEngine._enhance_query(
+                prompt, category, classification.get("subtopics"), classification.get("intent")
+            )
+            contents = _contents(results.get(f"search:{index}", {}))
+            if contents:
+                search_results = SearchEngine.parse_llm_response(contents[0], prompt, enhanced_query, category)
+            else:
+                self._fail("search", prompt=prompt)
+                search_results = {
+                    "original_query": prompt,
+                    "enhanced_query": prompt,
+                    "category": category,
+                    "results": {"items": self.search_engine._get_fallback_results(category)},
+                    "timestamp": "2025-04-21"
+                }
+            fresh_items = search_results["results"]["items"]
+            if search_results.pop("fresh", False) and self.search_engine.fact_store is not None and fresh_items:
+                try:
+                    self.search_engine.fact_store.add(fresh_items, category=category)
+                except Exception as e:
+                    logger.error(f"Failed to store search facts: {str(e)}")
+            self.state["search_context"][prompt] = SearchEngine.format_search_context(search_results)
+        self._finish("search")
+
+    def _generate(self):
+        if "generate" in self.state["done"]:
+            return
+        failed = self._failed_prompts()
+        # A post from placeholder classification or search would be a placeholder too
+        posts = [(row, platform) for row in self.state["rows"] if row["prompt"] not in failed
+                 for platform in row["platforms"]]
+        requests = [
+            (f"generate:{index}", self.generator.build_request(
+                row["prompt"], self.state["search_context"][row["prompt"]], platform,
+                self.state["classification"][row["prompt"]], n=self.candidates
+            ))
+            for index, (row, platform) in enumerate(posts)
+        ]
+        results = self._run_stage("generate", "generation", requests)
+        for index, (row, platform) in enumerate(posts):
+            prompt = row["prompt"]
+            candidates = [content.strip() for content in _contents(results.get(f"generate:{index}", {}))]
+            if candidates:
+                post = PostGenerator.pick_candidate(candidates, platform, self.state["search_context"][prompt], prompt)
+            else:
+                self._fail(f"generation:{platform}", row_id=row["id"])
+                post = fallback_post(prompt)
+            constraint_result = enforce_constraints(post, platform)
+            self.state["posts"][row["id"]][platform] = {
+                "post": constraint_result.post,
+                "initial_constraint_fixes": constraint_result.fixes,
+                "constraint_violations": constraint_result.violations,
+                "history": [],
+                "active": self.iterations > 0
+            }
+        self._finish("generate")
+
+    def _critique(self, iteration: int) -> bool:
+        """Run one critique round; False once no post is still being refined."""
+        name = f"critique_{iteration}"
+        if name in self.state["done"]:
+            return True
+        rows = {row["id"]: row for row in self.state["rows"]}
+        pending = []
+        for row_id, platforms in self.state["posts"].items():
+            for platform, data in platforms.items():
+                if not data["active"]:
+                    continue
+                prompt = rows[row_id]["prompt"]
+                # Skip the critic when the local scorer is confident the post is already good
+                local_score = float(quality_scorer.score(
+                    [data["post"]], platform, self.state["search_context"][prompt], prompt
+                )[0])
+                if not quality_scorer.needs_critic(local_score):
+                    metrics.counter("quality.critic_skipped").inc()
+                    data["history"].append({
+                        "iteration": iteration,
+                        "post": data["post"],
+                        "score": round(local_score, 1),
+                        "strengths": [],
+                        "weaknesses": [],
+                        "suggestions": [],
+                        "scored_by": "local"
+                    })
+                    data["active"] = False
+                    continue
+                metrics.counter("quality.critic_called").inc()
+                pending.append((row_id, platform, local_score))
+        if not pending:
+            self._finish(name)
+            return False
+
+        requests = [
+            (f"critique:{index}", self.critic.build_evaluation_request(
+                self.state["posts"][row_id][platform]["post"], platform, rows[row_id]["prompt"],
+                self.state["search_context"][rows[row_id]["prompt"]], iteration,
+                self.state["classification"][rows[row_id]["prompt"]]
+            ))
+            for index, (row_id, platform, _) in enumerate(pending)
+        ]
+        results = self._run_stage(name, "critic", requests)
+        for index, (row_id, platform, local_score) in enumerate(pending):
+            data = self.state["posts"][row_id][platform]
+            contents = _contents(results.get(f"critique:{index}", {}))
+            try:
+                evaluation = self.critic.parse_evaluation(contents[0], data["post"], iteration)
+            except (IndexError, ValueError):
+                # No usable critique: keep the post as it is
+                logger.warning(f"No critique for {row_id}/{platform} in round {iteration}")
+                self._fail(f"critique:{platform}", row_id=row_id)
+                data["active"] = False
+                continue
+            iteration_data = {
+                "iteration": iteration,
+                "post": data["post"],
+                "score": evaluation.get("score", 0),
+                "strengths": evaluation.get("strengths", []),
+                "weaknesses": evaluation.get("weaknesses", []),
+                "suggestions": evaluation.get("improvement_suggestions", []),
+                "local_score": round(local_score, 2),
+                "scored_by": "critic"
+            }
+            if "edits_applied" in evaluation:
+                iteration_data["edits_applied"] = evaluation["edits_applied"]
+                iteration_data["edits_rejected"] = len(evaluation["edits_rejected"])
+            data["history"].append(iteration_data)
+
+            improved_version = evaluation.get("improved_version", data["post"])
+            if isinstance(improved_version, str) and len(improved_version) > 10:
+                constraint_result = enforce_constraints(improved_version, platform)
+                data["post"] = constraint_result.post
+                data["constraint_violations"] = constraint_result.violations
+                iteration_data["constraint_fixes"] = constraint_result.fixes
+            if evaluation.get("score", 0) >= 9 or iteration >= self.iterations:
+                data["active"] = False
+        self._finish(name)
+        return True
+
+    def run(self, rows: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Generate and refine posts for rows, resuming the checkpoint in work_dir if there is one.
+
+        Args:
+            rows: {"id", "prompt", "platforms"} dictionaries (ignored when resuming)
+
+        Returns:
+            One record per row with posts, final_scores, classification and refinement_data,
+            or with status "error" and the failed stages
+        """
+        if self.state.get("rows"):
+            logger.info(f"Resuming batch run of {len(self.state['rows'])} rows "
+                        f"(finished stages: {', '.join(self.state['done']) or 'none'})")
+        else:
+            self.state = {
+                "rows": rows,
+                "stages": {},
+                "done": [],
+                "classification": {},
+                "search_context": {},
+                "posts": {row["id"]: {} for row in rows},
+                "fallbacks": {}
+            }
+            self._save()
+
+        self._classify()
+        self._search()
+        self._generate()
+        for iteration in range(1, self.iterations + 1):
+            if not self._critique(iteration):
+                break
+
+        records = []
+        fallbacks = self.state.get("fallbacks", {})
+        for row in self.state["rows"]:
+            if row["id"] in fallbacks:
+                records.append({
+                    "id": row["id"],
+                    "prompt": row["prompt"],
+                    "platforms": row["platforms"],
+                    "status": "error",
+                    "error": f"batch requests failed ({', '.join(fallbacks[row['id']])})"
+                })
+                continue
+            platforms = self.state["posts"][row["id"]]
+            records.append({
+                "id": row["id"],
+                "prompt": row["prompt"],
+                "platforms": row["platforms"],
+                "status": "ok",
+                "posts": {platform: f"[{platform.capitalize()}] {data['post']}" for platform, data in platforms.items()},
+                "final_scores": {
+                    platform: data["history"][-1]["score"] if data["history"] else 0
+                    for platform, data in platforms.items()
+                },
+                "classification": self.state["classification"][row["prompt"]],
+                "refinement_data": {
+                    platform: {
+                        "iterations_completed": len(data["history"]),
+                        "iteration_history": data["history"],
+                        "initial_constraint_fixes": data["initial_constraint_fixes"],
+                        "constraint_violations": data["constraint_violations"]
+                    }
+                    for platform, data in platforms.items()
+                }
+            })
+        return records
@@ -32,6 +32,30 @@ Respond ONLY in the following JSON format:
 Prompt: {prompt}
 """
 
+def build_classification_request(prompt: str, model: str = "gpt-3.5-turbo") -> Dict:
+    """Chat completion request body for classifying a prompt (used by batch classification)."""
+    # str.format would trip over the JSON braces in the template
+    return {
+        "model": model,
+        "messages": [
+            {"role": "system", "content": "You are a helpful assistant."},
+            {"role": "user", "content": CLASSIFICATION_PROMPT.replace("{prompt}", prompt)},
+        ],
+        "temperature": 0.5,
+        "max_tokens": 300
+    }
+
+def fallback_classification(prompt: str) -> Dict:
+    """Classification used when the classifier fails (flagged so it isn't cached as a real result)."""
+    return {
+        "category": "General",
+        "intent": "Inform",
+        "subtopics": [],
+        "focus": prompt[:30],
+        "confidence": 0.5,
+        "fallback": True
+    }
+
 class PromptClassifier:
     def __init__(self, api_key: str):
         openai.api_key = api_key
@@ -64,13 +88,7 @@ class PromptClassifier:
 
         except Exception as e:
             logger.exception(f"Prompt classification failed: {e}")
-            return {
-                "category": "General",
-                "intent": "Inform",
-                "subtopics": [],
-                "focus": prompt[:30],
-                "confidence": 0.5
-            }
+            return fallback_classification(prompt)
 
 def get_classifier(api_key: str) -> PromptClassifier:
     return PromptClassifier(api_key=api_key)
@@ -0,0 +1,212 @@
+"""
+Deterministic platform-constraint enforcement for generated posts.
+
+Checks and fixes what ``app.models.platform.PLATFORM_CONFIG`` declares
+(length, hashtag count, emoji density) plus the leftover "[Platform]"
+prefix, without an LLM call. The reflexion loop runs it on every draft and
+every improved version, so critic iterations aren't spent on rule breaches
+a few lines of code can repair.
+"""
+import logging
+import re
+from dataclasses import dataclass, field
+from typing import List, Tuple
+
+from ..metrics import metrics
+from ..models.platform import PLATFORM_CONFIG, get_platform_config, max_emojis
+
+logger = logging.getLogger(__name__)
+
+PLATFORM_PREFIX = re.compile(
+    r"^\s*(?:\[(?:%s|x)\]\s*)+" % "|".join(re.escape(name) for name in PLATFORM_CONFIG),
+    re.IGNORECASE
+)
+# Not preceded by a word character, "&" (HTML entities) or "/" (URL fragments)
+HASHTAG = re.compile(r"(?<![\w&/])#(\w+)")
+EMOJI = re.compile(
+    "(?:[\U0001F1E6-\U0001F1FF]{2}"
+    "|[\U0001F300-\U0001FAFF\u2600-\u27BF\u2B00-\u2BFF\u231A-\u23FF]"
+    "[\U0001F3FB-\U0001F3FF]?\uFE0F?"
+    "(?:\u200D[\U0001F300-\U0001FAFF\u2600-\u27BF][\U0001F3FB-\U0001F3FF]?\uFE0F?)*)"
+)
+SENTENCE_END = re.compile(r"[.!?](?=\s)|\n")
+ELLIPSIS = "\u2026"
+
+@dataclass
+class ConstraintResult:
+    """A post after enforcement, with the fixes applied and any violation left."""
+    post: str
+    fixes: List[str] = field(default_factory=list)
+    violations: List[str] = field(default_factory=list)
+
+def _is_hashtag_line(line: str) -> bool:
+    return bool(HASHTAG.search(line)) and not HASHTAG.sub("", line).strip(" \t.,;|\u00b7-")
+
+def _tidy(text: str) -> str:
+    """Collapse the gaps left by removed tokens."""
+    text = re.sub(r"[ \t]{2,}", " ", text)
+    text = re.sub(r"[ \t]+([,.!?;:])", r"\1", text)
+    text = "\n".join(line.strip() for line in text.split("\n"))
+    return re.sub(r"\n{3,}", "\n\n", text).strip()
+
+def strip_platform_prefix(post: str) -> str:
+    """Remove leading "[Platform]" labels."""
+    return PLATFORM_PREFIX.sub("", post, count=1)
+
+def count_hashtags(post: str) -> int:
+    return len(HASHTAG.findall(post))
+
+def count_emojis(post: str) -> int:
+    return len(EMOJI.findall(post))
+
+def word_count(post: str) -> int:
+    return len(EMOJI.sub(" ", post).split())
+
+def limit_hashtags(post: str, limit: int) -> Tuple[str, int]:
+    """
+    Keep the first ``limit`` distinct hashtags.
+
+    Excess tags in a hashtag-only line are removed; excess tags inside a
+    sentence lose the "#" so the sentence still reads.
+
+    Returns:
+        (post, number of hashtags dropped)
+    """
+    seen = set()
+    dropped = 0
+
+    def replace(match, tag_line):
+        nonlocal dropped
+        tag = match.group(1).lower()
+        if tag not in seen and len(seen) < limit:
+            seen.add(tag)
+            return match.group(0)
+        dropped += 1
+        return "" if tag_line else match.group(1)
+
+    lines = [
+        HASHTAG.sub(lambda match, tag_line=_is_hashtag_line(line): replace(match, tag_line), line)
+        for line in post.split("\n")
+    ]
+    return "\n".join(lines), dropped
+
+def limit_emojis(post: str, limit: int) -> Tuple[str, int]:
+    """Keep the first ``limit`` emojis. Returns (post, number removed)."""
+    kept = 0
+
+    def replace(match):
+        nonlocal kept
+        if kept < limit:
+            kept += 1
+            return match.group(0)
+        return ""
+
+    fixed = EMOJI.sub(replace, post)
+    return fixed, count_emojis(post) - kept
+
+def split_trailing_hashtags(post: str) -> Tuple[str, str]:
+    """Split a post into its body and the block of hashtag-only lines ending it."""
+    lines = post.rstrip().split("\n")
+    cut = len(lines)
+    while cut > 0 and (_is_hashtag_line(lines[cut - 1]) or (not lines[cut - 1].strip() and cut < len(lines))):
+        cut -= 1
+    return "\n".join(lines[:cut]).rstrip(), "\n".join(lines[cut:]).strip()
+
+def truncate_text(text: str, limit: int) -> str:
+    """
+    Shorten text to at most ``limit`` characters.
+
+    Cuts at the last sentence end in the final 40% of the budget when there
+    is one, otherwise at the last word boundary with an ellipsis.
+    """
+    if len(text) <= limit:
+        return text
+    if limit <= 1:
+        return text[:limit]
+    window = text[:limit + 1]
+    ends = [match.end() for match in SENTENCE_END.finditer(window) if match.end() >= limit * 0.6]
+    ends = [end for end in ends if end <= limit]
+    if ends:
+        return text[:ends[-1]].rstrip()
+    cut = window[:limit].rfind(" ")
+    if cut < limit * 0.5:
+        cut = limit - 1
+    return text[:cut].rstrip(" ,;:-\n") + ELLIPSIS
+
+def limit_length(post: str, max_length: int) -> str:
+    """Fit a post within max_length, keeping a trailing hashtag block when there's room."""
+    if len(post) <= max_length:
+        return post
+    body, tags = split_trailing_hashtags(post)
+    budget = max_length - len(tags) - 2 if tags else max_length
+    if budget < max_length // 2:
+        tags, budget = "", max_length
+    body = truncate_text(body, budget)
+    return f"{body}\n\n{tags}" if tags else body
+
+def check_post(post: str, platform: str) -> List[str]:
+    """
+    List a post's constraint violations without changing it.
+
+    Args:
+        post: Post content
+        platform: Target platform
+
+    Returns:
+        Human-readable violations (empty when the post complies)
+    """
+    config = get_platform_config(platform)
+    violations = []
+    if PLATFORM_PREFIX.match(post):
+        violations.append("starts with a [Platform] prefix")
+    if len(post) > config["max_length"]:
+        violations.append(f"{len(post)} characters exceeds the {config['max_length']} limit")
+    hashtags = count_hashtags(post)
+    if hashtags > config["hashtags_count"]:
+        violations.append(f"{hashtags} hashtags exceeds the {config['hashtags_count']} limit")
+    emojis, allowed = count_emojis(post), max_emojis(platform, word_count(post))
+    if emojis > allowed:
+        violations.append(f"{emojis} emojis exceeds the {allowed} allowed for {config['emoji_frequency']} emoji use")
+    return violations
+
+def enforce_constraints(post: str, platform: str) -> ConstraintResult:
+    """
+    Fix a post's prefix, hashtags, emojis and length for a platform.
+
+    Args:
+        post: Post content (may carry a "[Platform]" prefix)
+        platform: Target platform
+
+    Returns:
+        ConstraintResult with the fixed post, the fixes applied and any violation left
+    """
+    config = get_platform_config(platform)
+    fixes = {}
+    fixed = post or ""
+
+    stripped = strip_platform_prefix(fixed)
+    if stripped != fixed:
+        fixes["prefix"] = "removed [Platform] prefix"
+        fixed = stripped
+
+    fixed, dropped = limit_hashtags(fixed, config["hashtags_count"])
+    if dropped:
+        fixes["hashtags"] = f"dropped {dropped} hashtags over the limit of {config['hashtags_count']}"
+
+    allowed = max_emojis(platform, word_count(fixed))
+    fixed, removed = limit_emojis(fixed, allowed)
+    if removed:
+        fixes["emojis"] = f"removed {removed} emojis over the limit of {allowed}"
+
+    fixed = _tidy(fixed) if fixes else fixed.strip()
+
+    length = len(fixed)
+    fixed = limit_length(fixed, config["max_length"])
+    if len(fixed) != length:
+        fixes["length"] = f"trimmed from {length} to {len(fixed)} characters"
+
+    for kind in fixes:
+        metrics.counter(f"constraints.{kind}_fixed").inc()
+    if fixes:
+        logger.info(f"Constraint fixes for {platform}: {'; '.join(fixes.values())}")
+    return ConstraintResult(post=fixed, fixes=list(fixes.values()), violations=check_post(fixed, platform))
@@ -3,12 +3,19 @@ Critic Agent module for evaluating and suggesting improvements for social media
 Uses OpenAI to provide insightful feedback to refine content quality.
 """
 import logging
-import os
-from typing import Dict, Any, List, Tuple
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
 from openai import OpenAI
 
-from dotenv import load_dotenv
-load_dotenv()
+from ..config import settings
+from ..models.platform import get_platform_config
+from ..metrics import metrics
+from .constraints import check_post, enforce_constraints
+from .edits import EDIT_INSTRUCTIONS, apply_edits, critic_max_tokens
+from .quality import quality_scorer
+from .usage import record_usage
 
 # Configure logger
 logger = logging.getLogger(__name__)
@@ -24,18 +31,142 @@ class CriticAgent:
     Works as a reflexion mechanism to iteratively enhance post quality.
     """
     
-    def __init__(self, api_key=None, model="gpt-4o"):
+    # Most edit operations a patch-style critique may return
+    MAX_EDITS = 8
+    
+    def __init__(self, api_key=None, model="gpt-4o", output_format=None):
         """
         Initialize the critic agent.
         
         Args:
             api_key: OpenAI API key (defaults to environment variable)
             model: OpenAI model to use for evaluation
+            output_format: "rewrite" (full improved_version) or "patch" (edit operations);
+                defaults to settings.CRITIC_OUTPUT_FORMAT
         """
-        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        self.api_key = api_key or settings.OPENAI_API_KEY
         self.model = model
+        self.output_format = output_format or settings.CRITIC_OUTPUT_FORMAT
+        if self.output_format not in ("rewrite", "patch"):
+            raise ValueError(f"Unknown critic output format: {self.output_format}")
         self.client = OpenAI(api_key=self.api_key)
-        logger.info(f"CriticAgent initialized using OpenAI model: {model}")
+        logger.info(f"CriticAgent initialized using OpenAI model: {model} ({self.output_format} output)")
+    
+    def build_evaluation_request(self,
+                                 post: str,
+                                 platform: str,
+                                 original_prompt: str,
+                                 search_context: str,
+                                 iteration: int,
+                                 classification: Dict[str, Any] = None) -> Dict[str, Any]:
+        """
+        Chat completion request body for a critique (shared by live and batch reflexion).
+        
+        Returns:
+            Keyword arguments for chat.completions.create
+        """
+        # Extract relevant classification data if available
+        category = "general topic"
+        intent = "informative"
+
+        if classification:
+            category = classification.get("category", "general topic")
+            intent = classification.get("intent", "informative")
+
+        platform_config = get_platform_config(platform)
+        if self.output_format == "patch":
+            output_field = EDIT_INSTRUCTIONS.format(max_edits=self.MAX_EDITS).strip()
+            rewrite_note = "Make every edit a genuine improvement that addresses a weakness."
+        else:
+            output_field = "- improved_version: A rewritten version that addresses your feedback"
+            rewrite_note = "For the improved_version, create a genuinely better post that addresses all the weaknesses."
+
+        # Create system prompt for the critic
+        system_prompt = f"""
+        You are an expert social media critic who evaluates posts for {platform} and provides specific, actionable feedback.
+
+        For iteration {iteration}/5, you'll evaluate a {platform} post about {category} and identify opportunities for improvement.
+
+        When evaluating, consider:
+        1. Content relevance: Does it address the original prompt?
+        2. Platform suitability: Is it formatted appropriately for {platform}?
+        3. Engagement potential: Will it resonate with the target audience?
+        4. Factual accuracy: Does it correctly incorporate information from the search context?
+        5. Authenticity: Does it sound natural and human-written?
+        6. Clarity: Is the message clear and well-structured?
+
+        Provide your evaluation in JSON format with these fields:
+        - score: Numerical rating from 1-10
+        - strengths: List of specific strengths
+        - weaknesses: List of specific weaknesses
+        - improvement_suggestions: Specific, actionable suggestions to improve the post
+        {output_field}
+
+        Be specific and constructive in your feedback. {rewrite_note}
+
+        Length, hashtag and emoji limits are enforced automatically, so don't spend feedback on them; keep the improved post
+        under {platform_config['max_length']} characters with at most {platform_config['hashtags_count']} hashtags, and no "[Platform]" label.
+        """
+
+        # User prompt combines all context
+        user_prompt = f"""
+        Original request: {original_prompt}
+
+        SEARCH CONTEXT:
+        {search_context}
+
+        POST TO EVALUATE ({platform}):
+        {post}
+
+        Please evaluate this post and suggest improvements while keeping the overall message intact.
+        """
+
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ],
+            "response_format": {"type": "json_object"},
+            "temperature": 0.5,
+            "max_tokens": critic_max_tokens(platform, self.output_format)
+        }
+    
+    def parse_evaluation(self, content: str, post: str, iteration: int) -> Dict[str, Any]:
+        """
+        Evaluation dictionary from a critique response, with patch edits applied.
+        
+        Raises:
+            ValueError: If the content isn't valid JSON
+        """
+        # Debug output
+        logger.debug(f"Raw critique response: {content[:500]}...")
+
+        # Parse JSON response
+        import json
+        evaluation = json.loads(content)
+
+        # Ensure all required fields are present
+        evaluation.setdefault("score", 5)
+        evaluation.setdefault("strengths", [])
+        evaluation.setdefault("weaknesses", [])
+        evaluation.setdefault("improvement_suggestions", [])
+        if self.output_format == "patch":
+            # Apply the edits locally; rejected edits leave their span unchanged
+            edit_result = apply_edits(post, evaluation.pop("edits", []))
+            evaluation["improved_version"] = edit_result.post
+            evaluation["edits_applied"] = edit_result.applied
+            evaluation["edits_rejected"] = edit_result.rejected
+            metrics.counter("critic.patch.edits_applied").inc(edit_result.applied)
+            metrics.counter("critic.patch.edits_rejected").inc(len(edit_result.rejected))
+            if edit_result.rejected:
+                logger.info(f"Rejected {len(edit_result.rejected)} critic edits: {'; '.join(edit_result.rejected)}")
+        evaluation.setdefault("improved_version", post)  # Default to original if missing
+
+        # Add iteration info
+        evaluation["iteration"] = iteration
+
+        return evaluation
     
     def evaluate_post(self, 
                       post: str, 
@@ -59,52 +190,84 @@ class CriticAgent:
             Dictionary with score, feedback, and improvement suggestions
         """
         try:
-            # Extract relevant classification data if available
-            category = "general topic"
-            intent = "informative"
-            
-            if classification:
-                category = classification.get("category", "general topic")
-                intent = classification.get("intent", "informative")
+            # Get evaluation from OpenAI
+            start = time.perf_counter()
+            request = self.build_evaluation_request(post, platform, original_prompt, search_context, iteration, classification)
+            response = self.client.chat.completions.create(**request)
+            if response.choices[0].finish_reason == "length":
+                # Cut off by the token budget: the JSON is incomplete, so ask again without the cap
+                metrics.counter(f"critic.{self.output_format}.truncated").inc()
+                logger.warning(f"Critique hit its {request['max_tokens']}-token budget; retrying without a limit")
+                record_usage("critic", response)
+                request.pop("max_tokens")
+                response = self.client.chat.completions.create(**request)
+            elapsed = time.perf_counter() - start
+            record_usage("critic", response, elapsed)
+            metrics.histogram(f"critic.{self.output_format}.seconds").observe(elapsed)
+            if getattr(response, "usage", None) is not None:
+                metrics.histogram(f"critic.{self.output_format}.completion_tokens").observe(response.usage.completion_tokens or 0)
             
-            # Create system prompt for the critic
-            system_prompt = f"""
-            You are an expert social media critic who evaluates posts for {platform} and provides specific, actionable feedback.
+            # Extract and parse the evaluation
+            return self.parse_evaluation(response.choices[0].message.content, post, iteration)
             
-            For iteration {iteration}/5, you'll evaluate a {platform} post about {category} and identify opportunities for improvement.
+        except Exception as e:
+            logger.exception(f"Error evaluating post: {str(e)}")
+            # Return basic feedback if evaluation fails
+            return {
+                "score": 5,
+                "strengths": ["Contains relevant information"],
+                "weaknesses": ["Could be more engaging"],
+                "improvement_suggestions": ["Add more specific details"],
+                "improved_version": post,  # Return original post
+                "iteration": iteration
+            }
+
+    def evaluate_batch(self,
+                       posts: List[str],
+                       platform: str,
+                       original_prompt: str,
+                       search_context: str,
+                       iteration: int,
+                       classification: Dict[str, Any] = None) -> List[Dict[str, Any]]:
+        """
+        Score several candidate posts in one call, without rewriting them.
+        
+        Args:
+            posts: Candidate posts
+            platform: Target platform
+            original_prompt: User's original request
+            search_context: Search results used for post generation
+            iteration: Current round number
+            classification: Classification data from Step 1
             
-            When evaluating, consider:
-            1. Content relevance: Does it address the original prompt?
-            2. Platform suitability: Is it formatted appropriately for {platform}?
-            3. Engagement potential: Will it resonate with the target audience?
-            4. Factual accuracy: Does it correctly incorporate information from the search context?
-            5. Authenticity: Does it sound natural and human-written?
-            6. Clarity: Is the message clear and well-structured?
+        Returns:
+            One evaluation per post, in order, with score, strengths, weaknesses and
+            improvement_suggestions; posts the critic skipped get their local score
+        """
+        category = (classification or {}).get("category", "general topic")
+        numbered = "\n\n".join(f"POST {index}:\n{post}" for index, post in enumerate(posts))
+        system_prompt = f"""
+            You are an expert social media critic comparing candidate {platform} posts about {category}.
             
-            Provide your evaluation in JSON format with these fields:
-            - score: Numerical rating from 1-10
-            - strengths: List of specific strengths
-            - weaknesses: List of specific weaknesses
-            - improvement_suggestions: Specific, actionable suggestions to improve the post
-            - improved_version: A rewritten version that addresses your feedback
+            Score every post from 1-10 on relevance to the request, platform suitability, engagement,
+            factual accuracy against the search context, authenticity and clarity. Use the full scale so
+            the candidates can be ranked.
             
-            Be specific and constructive in your feedback. For the improved_version, create a genuinely better post that addresses all the weaknesses.
+            Respond in JSON: {{"evaluations": [{{"index": <post number>, "score": <1-10>, "strengths": [...],
+            "weaknesses": [...], "improvement_suggestions": [...]}}, ...]}} with one entry per post.
+            Do not rewrite the posts.
             """
-            
-            # User prompt combines all context
-            user_prompt = f"""
+        user_prompt = f"""
             Original request: {original_prompt}
             
             SEARCH CONTEXT:
             {search_context}
             
-            POST TO EVALUATE ({platform}):
-            {post}
-            
-            Please evaluate this post and suggest improvements while keeping the overall message intact.
+            {numbered}
             """
-            
-            # Get evaluation from OpenAI
+        evaluations: Dict[int, Dict[str, Any]] = {}
+        try:
+            start = time.perf_counter()
             response = self.client.chat.completions.create(
                 model=self.model,
                 messages=[
@@ -112,59 +275,120 @@ class CriticAgent:
                     {"role": "user", "content": user_prompt}
                 ],
                 response_format={"type": "json_object"},
-                temperature=0.5,
+                temperature=0.2,
             )
-            
-            # Extract and parse the evaluation
-            content = response.choices[0].message.content
-            
-            # Debug output
-            logger.debug(f"Raw critique response: {content[:500]}...")
-            
-            # Parse JSON response
+            record_usage("critic", response, time.perf_counter() - start)
             import json
-            evaluation = json.loads(content)
+            for item in json.loads(response.choices[0].message.content).get("evaluations", []):
+                if isinstance(item, dict) and isinstance(item.get("index"), int) and isinstance(item.get("score"), (int, float)):
+                    evaluations[item["index"]] = item
+        except Exception as e:
+            logger.exception(f"Error in batched evaluation: {str(e)}")
+        
+        missing = [index for index in range(len(posts)) if index not in evaluations]
+        if missing:
+            local_scores = quality_scorer.score([posts[index] for index in missing], platform, search_context, original_prompt)
+            for index, local_score in zip(missing, local_scores):
+                evaluations[index] = {"score": round(float(local_score), 1), "scored_by": "local"}
+        results = []
+        for index in range(len(posts)):
+            evaluation = evaluations[index]
+            results.append({
+                "score": evaluation["score"],
+                "strengths": evaluation.get("strengths", []),
+                "weaknesses": evaluation.get("weaknesses", []),
+                "improvement_suggestions": evaluation.get("improvement_suggestions", []),
+                "scored_by": evaluation.get("scored_by", "critic"),
+                "iteration": iteration
+            })
+        return results
+    
+    def rewrite_post(self,
+                     post: str,
+                     platform: str,
+                     original_prompt: str,
+                     search_context: str,
+                     feedback: List[str] = None,
+                     classification: Dict[str, Any] = None,
+                     temperature: float = 0.9) -> str:
+        """
+        Rewrite a post to address critic feedback.
+        
+        Args:
+            post: Current post
+            platform: Target platform
+            original_prompt: User's original request
+            search_context: Search results used for post generation
+            feedback: Weaknesses and suggestions to address (a general improvement pass when empty)
+            classification: Classification data from Step 1
+            temperature: Sampling temperature; high values diversify beam candidates
             
-            # Ensure all required fields are present
-            evaluation.setdefault("score", 5)
-            evaluation.setdefault("strengths", [])
-            evaluation.setdefault("weaknesses", [])
-            evaluation.setdefault("improvement_suggestions", [])
-            evaluation.setdefault("improved_version", post)  # Default to original if missing
+        Returns:
+            The rewritten post, or the original post if the call fails
+        """
+        platform_config = get_platform_config(platform)
+        category = (classification or {}).get("category", "general topic")
+        notes = "\n".join(f"- {item}" for item in feedback or []) or "- Make it more engaging, specific and authentic."
+        system_prompt = f"""
+            You are an expert social media writer improving a {platform} post about {category}.
+            Use a {platform_config['tone']} tone, stay under {platform_config['max_length']} characters, use at most
+            {platform_config['hashtags_count']} hashtags and no "[Platform]" label. Keep facts consistent with the search context.
+            Reply with the rewritten post only.
+            """
+        user_prompt = f"""
+            Original request: {original_prompt}
             
-            # Add iteration info
-            evaluation["iteration"] = iteration
+            SEARCH CONTEXT:
+            {search_context}
             
-            return evaluation
+            CURRENT POST:
+            {post}
             
+            ADDRESS THIS FEEDBACK:
+            {notes}
+            """
+        try:
+            start = time.perf_counter()
+            response = self.client.chat.completions.create(
+                model=self.model,
+                messages=[
+                    {"role": "system", "content": system_prompt},
+                    {"role": "user", "content": user_prompt}
+                ],
+                temperature=temperature,
+                max_tokens=1000,
+            )
+            record_usage("rewrite", response, time.perf_counter() - start)
+            rewritten = (response.choices[0].message.content or "").strip()
+            return rewritten if len(rewritten) > 10 else post
         except Exception as e:
-            logger.exception(f"Error evaluating post: {str(e)}")
-            # Return basic feedback if evaluation fails
-            return {
-                "score": 5,
-                "strengths": ["Contains relevant information"],
-                "weaknesses": ["Could be more engaging"],
-                "improvement_suggestions": ["Add more specific details"],
-                "improved_version": post,  # Return original post
-                "iteration": iteration
-            }
+            logger.exception(f"Error rewriting post: {str(e)}")
+            return post
+
+@dataclass(frozen=True)
+class BeamConfig:
+    """Beam reflexion shape: rewrites per round, candidates kept and rounds."""
+    width: int = 4
+    keep: int = 2
+    depth: int = 2
 
 class ReflexionEngine:
     """
     Manages the reflexion process through multiple iterations of critique and improvement.
     """
     
-    def __init__(self, api_key=None, max_iterations=5):
+    def __init__(self, api_key=None, max_iterations=5, critic_format=None):
         """
         Initialize the reflexion engine.
         
         Args:
             api_key: OpenAI API key (defaults to environment variable)
             max_iterations: Maximum number of improvement iterations
+            critic_format: Critic output format, "rewrite" or "patch" (defaults to settings)
         """
-        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        self.api_key = api_key or settings.OPENAI_API_KEY
         self.max_iterations = max_iterations
-        self.critic = CriticAgent(api_key=self.api_key)
+        self.critic = CriticAgent(api_key=self.api_key, output_format=critic_format)
         logger.info(f"ReflexionEngine initialized with {max_iterations} max iterations")
     
     def refine_post(self, 
@@ -188,12 +412,12 @@ class ReflexionEngine:
         Returns:
             Dictionary with final post and optional history
         """
-        current_post = initial_post
         iteration_history = []
         
-        # Remove platform prefix if present
-        if current_post.startswith(f"[{platform.capitalize()}] "):
-            current_post = current_post[len(f"[{platform.capitalize()}] "):]
+        # Fix prefix, length, hashtags and emojis locally so the critic only judges quality
+        constraint_result = enforce_constraints(initial_post, platform)
+        current_post = constraint_result.post
+        initial_fixes = constraint_result.fixes
         
         logger.info(f"Starting reflexion process for {platform} post with {self.max_iterations} iterations")
         
@@ -201,7 +425,25 @@ class ReflexionEngine:
         for i in range(1, self.max_iterations + 1):
             logger.info(f"Reflexion iteration {i}/{self.max_iterations}")
             
+            # Skip the critic when the local scorer is confident the post is already good
+            local_score = float(quality_scorer.score([current_post], platform, search_context, original_prompt)[0])
+            if not quality_scorer.needs_critic(local_score):
+                metrics.counter("quality.critic_skipped").inc()
+                iteration_history.append({
+                    "iteration": i,
+                    "post": current_post,
+                    "score": round(local_score, 1),
+                    "strengths": [],
+                    "weaknesses": [],
+                    "suggestions": [],
+                    "scored_by": "local"
+                })
+                logger.info(f"Iteration {i} local score {local_score:.1f}/10 clears the quality gate. Stopping.")
+                break
+            metrics.counter("quality.critic_called").inc()
+            
             # Get critique and suggestions
+            iteration_start = time.perf_counter()
             evaluation = self.critic.evaluate_post(
                 post=current_post,
                 platform=platform,
@@ -210,6 +452,8 @@ class ReflexionEngine:
                 iteration=i,
                 classification=classification
             )
+            iteration_seconds = time.perf_counter() - iteration_start
+            metrics.histogram(f"reflexion.{self.critic.output_format}.iteration_seconds").observe(iteration_seconds)
             
             # Store iteration data
             iteration_data = {
@@ -218,8 +462,14 @@ class ReflexionEngine:
                 "score": evaluation.get("score", 0),
                 "strengths": evaluation.get("strengths", []),
                 "weaknesses": evaluation.get("weaknesses", []),
-                "suggestions": evaluation.get("improvement_suggestions", [])
+                "suggestions": evaluation.get("improvement_suggestions", []),
+                "local_score": round(local_score, 2),
+                "scored_by": "critic",
+                "seconds": round(iteration_seconds, 3)
             }
+            if "edits_applied" in evaluation:
+                iteration_data["edits_applied"] = evaluation["edits_applied"]
+                iteration_data["edits_rejected"] = len(evaluation["edits_rejected"])
             iteration_history.append(iteration_data)
             
             # Log evaluation summary
@@ -227,8 +477,10 @@ class ReflexionEngine:
             
             # Update the post with improved version
             improved_version = evaluation.get("improved_version", current_post)
-            if improved_version and len(improved_version) > 10:  # Basic validation
-                current_post = improved_version
+            if isinstance(improved_version, str) and len(improved_version) > 10:  # Basic validation
+                constraint_result = enforce_constraints(improved_version, platform)
+                current_post = constraint_result.post
+                iteration_data["constraint_fixes"] = constraint_result.fixes
             
             # Early stopping if we've reached a high score
             if evaluation.get("score", 0) >= 9:
@@ -242,7 +494,9 @@ class ReflexionEngine:
             "final_post": final_post,
             "platform": platform,
             "iterations_completed": len(iteration_history),
-            "final_score": iteration_history[-1]["score"] if iteration_history else 0
+            "final_score": iteration_history[-1]["score"] if iteration_history else 0,
+            "initial_constraint_fixes": initial_fixes,
+            "constraint_violations": constraint_result.violations
         }
         
         # Include detailed history if verbose
@@ -250,6 +504,103 @@ class ReflexionEngine:
             result["iteration_history"] = iteration_history
         
         return result
+    
+    def refine_post_beam(self,
+                         initial_post: str,
+                         platform: str,
+                         original_prompt: str,
+                         search_context: str,
+                         classification: Dict[str, Any] = None,
+                         beam: BeamConfig = BeamConfig(),
+                         verbose: bool = False) -> Dict[str, Any]:
+        """
+        Refine a post with beam search instead of a serial critique chain.
+        
+        Each round writes beam.width rewrites concurrently from the kept
+        candidates and their feedback, scores the kept candidates and the
+        rewrites with one batched critic call, and keeps the best beam.keep.
+        
+        Args:
+            initial_post: Initial generated post
+            platform: Target social media platform
+            original_prompt: User's original request
+            search_context: Search results for context
+            classification: Classification data from Step 1
+            beam: Width, kept candidates and depth of the search
+            verbose: Whether to return detailed history or just final post
+            
+        Returns:
+            Dictionary shaped like refine_post's result
+        """
+        constraint_result = enforce_constraints(initial_post, platform)
+        initial_fixes = constraint_result.fixes
+        # (post, evaluation) pairs, best first; the initial post has no critique yet
+        kept = [(constraint_result.post, {"score": 0, "weaknesses": [], "improvement_suggestions": []})]
+        iteration_history = []
+        
+        logger.info(f"Starting beam reflexion for {platform} post "
+                    f"(width {beam.width}, keep {beam.keep}, depth {beam.depth})")
+        
+        local_score = float(quality_scorer.score([kept[0][0]], platform, search_context, original_prompt)[0])
+        if not quality_scorer.needs_critic(local_score):
+            metrics.counter("quality.critic_skipped").inc()
+            iteration_history.append({"iteration": 1, "post": kept[0][0], "score": round(local_score, 1),
+                                      "strengths": [], "weaknesses": [], "suggestions": [], "scored_by": "local"})
+        else:
+            with ThreadPoolExecutor(max_workers=beam.width) as pool:
+                for round_number in range(1, beam.depth + 1):
+                    round_start = time.perf_counter()
+                    parents = [kept[index % len(kept)] for index in range(beam.width)]
+                    futures = [
+                        pool.submit(self.critic.rewrite_post, post, platform, original_prompt, search_context,
+                                    evaluation.get("weaknesses", []) + evaluation.get("improvement_suggestions", []),
+                                    classification)
+                        for post, evaluation in parents
+                    ]
+                    candidates = list(dict.fromkeys(
+                        [post for post, _ in kept] +
+                        [enforce_constraints(future.result(), platform).post for future in futures]
+                    ))
+                    
+                    evaluations = self.critic.evaluate_batch(
+                        candidates, platform, original_prompt, search_context, round_number, classification
+                    )
+                    metrics.counter("quality.critic_called").inc()
+                    ranked = sorted(zip(candidates, evaluations), key=lambda pair: -pair[1]["score"])
+                    kept = ranked[:beam.keep]
+                    metrics.histogram("reflexion.beam_round_seconds").observe(time.perf_counter() - round_start)
+                    
+                    best_post, best = kept[0]
+                    iteration_history.append({
+                        "iteration": round_number,
+                        "post": best_post,
+                        "score": best["score"],
+                        "strengths": best.get("strengths", []),
+                        "weaknesses": best.get("weaknesses", []),
+                        "suggestions": best.get("improvement_suggestions", []),
+                        "scored_by": best.get("scored_by", "critic"),
+                        "candidates": [{"post": post, "score": evaluation["score"]} for post, evaluation in ranked]
+                    })
+                    logger.info(f"Beam round {round_number}: best score {best['score']}/10 "
+                                f"from {len(candidates)} candidates")
+                    
+                    if best["score"] >= 9:
+                        logger.info(f"Reached high quality score ({best['score']}). Early stopping.")
+                        break
+        
+        final_post = iteration_history[-1]["post"]
+        result = {
+            "final_post": f"[{platform.capitalize()}] {final_post}",
+            "platform": platform,
+            "iterations_completed": len(iteration_history),
+            "final_score": iteration_history[-1]["score"],
+            "initial_constraint_fixes": initial_fixes,
+            "constraint_violations": check_post(final_post, platform),
+            "mode": "beam"
+        }
+        if verbose:
+            result["iteration_history"] = iteration_history
+        return result
 
 # Standalone helper function
 def refine_posts(posts: Dict[str, str], 
@@ -257,7 +608,8 @@ def refine_posts(posts: Dict[str, str],
                  search_context: str,
                  classification: Dict[str, Any] = None,
                  max_iterations: int = 5,
-                 verbose: bool = False) -> Dict[str, Any]:
+                 verbose: bool = False,
+                 beam: Optional[BeamConfig] = None) -> Dict[str, Any]:
     """
     Refine multiple posts with the reflexion engine.
     
@@ -268,13 +620,14 @@ def refine_posts(posts: Dict[str, str],
         classification: Classification data from Step 1
         max_iterations: Maximum refinement iterations
         verbose: Whether to return detailed history
+        beam: Refine with beam search of this shape instead of the serial chain
         
     Returns:
         Dictionary of refined posts with optional history
     """
     try:
         # Initialize engine
-        api_key = os.environ.get("OPENAI_API_KEY")
+        api_key = settings.OPENAI_API_KEY
         engine = ReflexionEngine(api_key=api_key, max_iterations=max_iterations)
         
         # Refine each post
@@ -284,14 +637,25 @@ def refine_posts(posts: Dict[str, str],
         for platform, post in posts.items():
             logger.info(f"Refining post for {platform}")
             
-            result = engine.refine_post(
-                initial_post=post,
-                platform=platform,
-                original_prompt=original_prompt,
-                search_context=search_context,
-                classification=classification,
-                verbose=verbose
-            )
+            if beam is not None:
+                result = engine.refine_post_beam(
+                    initial_post=post,
+                    platform=platform,
+                    original_prompt=original_prompt,
+                    search_context=search_context,
+                    classification=classification,
+                    beam=beam,
+                    verbose=verbose
+                )
+            else:
+                result = engine.refine_post(
+                    initial_post=post,
+                    platform=platform,
+                    original_prompt=original_prompt,
+                    search_context=search_context,
+                    classification=classification,
+                    verbose=verbose
+                )
             
             # Store the final post
             refined_posts[platform] = result["final_post"]
@@ -0,0 +1,115 @@
+"""
+Patch-style critic output.
+
+Instead of a full improved_version the critic can return a few edit
+operations anchored on exact text of the current post:
+
+    {"op": "replace", "find": "<exact text>", "text": "<new text>"}
+    {"op": "insert", "after": "<exact text>", "text": "<new text>"}   (or "before")
+    {"op": "delete", "find": "<exact text>"}
+
+Edits are applied in order. An edit whose anchor is missing or ambiguous
+(occurs more than once) is rejected rather than guessed at, and the other
+edits still apply.
+"""
+import logging
+import math
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+from ..models.platform import get_platform_config
+
+logger = logging.getLogger(__name__)
+
+OPERATIONS = ("replace", "insert", "delete")
+
+# Rough characters per token for English text
+CHARS_PER_TOKEN = 4
+# Tokens for the score, strengths, weaknesses and suggestions around the post or the edits
+FEEDBACK_TOKENS = 400
+
+EDIT_INSTRUCTIONS = """
+            - edits: A list of at most {max_edits} small edit operations that improve the post, each one of
+              {{"op": "replace", "find": "<exact text from the post>", "text": "<replacement>"}},
+              {{"op": "insert", "after": "<exact text from the post>", "text": "<text to add>"}} (or "before" instead of "after"),
+              {{"op": "delete", "find": "<exact text from the post>"}}.
+              Anchors must be copied exactly from the post and occur only once in it; include any spaces or
+              newlines the new text needs. Change only what your feedback requires and never rewrite the whole post.
+"""
+
+@dataclass
+class EditResult:
+    """A post after applying edits, with counts of applied and rejected edits."""
+    post: str
+    applied: int = 0
+    rejected: List[str] = field(default_factory=list)
+
+def critic_max_tokens(platform: str, output_format: str) -> int:
+    """
+    Output token budget for a critique on a platform.
+
+    A full rewrite needs room for a post of max_length characters; edits
+    rarely touch more than a quarter of a post, with a floor for short ones.
+    """
+    post_tokens = math.ceil(get_platform_config(platform)["max_length"] / CHARS_PER_TOKEN)
+    rewrite_tokens = math.ceil(post_tokens * 1.2)
+    if output_format == "patch":
+        return FEEDBACK_TOKENS + min(rewrite_tokens, max(150, post_tokens // 4))
+    return FEEDBACK_TOKENS + rewrite_tokens
+
+def _unique_index(post: str, anchor: Any) -> int:
+    """Index of anchor in post, or -1 when it's missing, empty or ambiguous."""
+    if not isinstance(anchor, str) or not anchor:
+        return -1
+    index = post.find(anchor)
+    if index == -1 or post.find(anchor, index + 1) != -1:
+        return -1
+    return index
+
+def apply_edits(post: str, edits: List[Dict[str, Any]]) -> EditResult:
+    """
+    Apply edit operations to a post.
+
+    Args:
+        post: Current post
+        edits: Operations as described in the module docstring
+
+    Returns:
+        EditResult with the edited post and the reasons for any rejected edit
+    """
+    result = EditResult(post=post)
+    for number, edit in enumerate(edits if isinstance(edits, list) else []):
+        if not isinstance(edit, dict) or edit.get("op") not in OPERATIONS:
+            result.rejected.append(f"edit {number}: unknown operation")
+            continue
+        op = edit["op"]
+        text = edit.get("text", "")
+        if op != "delete" and not isinstance(text, str):
+            result.rejected.append(f"edit {number}: text must be a string")
+            continue
+
+        current = result.post
+        if op == "insert":
+            side = "after" if "after" in edit else "before"
+            anchor = edit.get(side)
+            index = _unique_index(current, anchor)
+            if index == -1:
+                result.rejected.append(f"edit {number}: insert anchor not found exactly once")
+                continue
+            position = index + len(anchor) if side == "after" else index
+            result.post = current[:position] + text + current[position:]
+        else:
+            anchor = edit.get("find")
+            index = _unique_index(current, anchor)
+            if index == -1:
+                result.rejected.append(f"edit {number}: {op} target not found exactly once")
+                continue
+            replacement = text if op == "replace" else ""
+            result.post = current[:index] + replacement + current[index + len(anchor):]
+        result.applied += 1
+
+    if len(result.post.strip()) <= 10:
+        # Edits that gut the post are discarded wholesale
+        result.rejected.append("edits left the post empty")
+        result.post, result.applied = post, 0
+    return result
@@ -4,17 +4,18 @@ Enhanced with reflexion system that iteratively improves post quality.
 """
 
 import logging
-import os
 from typing import Dict, List, Optional, Any
 
 # Import from other modules
 from .classify_prompt import get_classifier
-from ..search.engine import query_search
-from .post_generator import generate_platform_posts
-from .critic_agent import refine_posts
+from ..search.engine import SearchEngine
+from ..search.context_store import (
+    EXTEND, MISS, REUSE, assess_reuse, merge_search_results, stored_as_search_results
+)
+from .post_generator import PostGenerator, fallback_post, generate_platform_posts
+from .critic_agent import BeamConfig, ReflexionEngine, refine_posts
 
-from dotenv import load_dotenv
-load_dotenv()
+from ..config import settings
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -30,39 +31,117 @@ class LLMEngine:
     Complete pipeline with reflexion-based post improvement.
     """
 
-    def __init__(self, openai_api_key=None, reflexion_iterations=5):
+    def __init__(self, openai_api_key=None, reflexion_iterations=5, generation_candidates=None):
         """
         Initialize the LLM engine.
         
         Args:
             openai_api_key: API key for OpenAI (defaults to environment variable)
             reflexion_iterations: Number of improvement iterations for posts
+            generation_candidates: Drafts requested per platform (defaults to settings.GENERATION_CANDIDATES)
         """
-        self.openai_api_key = openai_api_key or os.environ.get("OPENAI_API_KEY")
+        self.openai_api_key = openai_api_key or settings.OPENAI_API_KEY
         self.reflexion_iterations = reflexion_iterations
-        logger.info(f"LLMEngine initialized with {reflexion_iterations} reflexion iterations")
+        self.generation_candidates = generation_candidates or settings.GENERATION_CANDIDATES
+        logger.info(f"LLMEngine initialized with {reflexion_iterations} reflexion iterations "
+                    f"and {self.generation_candidates} generation candidates")
 
-    def generate_post_with_reflexion(self, prompt: str, platforms: list[str], verbose_reflexion=False) -> dict:
+    def search(self,
+               prompt: str,
+               classification: Dict[str, Any],
+               stored_search: Optional[Dict[str, Any]] = None) -> tuple:
         """
-        Generates social media posts with classification, search, and iterative refinement.
+        Runs the search step, reusing a conversation's stored results when they cover the prompt.
+        
+        Args:
+            prompt: User's input prompt
+            classification: Classification of the prompt
+            stored_search: Stored conversation context (see SearchContextStore.load)
+            
+        Returns:
+            (search_results, decision) where decision is "reuse", "extend" or "miss"
+        """
+        decision, missing = assess_reuse(stored_search, prompt, classification)
+        if decision == REUSE:
+            return stored_as_search_results(stored_search), decision
+        engine = SearchEngine(api_key=self.openai_api_key)
+        if decision == EXTEND:
+            # Only the keywords the stored results don't cover are searched
+            fresh = engine.search(
+                " ".join(sorted(missing)),
+                category=classification.get('category'),
+                intent=classification.get('intent')
+            )
+            return merge_search_results(stored_search, fresh, missing), decision
+        return engine.search(
+            prompt,
+            category=classification.get('category'),
+            subtopics=classification.get('subtopics'),
+            intent=classification.get('intent')
+        ), MISS
+
+    def classify(self, prompt: str) -> Dict[str, Any]:
+        """
+        Runs only the classification step.
+        
+        Args:
+            prompt: User's input prompt
+            
+        Returns:
+            Classification dictionary (category, confidence, intent, subtopics, focus)
+        """
+        classifier = get_classifier(api_key=self.openai_api_key)
+        return classifier.classify(prompt)
+
+    def run_pipeline(self,
+                     prompt: str,
+                     platforms: list[str],
+                     stored_search: Optional[Dict[str, Any]] = None,
+                     classification: Optional[Dict[str, Any]] = None,
+                     seed_posts: Optional[Dict[str, str]] = None,
+                     beam: Optional[BeamConfig] = None,
+                     search_results: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Runs the full pipeline and returns the output of every stage.
         
         Args:
             prompt: User's input prompt for post generation
             platforms: List of social media platforms to target
-            verbose_reflexion: Whether to include detailed reflexion history
+            stored_search: Search context stored for the conversation, if any
+            classification: Classification computed earlier; skips step 1 when given
+            seed_posts: Existing posts (platform -> content) used as the reflexion
+                starting point instead of generating a first draft
+            beam: Beam reflexion shape; the serial critique chain is used when None
+            search_results: Search results computed earlier; skips step 2 when given
             
         Returns:
-            Dictionary of platform-specific posts (and optional refinement data)
+            Dictionary with classification, search_results, search_decision,
+            search_context, initial_posts, posts (final, per platform),
+            refinement_data (per-iteration history) and fallbacks (the stages
+            that failed and produced placeholder output instead)
         """
         logger.info(f"Starting generation for prompt: {prompt}")
+        result = {
+            "prompt": prompt,
+            "platforms": platforms,
+            "classification": None,
+            "search_results": None,
+            "search_decision": None,
+            "search_context": "",
+            "initial_posts": {},
+            "posts": {},
+            "refinement_data": {},
+            "fallbacks": []
+        }
         try:
             # STEP 1: Classify the prompt topic using OpenAI
-            classifier = get_classifier(api_key=self.openai_api_key)
-            classification = classifier.classify(prompt)
+            if classification is None:
+                classification = self.classify(prompt)
+            result["classification"] = classification
+            if classification.get("fallback"):
+                result["fallbacks"].append("classification")
 
             logger.info("Step 1 Complete: Prompt classified")
-            print("classification----------->", classification)
-
             logger.debug(f"Prompt classified as: {classification['category']} with confidence {classification['confidence']}")
             logger.debug(f"User intent: {classification.get('intent')}")
             logger.debug(f"Subtopics: {classification.get('subtopics')}")
@@ -70,77 +149,160 @@ class LLMEngine:
 
             # STEP 2: Enhanced web search using classification data
             try:
-                search_context = query_search(
-                    prompt=prompt,
-                    category=classification.get('category'),
-                    subtopics=classification.get('subtopics'),
-                    intent=classification.get('intent')
-                )
-                logger.info("Step 2 Complete: Search context retrieved")
+                if search_results is not None:
+                    decision = "provided"
+                else:
+                    search_results, decision = self.search(prompt, classification, stored_search)
+                search_context = SearchEngine.format_search_context(search_results)
+                result["search_results"] = search_results
+                result["search_decision"] = decision
+                if search_results.get("fallback"):
+                    result["fallbacks"].append("search")
+                logger.info(f"Step 2 Complete: Search context retrieved ({decision})")
                 logger.debug(f"Search context length: {len(search_context)}")
             except Exception as search_error:
                 logger.error(f"Search step failed: {search_error}")
                 search_context = "Search data unavailable."
+                result["fallbacks"].append("search")
+            result["search_context"] = search_context
 
             # STEP 3: Generate initial platform-specific posts using search context
-            try:
-                initial_posts = generate_platform_posts(
-                    prompt=prompt,
-                    search_context=search_context,
-                    platforms=platforms,
-                    classification=classification
-                )
-                logger.info("Step 3 Complete: Initial platform-specific posts generated")
-            except Exception as generation_error:
-                logger.error(f"Post generation step failed: {generation_error}")
-                # Fallback results
-                initial_posts = {
-                    platform: f"[{platform.capitalize()}] Post about {prompt} in the {classification.get('category', 'general')} category."
-                    for platform in platforms
-                }
-                
+            seed_posts = {platform: post for platform, post in (seed_posts or {}).items() if platform in platforms}
+            to_generate = [platform for platform in platforms if platform not in seed_posts]
+            initial_posts = {}
+            if to_generate:
+                try:
+                    initial_posts = generate_platform_posts(
+                        prompt=prompt,
+                        search_context=search_context,
+                        platforms=to_generate,
+                        classification=classification,
+                        candidates=self.generation_candidates
+                    )
+                    logger.info("Step 3 Complete: Initial platform-specific posts generated")
+                except Exception as generation_error:
+                    logger.error(f"Post generation step failed: {generation_error}")
+                    # Fallback results
+                    initial_posts = {
+                        platform: f"[{platform.capitalize()}] Post about {prompt} in the {classification.get('category', 'general')} category."
+                        for platform in to_generate
+                    }
+                    result["fallbacks"].extend(f"generation:{platform}" for platform in to_generate)
+                else:
+                    # generate_platform_posts swallows its errors and returns placeholders
+                    placeholders = (fallback_post(prompt), f"Post about {prompt}")
+                    result["fallbacks"].extend(
+                        f"generation:{platform}" for platform, post in initial_posts.items()
+                        if post in (f"[{platform.capitalize()}] {placeholder}" for placeholder in placeholders)
+                    )
+            for platform, post in seed_posts.items():
+                # Near-duplicates of stored posts start reflexion from the stored post
+                initial_posts[platform] = f"[{platform.capitalize()}] {post}"
+            if seed_posts:
+                logger.info(f"Step 3: Seeded {', '.join(seed_posts)} from existing posts")
+            initial_posts = {platform: initial_posts[platform] for platform in platforms if platform in initial_posts}
+            result["initial_posts"] = initial_posts
+            result["posts"] = initial_posts
+
             # STEP 4: Reflexion - iteratively improve posts with critic feedback
             try:
-                logger.info(f"Step 4: Starting reflexion process with {self.reflexion_iterations} iterations")
+                if beam is not None:
+                    logger.info(f"Step 4: Starting beam reflexion ({beam.width} wide, {beam.depth} deep)")
+                else:
+                    logger.info(f"Step 4: Starting reflexion process with {self.reflexion_iterations} iterations")
                 refined_results = refine_posts(
                     posts=initial_posts,
                     original_prompt=prompt,
                     search_context=search_context,
                     classification=classification,
                     max_iterations=self.reflexion_iterations,
-                    verbose=verbose_reflexion
+                    verbose=True,
+                    beam=beam
                 )
-                
-                # Handle different return formats based on verbosity
-                if verbose_reflexion:
-                    final_posts = refined_results["posts"]
-                    refinement_data = refined_results["refinement_data"]
-                    logger.info("Step 4 Complete: Posts refined with detailed history")
-                    
-                    # Return both posts and refinement data
-                    return {
-                        "posts": final_posts,
-                        "refinement_data": refinement_data
-                    }
-                else:
-                    final_posts = refined_results
+                # refine_posts returns the input posts unchanged if it fails
+                if "posts" in refined_results and "refinement_data" in refined_results:
+                    result["posts"] = refined_results["posts"]
+                    result["refinement_data"] = refined_results["refinement_data"]
                     logger.info("Step 4 Complete: Posts refined")
-                    
-                    # Return just the posts
-                    return final_posts
-                    
             except Exception as reflexion_error:
-                logger.error(f"Reflexion step failed: {reflexion_error}")
                 # Fall back to initial posts if reflexion fails
-                return initial_posts
+                logger.error(f"Reflexion step failed: {reflexion_error}")
+
+            return result
 
         except Exception as e:
             logger.exception(f"Failed to generate post with reflexion: {str(e)}")
-            results = {
+            result["fallbacks"].append("pipeline")
+            result["posts"] = {
                 platform: f"[{platform.capitalize()}] Simple post about: {prompt}"
                 for platform in platforms
             }
-            return results
+            return result
+
+    def regenerate_platform_post(self,
+                                 prompt: str,
+                                 platform: str,
+                                 previous_post: str,
+                                 feedback: str,
+                                 classification: Optional[Dict[str, Any]] = None,
+                                 search_context: str = "") -> Dict[str, Any]:
+        """
+        Revises one platform's post from user feedback, reusing stored pipeline state.
+        
+        Classification and search are not re-run; only this platform's
+        generation and critique steps are.
+        
+        Args:
+            prompt: Original user request for the post
+            platform: Platform of the post being revised
+            previous_post: Current post content
+            feedback: User feedback to address
+            classification: Classification stored with the post
+            search_context: Search context stored with the post
+            
+        Returns:
+            Reflexion result for the platform, including iteration_history
+        """
+        logger.info(f"Regenerating {platform} post from feedback")
+        generator = PostGenerator(api_key=self.openai_api_key)
+        draft = generator.generate_post(
+            prompt=prompt,
+            search_context=search_context,
+            platform=platform,
+            classification=classification,
+            previous_post=previous_post,
+            feedback=feedback,
+            n=self.generation_candidates
+        )
+        reflexion = ReflexionEngine(api_key=self.openai_api_key, max_iterations=self.reflexion_iterations)
+        return reflexion.refine_post(
+            initial_post=draft,
+            platform=platform,
+            original_prompt=f"{prompt}\n\nRevision feedback: {feedback}",
+            search_context=search_context,
+            classification=classification,
+            verbose=True
+        )
+
+    def generate_post_with_reflexion(self, prompt: str, platforms: list[str], verbose_reflexion=False) -> dict:
+        """
+        Generates social media posts with classification, search, and iterative refinement.
+        
+        Args:
+            prompt: User's input prompt for post generation
+            platforms: List of social media platforms to target
+            verbose_reflexion: Whether to include detailed reflexion history
+            
+        Returns:
+            Dictionary of platform-specific posts (and optional refinement data)
+        """
+        result = self.run_pipeline(prompt, platforms)
+        if verbose_reflexion:
+            return {
+                "posts": result["posts"],
+                "refinement_data": result["refinement_data"]
+            }
+        return result["posts"]
 
 
 # Standalone function for backward compatibility
@@ -158,4 +320,48 @@ def generate_post_with_reflexion(prompt: str, platforms: list[str], reflexion_it
         Dictionary of platform-specific posts (and optional refinement data)
     """
     engine = LLMEngine(reflexion_iterations=reflexion_iterations)
-    return engine.generate_post_with_reflexion(prompt, platforms, verbose_reflexion)
\ No newline at end of file
+    return engine.generate_post_with_reflexion(prompt, platforms, verbose_reflexion)
+
+def run_generation_pipeline(prompt: str,
+                            platforms: list[str],
+                            reflexion_iterations=5,
+                            stored_search: Optional[Dict[str, Any]] = None,
+                            classification: Optional[Dict[str, Any]] = None,
+                            seed_posts: Optional[Dict[str, str]] = None,
+                            beam: Optional[BeamConfig] = None) -> Dict[str, Any]:
+    """
+    Standalone function returning every stage's output, for callers that persist it.
+    
+    Args:
+        prompt: User's input prompt for post generation
+        platforms: List of social media platforms to target
+        reflexion_iterations: Number of refinement iterations
+        stored_search: Search context stored for the conversation, if any
+        classification: Classification computed earlier, if any
+        seed_posts: Existing posts to refine instead of drafting from scratch
+        beam: Beam reflexion shape; serial reflexion when None
+        
+    Returns:
+        Dictionary as returned by LLMEngine.run_pipeline
+    """
+    engine = LLMEngine(reflexion_iterations=reflexion_iterations)
+    return engine.run_pipeline(
+        prompt,
+        platforms,
+        stored_search=stored_search,
+        classification=classification,
+        seed_posts=seed_posts,
+        beam=beam
+    )
+
+def classify_prompt(prompt: str) -> Dict[str, Any]:
+    """
+    Standalone function running only the classification step.
+    
+    Args:
+        prompt: User's input prompt
+        
+    Returns:
+        Classification dictionary
+    """
+    return LLMEngine().classify(prompt)
@@ -0,0 +1,172 @@
+"""
+Offline evaluation of generation strategies.
+
+Compares strategies that trade initial candidates against reflexion rounds:
+"1x5" drafts one post and allows five critic rounds, "3x2" requests three
+candidates in one completion, starts from the locally best one and allows
+two rounds. Each prompt is classified and searched once and every strategy
+reuses that context. Final posts are scored by one independent critic pass
+(not counted as the strategy's cost), next to the strategy's wall time, API
+calls, tokens and the critic rounds it actually used.
+
+Usage:
+    python -m app.llm.evaluation --prompts prompts.txt --platforms twitter linkedin \\
+        --strategies 1x5 3x2 5x1 --output evaluation.json
+"""
+import argparse
+import json
+import logging
+import statistics
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from ..search.engine import SearchEngine
+from .constraints import strip_platform_prefix
+from .critic_agent import CriticAgent, refine_posts
+from .engine import LLMEngine
+from .post_generator import generate_platform_posts
+from .usage import usage_totals
+
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class Strategy:
+    """Candidates requested per platform and maximum reflexion rounds."""
+    candidates: int
+    iterations: int
+
+    @property
+    def name(self) -> str:
+        return f"{self.candidates}x{self.iterations}"
+
+    @classmethod
+    def parse(cls, text: str) -> "Strategy":
+        """Parse "<candidates>x<iterations>", e.g. "3x2"."""
+        try:
+            candidates, iterations = (int(part) for part in text.lower().split("x"))
+        except ValueError:
+            raise ValueError(f"Strategy must look like 3x2, got {text!r}")
+        if candidates < 1 or iterations < 0:
+            raise ValueError(f"Strategy {text!r} needs at least one candidate and non-negative rounds")
+        return cls(candidates, iterations)
+
+def _usage_delta(before: Dict[str, int], after: Dict[str, int]) -> Dict[str, int]:
+    return {
+        name.removeprefix("llm."): after[name] - before.get(name, 0)
+        for name in after
+        if after[name] != before.get(name, 0)
+    }
+
+def run_strategy(strategy: Strategy,
+                 prompt: str,
+                 platforms: Sequence[str],
+                 search_context: str,
+                 classification: Dict[str, Any],
+                 judge: CriticAgent) -> List[Dict[str, Any]]:
+    """
+    Generate and refine posts for one prompt with one strategy, then judge them.
+
+    Returns:
+        One row per platform with the judged score and the strategy's cost
+    """
+    before = usage_totals()
+    start = time.perf_counter()
+    drafts = generate_platform_posts(prompt, search_context, list(platforms), classification,
+                                     candidates=strategy.candidates)
+    refined = {"posts": drafts, "refinement_data": {}}
+    if strategy.iterations:
+        result = refine_posts(drafts, prompt, search_context, classification,
+                              max_iterations=strategy.iterations, verbose=True)
+        if "refinement_data" in result:
+            refined = result
+    seconds = time.perf_counter() - start
+    cost = _usage_delta(before, usage_totals())
+
+    rows = []
+    for platform in platforms:
+        post = strip_platform_prefix(refined["posts"].get(platform, ""))
+        judged = judge.evaluate_post(post, platform, prompt, search_context, iteration=1,
+                                     classification=classification)
+        refinement = refined["refinement_data"].get(platform, {})
+        rows.append({
+            "strategy": strategy.name,
+            "prompt": prompt,
+            "platform": platform,
+            "judge_score": judged.get("score"),
+            "rounds": refinement.get("iterations_completed", 0),
+            "seconds": round(seconds, 3),
+            "cost": cost
+        })
+    return rows
+
+def summarize(rows: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    """Per-strategy means of judge score, rounds, time and per-prompt cost."""
+    summary = {}
+    for name in dict.fromkeys(row["strategy"] for row in rows):
+        selected = [row for row in rows if row["strategy"] == name]
+        scores = [row["judge_score"] for row in selected if isinstance(row["judge_score"], (int, float))]
+        # Time and cost are per prompt (shared by its platforms)
+        per_prompt = {row["prompt"]: row for row in selected}.values()
+        cost_names = sorted({metric for row in per_prompt for metric in row["cost"]})
+        summary[name] = {
+            "posts": len(selected),
+            "mean_judge_score": round(statistics.mean(scores), 2) if scores else None,
+            "mean_rounds": round(statistics.mean(row["rounds"] for row in selected), 2),
+            "mean_seconds_per_prompt": round(statistics.mean(row["seconds"] for row in per_prompt), 2),
+            "mean_cost_per_prompt": {
+                metric: round(statistics.mean(row["cost"].get(metric, 0) for row in per_prompt), 1)
+                for metric in cost_names
+            }
+        }
+    return summary
+
+def evaluate(prompts: Sequence[str],
+             platforms: Sequence[str],
+             strategies: Sequence[Strategy],
+             api_key: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Run every strategy on every prompt.
+
+    Args:
+        prompts: User requests to generate for
+        platforms: Target platforms
+        strategies: Strategies to compare
+        api_key: OpenAI API key (defaults to settings)
+
+    Returns:
+        {"summary": per-strategy summary, "rows": per-post results}
+    """
+    engine = LLMEngine(openai_api_key=api_key)
+    judge = CriticAgent(api_key=api_key)
+    rows = []
+    for prompt in prompts:
+        classification = engine.classify(prompt)
+        search_results, _ = engine.search(prompt, classification)
+        search_context = SearchEngine.format_search_context(search_results)
+        for strategy in strategies:
+            logger.info(f"Evaluating {strategy.name} on: {prompt[:60]}")
+            rows.extend(run_strategy(strategy, prompt, platforms, search_context, classification, judge))
+    return {"summary": summarize(rows), "rows": rows}
+
+def main():
+    """Compare generation strategies and print (or save) the report."""
+    parser = argparse.ArgumentParser(description="Compare best-of-n generation against reflexion rounds")
+    parser.add_argument("--prompts", required=True, help="File with one prompt per line")
+    parser.add_argument("--platforms", nargs="+", default=["twitter", "linkedin"])
+    parser.add_argument("--strategies", nargs="+", default=["1x5", "3x2", "5x1"],
+                        help="<candidates>x<reflexion rounds>")
+    parser.add_argument("--output", help="Write the full JSON report here")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    with open(args.prompts, "r", encoding="utf-8") as handle:
+        prompts = [line.strip() for line in handle if line.strip()]
+    report = evaluate(prompts, args.platforms, [Strategy.parse(text) for text in args.strategies])
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as handle:
+            json.dump(report, handle, indent=2)
+    print(json.dumps(report["summary"], indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Local quality scoring that gates LLM critic calls.
+
+Candidate posts are scored in batches from vectorized features: length fit,
+readability (Flesch reading ease), hashtag and emoji fit, term overlap with
+the search context and coverage of the prompt's terms. A linear model maps
+the features to the critic's 1-10 scale; its weights default to hand-set
+values and can be fitted to historical critic scores with
+``calibrate_quality.py``. The reflexion loop only calls the critic when the
+local score is below the threshold or within the model's uncertainty margin
+of it.
+"""
+import json
+import logging
+import os
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..config import settings
+from ..models.platform import get_platform_config, max_emojis
+from ..search.parser import Analyzer
+from .constraints import count_emojis, count_hashtags, enforce_constraints, strip_platform_prefix
+
+logger = logging.getLogger(__name__)
+
+FEATURES = ("length_fit", "readability", "hashtag_fit", "emoji_fit", "context_overlap", "prompt_coverage")
+
+# Hand-set defaults: a post that is perfect on every feature scores 10
+DEFAULT_WEIGHTS = (1.5, 1.5, 1.0, 0.5, 2.5, 2.0)
+DEFAULT_BIAS = 1.0
+
+# Flesch reading ease band considered easy enough without being simplistic
+READABILITY_BAND = (40.0, 80.0)
+READABILITY_FALLOFF = 30.0
+
+_WORD = re.compile(r"[A-Za-z][A-Za-z'-]*")
+_SENTENCE_SPLIT = re.compile(r"[.!?]+(?=\s|$)|\n+")
+_VOWEL_GROUP = re.compile(r"[aeiouy]+")
+_analyzer = Analyzer()
+
+@dataclass
+class QualityModel:
+    """Linear scoring model; margin is the expected error against the critic."""
+    weights: List[float] = field(default_factory=lambda: list(DEFAULT_WEIGHTS))
+    bias: float = DEFAULT_BIAS
+    margin: Optional[float] = None
+    samples: int = 0
+
+    @classmethod
+    def load(cls, path: str) -> "QualityModel":
+        """Load a calibrated model, falling back to the defaults."""
+        try:
+            with open(path, "r", encoding="utf-8") as handle:
+                data = json.load(handle)
+            model = cls(weights=[float(w) for w in data["weights"]], bias=float(data["bias"]),
+                        margin=data.get("margin"), samples=int(data.get("samples", 0)))
+            if len(model.weights) != len(FEATURES):
+                raise ValueError(f"expected {len(FEATURES)} weights, got {len(model.weights)}")
+            logger.info(f"Loaded quality model calibrated on {model.samples} critic scores")
+            return model
+        except FileNotFoundError:
+            return cls()
+        except (KeyError, TypeError, ValueError) as e:
+            logger.error(f"Ignoring invalid quality model at {path}: {str(e)}")
+            return cls()
+
+    def save(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as handle:
+            json.dump({"features": list(FEATURES), **asdict(self)}, handle, indent=2)
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        return np.clip(features @ np.asarray(self.weights) + self.bias, 1.0, 10.0)
+
+def _text_stats(post: str):
+    words = _WORD.findall(post)
+    syllables = sum(max(1, len(_VOWEL_GROUP.findall(word.lower()))) for word in words)
+    sentences = max(1, sum(1 for sentence in _SENTENCE_SPLIT.split(post) if _WORD.search(sentence)))
+    return len(post), len(words), sentences, syllables, count_hashtags(post), count_emojis(post)
+
+def _term_sets(texts: Sequence[str]):
+    return [set(_analyzer.analyze(text or "")) for text in texts]
+
+def extract_features(posts: Sequence[str], platform: str, search_context: str = "", prompt: str = "") -> np.ndarray:
+    """
+    Feature matrix for a batch of candidate posts on one platform.
+
+    Args:
+        posts: Candidate post contents ("[Platform]" prefixes are ignored)
+        platform: Target platform
+        search_context: Search context the posts were written from
+        prompt: User's request
+
+    Returns:
+        Array of shape (len(posts), len(FEATURES)), every feature in [0, 1]
+    """
+    posts = [strip_platform_prefix(post or "") for post in posts]
+    if not posts:
+        return np.zeros((0, len(FEATURES)))
+    config = get_platform_config(platform)
+    stats = np.array([_text_stats(post) for post in posts], dtype=float)
+    chars, words, sentences, syllables, hashtags, emojis = stats.T
+    safe_words = np.maximum(words, 1)
+
+    # Length: 0 over the limit, ramps up to 1 at the ideal minimum
+    max_length = config["max_length"]
+    ideal_min = min(0.5 * max_length, 600.0)
+    length_fit = np.where(chars > max_length, 0.0, np.clip(chars / ideal_min, 0.0, 1.0))
+
+    # Readability: Flesch reading ease, 1 inside the band and falling off outside it
+    flesch = 206.835 - 1.015 * (words / sentences) - 84.6 * (syllables / safe_words)
+    low, high = READABILITY_BAND
+    distance = np.maximum(low - flesch, 0.0) + np.maximum(flesch - high, 0.0)
+    readability = np.where(words > 0, np.clip(1.0 - distance / READABILITY_FALLOFF, 0.0, 1.0), 0.0)
+
+    # Hashtags: penalize excess; platforms that expect several tags penalize none
+    limit = config["hashtags_count"]
+    hashtag_fit = np.where(hashtags > limit, np.clip(1.0 - (hashtags - limit) / max(limit, 1), 0.0, 1.0), 1.0)
+    if limit >= 3:
+        hashtag_fit = np.where(hashtags == 0, 0.5, hashtag_fit)
+
+    allowed = np.array([max_emojis(platform, int(count)) for count in words], dtype=float)
+    emoji_fit = np.where(emojis > allowed, np.clip(1.0 - (emojis - allowed) / np.maximum(allowed, 1.0), 0.0, 1.0), 1.0)
+
+    # Term overlap through a binary post x vocabulary matrix
+    post_terms = _term_sets(posts)
+    vocabulary: Dict[str, int] = {}
+    for terms in post_terms:
+        for term in terms:
+            vocabulary.setdefault(term, len(vocabulary))
+    matrix = np.zeros((len(posts), max(len(vocabulary), 1)))
+    for row, terms in enumerate(post_terms):
+        matrix[row, [vocabulary[term] for term in terms]] = 1.0
+    term_counts = np.maximum(matrix.sum(axis=1), 1.0)
+
+    def indicator(terms):
+        vector = np.zeros(matrix.shape[1])
+        vector[[vocabulary[term] for term in terms if term in vocabulary]] = 1.0
+        return vector
+
+    context_terms, prompt_terms = _term_sets([search_context, prompt])
+    if context_terms:
+        context_overlap = (matrix @ indicator(context_terms)) / term_counts
+    else:
+        context_overlap = np.full(len(posts), 0.5)
+    if prompt_terms:
+        prompt_coverage = (matrix @ indicator(prompt_terms)) / len(prompt_terms)
+    else:
+        prompt_coverage = np.ones(len(posts))
+
+    return np.column_stack([length_fit, readability, hashtag_fit, emoji_fit, context_overlap, prompt_coverage])
+
+class QualityScorer:
+    """Scores candidate posts locally and decides when the critic is needed."""
+
+    def __init__(self,
+                 model_path: Optional[str] = None,
+                 threshold: float = 8.0,
+                 margin: float = 1.0,
+                 enabled: bool = True):
+        """
+        Initialize the scorer.
+
+        Args:
+            model_path: Calibrated model JSON (defaults are used when missing)
+            threshold: Local score a post needs before the critic can be skipped
+            margin: Uncertainty band above the threshold, unless the model was calibrated
+            enabled: When False every post goes to the critic
+        """
+        self.model_path = model_path
+        self.threshold = threshold
+        self.enabled = enabled
+        self.model = QualityModel.load(model_path) if model_path else QualityModel()
+        self.margin = self.model.margin if self.model.margin is not None else margin
+
+    def score(self, posts: Sequence[str], platform: str, search_context: str = "", prompt: str = "") -> np.ndarray:
+        """Local 1-10 scores for a batch of candidate posts."""
+        return self.model.predict(extract_features(posts, platform, search_context, prompt))
+
+    def needs_critic(self, local_score: float) -> bool:
+        """True unless the local score clears the threshold by more than the margin."""
+        return not self.enabled or local_score < self.threshold + self.margin
+
+def rank_candidates(candidates: Sequence[str],
+                    platform: str,
+                    search_context: str = "",
+                    prompt: str = "",
+                    scorer: Optional[QualityScorer] = None) -> List[Tuple[str, float]]:
+    """
+    Rank candidate posts by local score after fixing their platform constraints.
+
+    Args:
+        candidates: Candidate post contents
+        platform: Target platform
+        search_context: Search context the candidates were written from
+        prompt: User's request
+        scorer: Scorer to use (defaults to the shared one)
+
+    Returns:
+        (fixed post, local score) pairs, best first
+    """
+    fixed = [enforce_constraints(candidate, platform).post for candidate in candidates]
+    scores = (scorer or quality_scorer).score(fixed, platform, search_context, prompt)
+    order = np.argsort(-scores, kind="stable")
+    return [(fixed[index], float(scores[index])) for index in order]
+
+def fit_model(features: np.ndarray, scores: np.ndarray, ridge: float = 1.0) -> QualityModel:
+    """
+    Fit weights to critic scores by ridge-regularized least squares.
+
+    Args:
+        features: (n, len(FEATURES)) feature matrix
+        scores: Critic scores for the same posts
+        ridge: L2 penalty on the weights (not the bias)
+
+    Returns:
+        QualityModel whose margin is the residual RMSE
+    """
+    design = np.column_stack([features, np.ones(len(features))])
+    penalty = np.eye(design.shape[1]) * ridge
+    penalty[-1, -1] = 0.0
+    solution = np.linalg.solve(design.T @ design + penalty, design.T @ scores)
+    model = QualityModel(weights=solution[:-1].tolist(), bias=float(solution[-1]), samples=len(scores))
+    model.margin = float(np.sqrt(np.mean((model.predict(features) - scores) ** 2)))
+    return model
+
+def compare_scores(local: np.ndarray, critic: np.ndarray, threshold: float, margin: float) -> Dict[str, float]:
+    """
+    Agreement between local and critic scores, and what the gate would have done.
+
+    Returns:
+        mae, pearson r, the fraction of posts whose critic call would be skipped
+        and, among those, the fraction the critic scored below the threshold
+    """
+    skipped = local >= threshold + margin
+    correlation = float(np.corrcoef(local, critic)[0, 1]) if len(local) > 1 and local.std() and critic.std() else 0.0
+    return {
+        "samples": int(len(local)),
+        "mae": float(np.mean(np.abs(local - critic))) if len(local) else 0.0,
+        "pearson_r": correlation,
+        "skip_rate": float(skipped.mean()) if len(local) else 0.0,
+        "false_skip_rate": float((critic[skipped] < threshold).mean()) if skipped.any() else 0.0
+    }
+
+# Shared scorer used by the reflexion loop
+quality_scorer = QualityScorer(
+    model_path=settings.QUALITY_MODEL_PATH,
+    threshold=settings.QUALITY_GATE_THRESHOLD,
+    margin=settings.QUALITY_GATE_MARGIN,
+    enabled=settings.QUALITY_GATE_ENABLED
+)
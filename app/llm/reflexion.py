@@ -1,11 +1,12 @@
 # app/llm/reflexion.py
 
 import logging
-import os
 import json
 from typing import Dict, Any, Optional, List
 from openai import OpenAI
 
+from ..config import settings
+
 logger = logging.getLogger(__name__)
 
 class ReflexionEngine:
@@ -22,7 +23,7 @@ class ReflexionEngine:
             api_key: OpenAI API key (defaults to environment variable)
             model: OpenAI model to use for refinement
         """
-        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        self.api_key = api_key or settings.OPENAI_API_KEY
         self.model = model
         self.client = OpenAI(api_key=self.api_key) if self.api_key else None
         self.post_refiner = PostRefiner(api_key=self.api_key, model=model)
@@ -69,7 +70,7 @@ class PostRefiner:
             api_key: OpenAI API key (defaults to environment variable)
             model: OpenAI model to use for refining posts
         """
-        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        self.api_key = api_key or settings.OPENAI_API_KEY
         self.model = model
         self.client = OpenAI(api_key=self.api_key) if self.api_key else None
         logger.info(f"PostRefiner initialized using OpenAI model: {model}")
@@ -206,7 +207,7 @@ def improve_post(base_post: str, context: str, classification: Optional[Dict[str
     """
     try:
         # Get API key from environment variable
-        api_key = os.environ.get("OPENAI_API_KEY")
+        api_key = settings.OPENAI_API_KEY
         
         # Initialize reflexion engine for backward compatibility
         engine = ReflexionEngine(api_key=api_key)
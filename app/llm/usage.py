@@ -0,0 +1,31 @@
+"""
+Per-stage accounting of OpenAI calls.
+
+Each stage ("generation", "critic", ...) gets call and token counters in
+the shared metrics registry, so evaluations and the /metrics snapshot can
+compare what a strategy costs.
+"""
+import logging
+from typing import Any, Dict, Optional
+
+from ..metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+def record_usage(stage: str, response: Any, seconds: Optional[float] = None):
+    """Count one API call and its token usage under llm.<stage>.*."""
+    metrics.counter(f"llm.{stage}.calls").inc()
+    usage = getattr(response, "usage", None)
+    if usage is not None:
+        metrics.counter(f"llm.{stage}.prompt_tokens").inc(getattr(usage, "prompt_tokens", 0) or 0)
+        metrics.counter(f"llm.{stage}.completion_tokens").inc(getattr(usage, "completion_tokens", 0) or 0)
+    if seconds is not None:
+        metrics.histogram(f"llm.{stage}.seconds").observe(seconds)
+
+def usage_totals() -> Dict[str, int]:
+    """Current llm.* counter values keyed by metric name."""
+    return {
+        name: value["value"]
+        for name, value in metrics.snapshot().items()
+        if name.startswith("llm.") and "value" in value
+    }
@@ -1,47 +1,32 @@
 # app/main.py
+import hmac
 import logging
-import os
-from fastapi import FastAPI, Depends, Request, HTTPException
+from contextlib import asynccontextmanager
+from typing import Optional
+from fastapi import FastAPI, Depends, Header, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, JSONResponse
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
-from .database import get_db, initialize_db
-from .auth import get_current_active_user, get_current_user
-from .routes import auth_routes
-from .config import settings
-
-
-
-
-# app/main.py
-import logging
-from fastapi import FastAPI, Depends, Request, HTTPException, status
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse, JSONResponse, RedirectResponse
-from starlette.exceptions import HTTPException as StarletteHTTPException
-
-# Import database components first
-from .database import get_db, initialize_db
-
 # Import models to ensure they're registered with SQLAlchemy
-from .models.chat import Conversation, Message
-from .models.post import SocialMediaPost, PlatformType
+from . import models  # noqa: F401
 
 # Import auth components
-from .auth import get_current_active_user, get_current_user
+from .auth import get_current_active_user
 
 # Import route modules
-from .routes import auth_routes
-
-from .database import Base, engine
-from .models import *  # This will import all models from __init__.py
-
-# Your existing main.py code follows...
+from .routes import auth_routes, chatbot_routes, post_routes
+from .config import settings
+from .database import async_engine
+from .metrics import metrics
+from .passwords import password_hasher
+from .services.post_writer import post_writer
+from .services.scheduler import publish_scheduler, register_publisher
+from .publishing.connectors import build_connectors, session_pool
+from .search.fact_store import fact_store
+from .search.backends import search_loop
+from .templating import precompile, render_cached, templates
 
 # Configure root logger
 logging.basicConfig(
@@ -51,11 +36,43 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """
+    Application lifespan: acquire and release long-lived resources.
+
+    Schema creation is no longer part of startup; run ``python create_tables.py``
+    as an explicit migration step before deploying. Heavy services (LLM, search,
+    reflexion engines) are built lazily on first use. The publish scheduler is
+    off by default; enable it (SCHEDULER_ENABLED) in exactly one process. Other
+    processes may still schedule posts, which the scheduler finds on its next
+    refill.
+    """
+    precompile()
+    await post_writer.start()
+    if settings.SCHEDULER_ENABLED:
+        for platform, connector in build_connectors().items():
+            register_publisher(platform, connector.publish)
+        await publish_scheduler.start()
+    logger.info("Application startup complete")
+    yield
+    await publish_scheduler.stop()
+    await session_pool.close()
+    await post_writer.stop()
+    password_hasher.shutdown()
+    fact_store.close()
+    search_loop.close()
+    await async_engine.dispose()
+    logger.info("Application shutdown complete")
+
+
 # Create FastAPI application
 app = FastAPI(
     title="AI Social Poster",
     description="Generate social media content using AI",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # CORS configuration
@@ -67,14 +84,6 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Initialize templates
-try:
-    templates = Jinja2Templates(directory="templates")
-    logger.info("Template engine initialized")
-except Exception as e:
-    logger.error(f"Failed to initialize templates: {str(e)}")
-    raise
-
 # Mount static files
 try:
     app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -83,90 +92,102 @@ except Exception as e:
     logger.error(f"Failed to mount static files: {str(e)}")
     # Continue without static files, application will work but without styles
 
-# Exception handler for all HTTP exceptions
 @app.exception_handler(StarletteHTTPException)
 async def http_exception_handler(request: Request, exc: StarletteHTTPException):
+    """Handle HTTP exceptions with a custom error page or fallback"""
     if exc.status_code == 404:
         logger.warning(f"404 Not Found: {request.url}")
-        # Return custom 404 page
-        return templates.TemplateResponse(
-            "error.html", 
-            {"request": request, "error": "Page not found", "status_code": 404},
-            status_code=404
-        )
     elif exc.status_code == 401:
         logger.warning(f"401 Unauthorized: {request.url}")
-        # Redirect to login for unauthorized access
-        return templates.TemplateResponse(
-            "error.html", 
-            {"request": request, "error": "Please log in to access this page", "status_code": 401},
-            status_code=401
+    else:
+        logger.error(f"HTTP Exception: {exc.status_code} - {exc.detail}")
+    try:
+        # Try to use the custom error.html template
+        return render_cached(
+            request, "error.html",
+            {"error": exc.detail, "status_code": exc.status_code},
+            status_code=exc.status_code
         )
-    
-    logger.error(f"HTTP Exception: {exc.status_code} - {exc.detail}")
-    return templates.TemplateResponse(
-        "error.html", 
-        {"request": request, "error": exc.detail, "status_code": exc.status_code},
-        status_code=exc.status_code
-    )
+    except Exception as e:
+        # Fallback to a simple error response if template is missing
+        logger.error(f"Error rendering error template: {str(e)}")
+        if exc.status_code == 404:
+            content = "<html><body><h1>404 - Page Not Found</h1><p>The page you requested does not exist.</p></body></html>"
+        elif exc.status_code == 401:
+            content = "<html><body><h1>401 - Unauthorized</h1><p>Please log in to continue.</p></body></html>"
+        else:
+            content = f"<html><body><h1>Error {exc.status_code}</h1><p>{exc.detail}</p></body></html>"
+        return HTMLResponse(content=content, status_code=exc.status_code)
 
-# Exception handler for general exceptions
 @app.exception_handler(Exception)
 async def general_exception_handler(request: Request, exc: Exception):
+    """Handle general exceptions with a custom error page or fallback"""
     logger.error(f"Unhandled exception: {str(exc)}", exc_info=True)
-    return templates.TemplateResponse(
-        "error.html", 
-        {"request": request, "error": "An unexpected error occurred", "status_code": 500},
-        status_code=500
-    )
+    try:
+        # Try to use the custom error.html template
+        return render_cached(
+            request, "error.html",
+            {"error": "An unexpected error occurred", "status_code": 500},
+            status_code=500
+        )
+    except Exception as e:
+        # Fallback to a simple error response if template is missing
+        logger.error(f"Error rendering error template: {str(e)}")
+        content = "<html><body><h1>500 - Server Error</h1><p>An unexpected error occurred. Please try again later.</p></body></html>"
+        return HTMLResponse(content=content, status_code=500)
 
-# Include routers
+# Include routers (each exactly once)
 try:
     app.include_router(auth_routes.router)
     logger.info("Authentication routes registered")
+    app.include_router(chatbot_routes.router)
+    logger.info("Chatbot routes registered")
+    app.include_router(post_routes.router)
+    logger.info("Post history routes registered")
 except Exception as e:
-    logger.error(f"Failed to register auth routes: {str(e)}")
+    logger.error(f"Failed to register routes: {str(e)}")
     raise
 
-@app.on_event("startup")
-async def startup_event():
-    """Application startup: initialize database and other resources."""
-    try:
-        # Initialize database
-        initialize_db()
-        logger.info("Application startup complete")
-    except Exception as e:
-        logger.error(f"Startup failed: {str(e)}")
-        # We allow the app to start even if DB init fails
-        # This way the app can display a maintenance page
-
 @app.get("/", response_class=HTMLResponse)
 async def landing_page(request: Request):
     """Public landing page that doesn't require authentication."""
     try:
         logger.debug("Landing page requested")
-        return templates.TemplateResponse(
-            "layout.html", 
-            {"request": request, "user": None, "content": "Welcome to AI Social Poster! Please login or sign up to continue."}
+        return render_cached(
+            request, "layout.html",
+            {"user": None, "content": "Welcome to AI Social Poster! Please login or sign up to continue."}
         )
     except Exception as e:
         logger.error(f"Error rendering landing page: {str(e)}")
         return HTMLResponse(content="<html><body><h1>Error loading page</h1><p>Please try again later.</p></body></html>")
 
+def require_metrics_token(authorization: Optional[str] = Header(None)):
+    """Admit only requests carrying settings.METRICS_TOKEN; hide the endpoint when it is unset."""
+    if not settings.METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    expected = f"Bearer {settings.METRICS_TOKEN}"
+    if authorization is None or not hmac.compare_digest(authorization.encode("utf-8"), expected.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="Invalid metrics token", headers={"WWW-Authenticate": "Bearer"})
+
+@app.get("/metrics", response_class=JSONResponse, dependencies=[Depends(require_metrics_token)])
+async def metrics_snapshot():
+    """In-process metrics such as database pool checkout latency (requires METRICS_TOKEN)."""
+    return metrics.snapshot()
+
 @app.get("/dashboard", response_class=HTMLResponse)
 async def dashboard(request: Request, current_user=Depends(get_current_active_user)):
     """Dashboard page - Protected route that requires authentication."""
     try:
         logger.debug(f"Dashboard requested by user: {current_user.username}")
         return templates.TemplateResponse(
-            "dashboard.html", 
-            {"request": request, "user": current_user}
+            request, "dashboard.html",
+            {"user": current_user}
         )
     except Exception as e:
         logger.error(f"Error rendering dashboard: {str(e)}")
-        return templates.TemplateResponse(
-            "error.html", 
-            {"request": request, "error": "Error loading dashboard", "status_code": 500},
+        return render_cached(
+            request, "error.html",
+            {"error": "Error loading dashboard", "status_code": 500},
             status_code=500
         )
 
@@ -176,14 +197,14 @@ async def create_post_page(request: Request, current_user=Depends(get_current_ac
     try:
         logger.debug(f"Create post page requested by user: {current_user.username}")
         return templates.TemplateResponse(
-            "create_post.html", 
-            {"request": request, "user": current_user}
+            request, "create_post.html",
+            {"user": current_user}
         )
     except Exception as e:
         logger.error(f"Error rendering create post page: {str(e)}")
-        return templates.TemplateResponse(
-            "error.html", 
-            {"request": request, "error": "Error loading create post page", "status_code": 500},
+        return render_cached(
+            request, "error.html",
+            {"error": "Error loading create post page", "status_code": 500},
             status_code=500
         )
 
@@ -193,20 +214,20 @@ async def profile_page(request: Request, current_user=Depends(get_current_active
     try:
         logger.debug(f"Profile page requested by user: {current_user.username}")
         return templates.TemplateResponse(
-            "profile.html", 
-            {"request": request, "user": current_user}
+            request, "profile.html",
+            {"user": current_user}
         )
     except Exception as e:
         logger.error(f"Error rendering profile page: {str(e)}")
-        return templates.TemplateResponse(
-            "error.html", 
-            {"request": request, "error": "Error loading profile page", "status_code": 500},
+        return render_cached(
+            request, "error.html",
+            {"error": "Error loading profile page", "status_code": 500},
             status_code=500
         )
 
 if __name__ == "__main__":
     import uvicorn
-    
+
     # Note: It's generally better to run with the uvicorn command directly
     # rather than using this block, but it's included for convenience
     try:
@@ -214,64 +235,3 @@ if __name__ == "__main__":
         uvicorn.run("app.main:app", host="0.0.0.0", port=8000, reload=True)
     except Exception as e:
         logger.error(f"Failed to start application: {str(e)}")
-
-
-
-@app.exception_handler(StarletteHTTPException)
-async def http_exception_handler(request: Request, exc: StarletteHTTPException):
-    """Handle HTTP exceptions with a custom error page or fallback"""
-    try:
-        # Try to use the custom error.html template
-        return templates.TemplateResponse(
-            "error.html", 
-            {"request": request, "error": exc.detail, "status_code": exc.status_code},
-            status_code=exc.status_code
-        )
-    except Exception as e:
-        # Fallback to a simple error response if template is missing
-        logger.error(f"Error rendering error template: {str(e)}")
-        if exc.status_code == 404:
-            content = "<html><body><h1>404 - Page Not Found</h1><p>The page you requested does not exist.</p></body></html>"
-        elif exc.status_code == 401:
-            content = "<html><body><h1>401 - Unauthorized</h1><p>Please log in to continue.</p></body></html>"
-        else:
-            content = f"<html><body><h1>Error {exc.status_code}</h1><p>{exc.detail}</p></body></html>"
-        return HTMLResponse(content=content, status_code=exc.status_code)
-
-@app.exception_handler(Exception)
-async def general_exception_handler(request: Request, exc: Exception):
-    """Handle general exceptions with a custom error page or fallback"""
-    logger.error(f"Unhandled exception: {str(exc)}", exc_info=True)
-    try:
-        # Try to use the custom error.html template
-        return templates.TemplateResponse(
-            "error.html", 
-            {"request": request, "error": "An unexpected error occurred", "status_code": 500},
-            status_code=500
-        )
-    except Exception as e:
-        # Fallback to a simple error response if template is missing
-        logger.error(f"Error rendering error template: {str(e)}")
-        content = "<html><body><h1>500 - Server Error</h1><p>An unexpected error occurred. Please try again later.</p></body></html>"
-        return HTMLResponse(content=content, status_code=500)
-    
-
-
-# app/main.py (update to include new routes)
-from .routes import chatbot_routes
-
-# Existing code...
-
-# Include chatbot routers
-app.include_router(chatbot_routes.router)
-logger.info("Chatbot routes registered")
-
-# Redirect authenticated users to chatbot
-@app.get("/dashboard")
-async def dashboard(request: Request, current_user=Depends(get_current_active_user)):
-    """Dashboard - redirects to chatbot for authenticated users"""
-    return RedirectResponse(url="/chatbot", status_code=status.HTTP_303_SEE_OTHER)
-
-
-from app.routes import chatbot_routes
-app.include_router(chatbot_routes.router)
\ No newline at end of file
@@ -0,0 +1,101 @@
+# app/metrics.py
+"""
+Lightweight in-process metrics registry.
+
+Counters and timing histograms are kept in memory and exposed as a JSON
+snapshot. Histograms keep a bounded window of recent observations so
+percentiles stay cheap to compute.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, Any
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+class Counter:
+    """Monotonic counter."""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: int = 1):
+        with self._lock:
+            self._value += amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"value": self._value}
+
+class Histogram:
+    """Records observations and reports count, sum and window percentiles."""
+
+    def __init__(self, window: int = 1024):
+        self._window = deque(maxlen=window)
+        self._count = 0
+        self._sum = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        with self._lock:
+            self._window.append(value)
+            self._count += 1
+            self._sum += value
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            values = sorted(self._window)
+            count, total = self._count, self._sum
+        if not values:
+            return {"count": 0, "sum": 0.0}
+
+        def percentile(p):
+            return values[min(len(values) - 1, int(p * len(values)))]
+
+        return {
+            "count": count,
+            "sum": round(total, 6),
+            "min": values[0],
+            "p50": percentile(0.50),
+            "p95": percentile(0.95),
+            "p99": percentile(0.99),
+            "max": values[-1]
+        }
+
+class MetricsRegistry:
+    """Named collection of counters and histograms."""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, factory):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.setdefault(name, factory())
+        return metric
+
+    def counter(self, name: str) -> Counter:
+        return self._get(name, Counter)
+
+    def histogram(self, name: str) -> Histogram:
+        return self._get(name, Histogram)
+
+    @contextmanager
+    def timer(self, name: str):
+        """Record the elapsed wall-clock seconds of a block in a histogram."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.histogram(name).observe(time.perf_counter() - start)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {name: metric.snapshot() for name, metric in sorted(self._metrics.items())}
+
+# Shared registry used across the application
+metrics = MetricsRegistry()
@@ -0,0 +1,148 @@
+# app/migrations.py
+"""
+Explicit, idempotent schema migrations.
+
+``Base.metadata.create_all`` only creates missing tables. The steps here
+bring existing databases up to date (new columns, indexes, data moves) and
+are safe to run repeatedly. They are run by ``create_tables.py``.
+"""
+import json
+import logging
+from typing import Callable, List, Tuple
+
+from sqlalchemy import func, inspect, insert, select, text, update
+from sqlalchemy.engine import Engine
+
+from .database import Base
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+def add_missing_columns(engine: Engine) -> List[str]:
+    """Add model columns that are missing from existing tables (as nullable columns)."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    added = []
+    with engine.begin() as conn:
+        for table in Base.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+            existing_columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type} NULL"))
+                added.append(f"{table.name}.{column.name}")
+                logger.info(f"Added column {table.name}.{column.name} ({column_type})")
+    return added
+
+def create_missing_indexes(engine: Engine) -> List[str]:
+    """Create model indexes that are missing from existing tables."""
+    inspector = inspect(engine)
+    existing_tables = set(inspector.get_table_names())
+    created = []
+    for table in Base.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            continue
+        existing_indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name in existing_indexes:
+                continue
+            index.create(bind=engine)
+            created.append(index.name)
+            logger.info(f"Created index {index.name} on {table.name}")
+    return created
+
+def migrate_draft_versions(engine: Engine, batch_size: int = 500) -> int:
+    """
+    Move legacy ``social_media_posts.draft_versions`` JSON blobs into post_versions.
+
+    Posts are processed in id order, one batch per transaction. A post that
+    already has version rows is not copied again, and every processed blob
+    is cleared so reruns skip it.
+    """
+    from .models.post import SocialMediaPost, PostVersion
+
+    posts = SocialMediaPost.__table__
+    versions = PostVersion.__table__
+    migrated = 0
+    last_id = 0
+    while True:
+        with engine.begin() as conn:
+            rows = conn.execute(
+                select(posts.c.id, posts.c.draft_versions)
+                .where(posts.c.id > last_id, posts.c.draft_versions.isnot(None))
+                .order_by(posts.c.id)
+                .limit(batch_size)
+            ).all()
+            if not rows:
+                break
+            last_id = rows[-1].id
+            post_ids = [row.id for row in rows]
+            already_migrated = set(conn.execute(
+                select(versions.c.post_id).where(versions.c.post_id.in_(post_ids)).distinct()
+            ).scalars())
+
+            new_versions = []
+            processed_ids = []
+            for row in rows:
+                if row.id not in already_migrated:
+                    try:
+                        blob = json.loads(row.draft_versions or "{}")
+                        new_versions.extend([
+                            {"post_id": row.id, "version": int(number), "content": content}
+                            for number, content in blob.items()
+                        ])
+                    except (TypeError, ValueError, AttributeError):
+                        # Leave unreadable blobs in place for manual inspection
+                        logger.warning(f"Skipping unreadable draft_versions on post {row.id}")
+                        continue
+                processed_ids.append(row.id)
+
+            if new_versions:
+                conn.execute(insert(versions), new_versions)
+            if processed_ids:
+                conn.execute(update(posts).where(posts.c.id.in_(processed_ids)).values(draft_versions=None))
+            migrated += len(new_versions)
+    logger.info(f"Migrated {migrated} draft versions into post_versions")
+    return migrated
+
+def backfill_post_updated_at(engine: Engine) -> int:
+    """
+    Set ``social_media_posts.updated_at`` where it is NULL.
+
+    The per-user search and dedup indexes catch up in (updated_at, id)
+    order and skip posts without a timestamp.
+    """
+    from .models.post import SocialMediaPost
+
+    posts = SocialMediaPost.__table__
+    with engine.begin() as conn:
+        result = conn.execute(
+            update(posts)
+            .where(posts.c.updated_at.is_(None))
+            .values(updated_at=func.coalesce(posts.c.created_at, func.now()))
+        )
+    logger.info(f"Backfilled updated_at on {result.rowcount} posts")
+    return result.rowcount
+
+# Ordered list of (name, step); each step must be idempotent
+MIGRATIONS: List[Tuple[str, Callable[[Engine], object]]] = [
+    ("add_missing_columns", add_missing_columns),
+    ("create_missing_indexes", create_missing_indexes),
+    ("migrate_draft_versions", migrate_draft_versions),
+    ("backfill_post_updated_at", backfill_post_updated_at),
+]
+
+def run_migrations(engine: Engine) -> bool:
+    """Run every migration step in order."""
+    for name, step in MIGRATIONS:
+        try:
+            logger.info(f"Running migration: {name}")
+            step(engine)
+        except Exception as e:
+            logger.error(f"Migration '{name}' failed: {str(e)}")
+            return False
+    logger.info("All migrations applied")
+    return True
@@ -3,5 +3,5 @@
 
 
 from .user import User
-from .chat import Conversation, Message
-from .post import SocialMediaPost, PlatformType
\ No newline at end of file
+from .chat import Conversation, Message, ConversationSearchContext
+from .post import SocialMediaPost, PostVersion, PlatformType
\ No newline at end of file
@@ -32,7 +32,7 @@
 
 
 # app/models/chat.py
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from datetime import datetime
 from ..database import Base
@@ -53,9 +53,25 @@ class Conversation(Base):
 
 class Message(Base):
     __tablename__ = "messages"
+    __table_args__ = (
+        # Keyset pagination of a conversation: WHERE conversation_id = ? ORDER BY created_at, id
+        Index("ix_messages_conversation_id_created_at", "conversation_id", "created_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id"))
     role = Column(String(50))  # user, assistant, system
     content = Column(Text)
-    created_at = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class ConversationSearchContext(Base):
+    """Compact search results kept per conversation so follow-ups can reuse them."""
+    __tablename__ = "conversation_search_contexts"
+    
+    id = Column(Integer, primary_key=True)
+    conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"), unique=True, nullable=False)
+    enhanced_query = Column(Text)
+    category = Column(String(100))
+    keywords = Column(Text)  # Space-separated normalized keywords covered by the items
+    items = Column(Text)  # Compact JSON list of {"fact", "source"}
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
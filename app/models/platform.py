@@ -0,0 +1,71 @@
+"""
+Per-platform post constraints.
+
+Shared by the post generator (which puts them in its prompt) and the local
+constraint enforcer (which checks and fixes drafts before critique).
+"""
+from typing import Any, Dict
+
+# Platform-specific characteristics
+PLATFORM_CONFIG: Dict[str, Dict[str, Any]] = {
+    "linkedin": {
+        "tone": "professional",
+        "max_length": 3000,
+        "format": "paragraph",
+        "hashtags_count": 3,
+        "emoji_frequency": "low",
+        "style": "include statistics and professional insights, use paragraphs, possibly with bullet points for clarity"
+    },
+    "twitter": {
+        "tone": "conversational",
+        "max_length": 280,
+        "format": "concise",
+        "hashtags_count": 2,
+        "emoji_frequency": "medium",
+        "style": "be concise, catchy, and engaging, possibly with a question or call to action"
+    },
+    "reddit": {
+        "tone": "informative",
+        "max_length": 10000,
+        "format": "discussion",
+        "hashtags_count": 0,
+        "emoji_frequency": "very low",
+        "style": "be informative and authentic, use clear formatting and cite your sources in an authentic way"
+    },
+    "instagram": {
+        "tone": "casual",
+        "max_length": 2200,
+        "format": "engaging",
+        "hashtags_count": 5,
+        "emoji_frequency": "high",
+        "style": "be engaging and visual, tell a story, and include many relevant hashtags at the end"
+    },
+    "facebook": {
+        "tone": "friendly",
+        "max_length": 5000,
+        "format": "conversational",
+        "hashtags_count": 1,
+        "emoji_frequency": "medium",
+        "style": "be personal and relatable, ask questions, and encourage engagement"
+    }
+}
+
+DEFAULT_PLATFORM = "linkedin"
+
+# emoji_frequency -> (emojis allowed per 100 words, minimum allowed in any post)
+EMOJI_DENSITY = {
+    "none": (0.0, 0),
+    "very low": (0.5, 1),
+    "low": (1.0, 1),
+    "medium": (3.0, 2),
+    "high": (6.0, 4)
+}
+
+def get_platform_config(platform: str) -> Dict[str, Any]:
+    """Constraints for a platform, falling back to LinkedIn's for unknown names."""
+    return PLATFORM_CONFIG.get((platform or "").lower(), PLATFORM_CONFIG[DEFAULT_PLATFORM])
+
+def max_emojis(platform: str, word_count: int) -> int:
+    """Emojis a post of word_count words may contain on a platform."""
+    per_100_words, minimum = EMOJI_DENSITY.get(get_platform_config(platform)["emoji_frequency"], EMOJI_DENSITY["medium"])
+    return max(minimum, int(word_count * per_100_words / 100))
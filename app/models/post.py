@@ -1,6 +1,6 @@
 # app/models/post.py
-from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Enum
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Text, ForeignKey, DateTime, Boolean, Enum, Float, Index, func, select
+from sqlalchemy.orm import object_session, relationship
 from sqlalchemy.types import JSON  # Import JSON type
 import enum
 import json
@@ -11,32 +11,136 @@ class PlatformType(str, enum.Enum):
     LINKEDIN = "linkedin"
     TWITTER = "twitter"
     REDDIT = "reddit"
+    FACEBOOK = "facebook"
+    INSTAGRAM = "instagram"
 
 class SocialMediaPost(Base):
     __tablename__ = "social_media_posts"
+    __table_args__ = (
+        # Keyset pagination of a user's history: WHERE user_id = ? ORDER BY created_at, id
+        Index("ix_social_media_posts_user_id_created_at", "user_id", "created_at"),
+        # Query DSL filters: platform:x with date ranges, and score comparisons
+        Index("ix_social_media_posts_user_id_platform_created_at", "user_id", "platform", "created_at"),
+        Index("ix_social_media_posts_user_id_final_score", "user_id", "final_score"),
+        # Search and dedup index catch-up: WHERE user_id = ? ORDER BY updated_at, id
+        Index("ix_social_media_posts_user_id_updated_at", "user_id", "updated_at"),
+        # Scheduler refill: rows changed since the last refill
+        Index("ix_social_media_posts_updated_at", "updated_at"),
+        # Scheduler recovery and refill: WHERE publish_status = 'scheduled' AND scheduled_at <= ?
+        Index("ix_social_media_posts_publish_status_scheduled_at", "publish_status", "scheduled_at"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     conversation_id = Column(Integer, ForeignKey("conversations.id", ondelete="CASCADE"))
     user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     platform = Column(String(20))  # Using String instead of Enum for simplicity
     content = Column(Text)
-    draft_versions = Column(Text, default="{}")  # Store as JSON string
+    draft_versions = Column(Text, nullable=True)  # Legacy JSON blob; versions now live in post_versions
+    prompt = Column(Text)  # Original user request
+    classification = Column(Text)  # Classification JSON from the pipeline
+    search_context = Column(Text)  # Formatted search context used for generation
+    critic_scores = Column(Text)  # JSON list of per-iteration critic results
+    final_score = Column(Float)
     is_published = Column(Boolean, default=False)
+    scheduled_at = Column(DateTime, nullable=True)  # UTC publish time; None when not scheduled
+    publish_status = Column(String(20), nullable=True)  # scheduled, publishing, published, failed or reconcile
+    claimed_at = Column(DateTime, nullable=True)  # Lease of the scheduler publishing the post; renewed while in flight
+    published_at = Column(DateTime, nullable=True)
+    external_post_id = Column(String(100), nullable=True)  # The platform's id for the published post
+    publish_error = Column(Text, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Define relationships with backref
     user = relationship("User", backref="posts")
     conversation = relationship("Conversation", backref="posts")
+    versions = relationship(
+        "PostVersion",
+        back_populates="post",
+        order_by="PostVersion.version",
+        cascade="all, delete-orphan",
+        passive_deletes=True
+    )
     
-    # Helper methods for JSON handling
+    # Draft versions live in the append-only post_versions table; new ones are
+    # added with PostVersion.append, which never loads earlier versions.
+    # With async sessions, eager-load ``versions`` before calling these.
     def get_draft_versions(self):
-        """Get draft versions as a dictionary."""
+        """Get draft versions as a dictionary of version number -> content."""
+        return {str(version.version): version.content for version in self.versions}
+
+    def set_draft_versions(self, versions_dict):
+        """
+        Set draft versions from a dictionary.
+
+        Versions are append-only: existing versions are never changed, and
+        entries numbered above the latest version are appended in order with
+        PostVersion.append. The post must belong to a session.
+        """
+        session = object_session(self)
+        if session is None:
+            raise ValueError("set_draft_versions requires a post attached to a session")
+        latest = max((version.version for version in self.versions), default=0)
+        for number, content in sorted(versions_dict.items(), key=lambda item: int(item[0])):
+            if int(number) > latest:
+                version = PostVersion.append(session, self.id, latest, content)
+                self.versions.append(version)
+                latest = version.version
+
+    def get_classification(self):
+        """Get the stored classification as a dictionary."""
         try:
-            return json.loads(self.draft_versions)
-        except:
+            return json.loads(self.classification) if self.classification else {}
+        except (TypeError, ValueError):
             return {}
+
+    def get_critic_scores(self):
+        """Get the stored per-iteration critic results as a list."""
+        try:
+            return json.loads(self.critic_scores) if self.critic_scores else []
+        except (TypeError, ValueError):
+            return []
+
+class PostVersion(Base):
+    """One immutable draft of a post; rows are only ever appended."""
+    __tablename__ = "post_versions"
+    __table_args__ = (
+        Index("ix_post_versions_post_id_version", "post_id", "version", unique=True),
+    )
     
-    def set_draft_versions(self, versions_dict):
-        """Set draft versions from a dictionary."""
-        self.draft_versions = json.dumps(versions_dict)
\ No newline at end of file
+    id = Column(Integer, primary_key=True)
+    post_id = Column(Integer, ForeignKey("social_media_posts.id", ondelete="CASCADE"), nullable=False)
+    version = Column(Integer, nullable=False)
+    content = Column(Text)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    
+    post = relationship("SocialMediaPost", back_populates="versions")
+
+    @classmethod
+    def latest_version(cls, post_id):
+        """
+        Scalar subquery for a post's highest version number (0 when it has none).
+
+        post_id may be a value or a column such as SocialMediaPost.id, so the
+        number can be loaded in the same statement as the post.
+        """
+        return (
+            select(func.coalesce(func.max(cls.version), 0))
+            .where(cls.post_id == post_id)
+            .scalar_subquery()
+        )
+
+    @classmethod
+    def append(cls, db, post_id, latest_version, content, original_content=None):
+        """
+        Add the version after latest_version and return it.
+
+        On a post's first revision (latest_version 0) original_content, the
+        draft being revised, is recorded as version 1 first.
+        """
+        if latest_version == 0 and original_content is not None:
+            db.add(cls(post_id=post_id, version=1, content=original_content))
+            latest_version = 1
+        version = cls(post_id=post_id, version=latest_version + 1, content=content)
+        db.add(version)
+        return version
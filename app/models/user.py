@@ -1,5 +1,5 @@
 # app/models/user.py
-from sqlalchemy import Boolean, Column, Integer, String
+from sqlalchemy import Boolean, Column, Integer, String, select
 from sqlalchemy.orm import relationship
 import logging
 from ..database import Base
@@ -36,6 +36,26 @@ class User(Base):
             logger.error(f"Database error when getting user by username: {str(e)}")
             return None
 
+    @classmethod
+    async def get_by_email_async(cls, db, email):
+        """Get a user by email address using an async session."""
+        try:
+            result = await db.execute(select(cls).where(cls.email == email).limit(1))
+            return result.scalars().first()
+        except Exception as e:
+            logger.error(f"Database error when getting user by email: {str(e)}")
+            return None
+
+    @classmethod
+    async def get_by_username_async(cls, db, username):
+        """Get a user by username using an async session."""
+        try:
+            result = await db.execute(select(cls).where(cls.username == username).limit(1))
+            return result.scalars().first()
+        except Exception as e:
+            logger.error(f"Database error when getting user by username: {str(e)}")
+            return None
+
     def __repr__(self):
         """String representation of User object."""
         return f"<User(id={self.id}, username='{self.username}', email='{self.email}')>"
\ No newline at end of file
@@ -0,0 +1,107 @@
+# app/passwords.py
+"""
+Password hashing off the event loop.
+
+bcrypt deliberately burns 100-300 ms of CPU per call. Running it inline in
+async routes stalls every other request, so hashing and verification are
+sent to a dedicated thread pool (bcrypt releases the GIL while it works).
+At most ``max_pending`` calls may be queued or running on the pool. A call
+that can't get a slot within ``queue_timeout`` raises PasswordHasherBusy,
+which the API turns into a 503, so a login burst is shed instead of piling
+up. The time each call spends queued is recorded as a metric.
+"""
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from .config import settings
+from .database import pwd_context
+from .metrics import metrics
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+class PasswordHasherBusy(RuntimeError):
+    """Raised when no pool slot frees up within the queue timeout."""
+
+class PasswordHasher:
+    """Runs CryptContext operations on a bounded worker pool."""
+
+    def __init__(self, context, max_workers: int = 4, max_pending: int = 64, queue_timeout: Optional[float] = 2.0):
+        """
+        Initialize the hasher.
+
+        Args:
+            context: passlib CryptContext used for hashing and verification
+            max_workers: Number of threads running bcrypt concurrently
+            max_pending: Maximum calls queued or running on the pool at once
+            queue_timeout: Seconds a call may wait for a slot before PasswordHasherBusy (None waits)
+        """
+        self.context = context
+        self.max_workers = max_workers
+        self.queue_timeout = queue_timeout
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._slots = asyncio.Semaphore(max_pending)
+
+    async def _acquire(self, operation: str, wait: bool):
+        if wait or self.queue_timeout is None:
+            await self._slots.acquire()
+            return
+        try:
+            await asyncio.wait_for(self._slots.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            metrics.counter(f"passwords.{operation}.rejected").inc()
+            raise PasswordHasherBusy(f"Password {operation} queue is full")
+
+    async def _run(self, operation: str, wait: bool, func, *args):
+        submitted = time.perf_counter()
+        await self._acquire(operation, wait)
+        try:
+            def timed_call():
+                started = time.perf_counter()
+                metrics.histogram(f"passwords.{operation}.queue_seconds").observe(started - submitted)
+                try:
+                    return func(*args)
+                finally:
+                    metrics.histogram(f"passwords.{operation}.work_seconds").observe(time.perf_counter() - started)
+
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, timed_call)
+        finally:
+            self._slots.release()
+
+    async def hash(self, password: str, wait: bool = False) -> str:
+        """
+        Hash a password with the configured bcrypt cost.
+
+        Args:
+            password: Plain-text password
+            wait: Wait for a pool slot however long it takes instead of raising
+                PasswordHasherBusy (batch provisioning)
+        """
+        return await self._run("hash", wait, self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """
+        Verify a password and report whether its hash should be replaced.
+
+        Returns:
+            (valid, new_hash) where new_hash is set when the stored hash uses
+            a different cost than the one currently configured
+        """
+        return await self._run("verify", False, self.context.verify_and_update, password, hashed_password)
+
+    def shutdown(self):
+        """Stop the worker threads, waiting for in-flight hashes."""
+        self._executor.shutdown(wait=True)
+        logger.info("Password hasher pool shut down")
+
+# Shared hasher used by authentication and provisioning
+password_hasher = PasswordHasher(
+    pwd_context,
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    queue_timeout=settings.PASSWORD_HASH_QUEUE_TIMEOUT_SECONDS
+)
@@ -0,0 +1,119 @@
+# app/principal_cache.py
+"""
+Bounded cache of authenticated principals.
+
+Validating a JWT used to mean decoding it and loading the user row on every
+protected request. The cache maps a token digest to an immutable snapshot
+of the user that expires with the token or after ``ttl_seconds``,
+whichever comes first, so repeat requests with the same token skip both the
+decode and the database.
+
+invalidate_user only clears the current process. Other workers keep a
+deactivated user's snapshot until it expires, so ``ttl_seconds`` is the
+longest a deactivation takes to apply everywhere.
+"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, Optional, Set, Tuple
+
+from .metrics import metrics
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+@dataclass(frozen=True)
+class Principal:
+    """Lightweight, immutable snapshot of an authenticated user."""
+    id: int
+    username: str
+    email: str
+    is_active: bool
+
+    @classmethod
+    def from_user(cls, user) -> "Principal":
+        """Build a snapshot from a User ORM instance."""
+        return cls(
+            id=user.id,
+            username=user.username,
+            email=user.email,
+            is_active=bool(user.is_active)
+        )
+
+class PrincipalCache:
+    """LRU cache of principals keyed by token digest, expiring with the token or the TTL."""
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: Optional[float] = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[str, Tuple[Principal, float]]" = OrderedDict()
+        self._keys_by_user: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(token: str) -> str:
+        return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+    def get(self, token: str) -> Optional[Principal]:
+        """Return the cached principal for a token, or None if missing or expired."""
+        key = self._key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                metrics.counter("auth.principal_cache.misses").inc()
+                return None
+            principal, expires_at = entry
+            if expires_at <= time.time():
+                self._remove(key)
+                metrics.counter("auth.principal_cache.misses").inc()
+                return None
+            self._entries.move_to_end(key)
+        metrics.counter("auth.principal_cache.hits").inc()
+        return principal
+
+    def put(self, token: str, principal: Principal, expires_at: float):
+        """Cache a principal until the token's expiry timestamp or the TTL, whichever is sooner."""
+        now = time.time()
+        if self.ttl_seconds is not None:
+            expires_at = min(expires_at, now + self.ttl_seconds)
+        if expires_at <= now:
+            return
+        key = self._key(token)
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (principal, expires_at)
+            self._keys_by_user.setdefault(principal.id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def invalidate_user(self, user_id: int) -> int:
+        """Drop every cached token for a user; returns the number of entries removed."""
+        with self._lock:
+            keys = list(self._keys_by_user.get(user_id, ()))
+            for key in keys:
+                self._remove(key)
+        if keys:
+            logger.info(f"Invalidated {len(keys)} cached principal(s) for user {user_id}")
+        return len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._keys_by_user.clear()
+
+    def _remove(self, key: str):
+        # Caller must hold the lock
+        principal, _ = self._entries.pop(key)
+        keys = self._keys_by_user.get(principal.id)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_user[principal.id]
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,423 @@
+"""
+Async publisher connectors, one per platform.
+
+Every connector shares one pooled aiohttp session, waits on its
+platform's token bucket before each API call and retries failures that
+happened before the platform could have accepted the post: throttling
+(429, honouring Retry-After) and connections that were never established,
+with capped exponential backoff and full jitter. Other 4xx responses fail
+at once.
+
+Creating a post is not idempotent on any of these APIs, so a timeout, a
+dropped connection or a 5xx after the request went out is ambiguous: the
+post may exist. Those are never retried; they raise a PublishError with
+``ambiguous`` set so the scheduler can hold the post for reconciliation
+instead of posting it twice. Requests still carry an idempotency key
+derived from the post id and its content (the mock server honours it).
+
+``settings.PUBLISH_API_BASE_URL`` points every connector at one host
+instead of the real APIs; ``app.publishing.mock_server`` serves all of
+them locally for tests and benchmarks.
+"""
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from typing import Any, Dict, Optional, Tuple
+
+import aiohttp
+
+from ..config import settings
+from ..metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# platform -> (requests, per seconds, burst); single-account write limits of each API
+RATE_LIMITS: Dict[str, Tuple[int, float, int]] = {
+    "twitter": (200, 900, 10),       # POST /2/tweets: 200 per 15 minutes per user
+    "linkedin": (150, 86400, 5),     # UGC posts: 150 per member per day
+    "reddit": (60, 60, 5),           # OAuth clients: 60 requests per minute
+    "facebook": (200, 3600, 10),     # Graph API: 200 calls per user per hour
+    "instagram": (50, 86400, 2),     # Content publishing: 50 posts per 24 hours
+}
+
+class PublishError(Exception):
+    """
+    Raised when a post can't be published.
+
+    Retryable errors happened before the platform accepted anything and may
+    succeed later. Ambiguous errors leave it unknown whether the post was
+    created; they are never retried.
+    """
+
+    def __init__(self, message: str, retryable: bool = False, retry_after: Optional[float] = None,
+                 ambiguous: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after = retry_after
+        self.ambiguous = ambiguous
+
+class TokenBucket:
+    """Async token bucket: rate tokens per second, holding at most capacity."""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self) -> float:
+        """Take one token, waiting for it if necessary; returns the seconds waited."""
+        waited = 0.0
+        # The lock keeps waiters in arrival order
+        async with self._lock:
+            self._refill()
+            while self.tokens < 1:
+                delay = (1 - self.tokens) / self.rate
+                await asyncio.sleep(delay)
+                waited += delay
+                self._refill()
+            self.tokens -= 1
+        return waited
+
+    def pause(self, seconds: float):
+        """Drain the bucket so no request goes out for seconds (after a 429)."""
+        self.tokens = min(self.tokens, 0.0) - seconds * self.rate
+        self.updated = time.monotonic()
+
+def idempotency_key(post: Dict[str, Any]) -> str:
+    """Stable key for one publish of one version of a post."""
+    content = hashlib.sha256((post.get("content") or "").encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{post['platform']}:{post['id']}:{content}".encode("utf-8")).hexdigest()[:40]
+
+def _retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds from a Retry-After header; HTTP dates fall back to backoff."""
+    try:
+        return max(0.0, float(value)) if value else None
+    except ValueError:
+        return None
+
+def backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff for a 1-based attempt number."""
+    return random.uniform(0, min(cap, base * 2 ** (attempt - 1)))
+
+class SessionPool:
+    """The aiohttp session shared by every connector, bound to the app's event loop."""
+
+    def __init__(self, connection_limit: int = 64, timeout: float = 15.0):
+        self.connection_limit = connection_limit
+        self.timeout = timeout
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    async def session(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connection_limit, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+class PlatformConnector:
+    """Base class: subclasses implement ``send`` for a single attempt."""
+
+    name = "base"
+    base_url = ""
+
+    def __init__(self,
+                 pool: Optional["SessionPool"] = None,
+                 base_url: Optional[str] = None,
+                 rate_limit: Optional[Tuple[int, float, int]] = None,
+                 max_attempts: Optional[int] = None,
+                 backoff_base: float = 0.5,
+                 backoff_cap: float = 30.0):
+        """
+        Initialize the connector.
+
+        Args:
+            pool: Shared session pool (defaults to the module's)
+            base_url: API root (defaults to settings.PUBLISH_API_BASE_URL + "/<platform>", else the real API)
+            rate_limit: (requests, per seconds, burst) overriding RATE_LIMITS
+            max_attempts: Attempts per publish (defaults to settings.PUBLISH_MAX_ATTEMPTS)
+            backoff_base: First retry's maximum delay in seconds
+            backoff_cap: Largest retry delay in seconds
+        """
+        self.pool = pool or session_pool
+        if base_url is None and settings.PUBLISH_API_BASE_URL:
+            base_url = f"{settings.PUBLISH_API_BASE_URL.rstrip('/')}/{self.name}"
+        self.base_url = (base_url or self.base_url).rstrip("/")
+        requests, period, burst = rate_limit or RATE_LIMITS[self.name]
+        self.bucket = TokenBucket(requests / period, burst)
+        self.max_attempts = max_attempts or settings.PUBLISH_MAX_ATTEMPTS
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+    @property
+    def configured(self) -> bool:
+        """Whether the credentials this connector needs are set."""
+        return True
+
+    async def send(self, session: aiohttp.ClientSession, post: Dict[str, Any], key: str) -> str:
+        """Make one publish attempt and return the platform's post id."""
+        raise NotImplementedError
+
+    async def _request(self, session: aiohttp.ClientSession, method: str, path: str, key: str,
+                       creates_post: bool = True, bucket: Optional[TokenBucket] = None,
+                       **kwargs) -> Dict[str, Any]:
+        """
+        One rate-limited API call, mapping failures to PublishError.
+
+        Args:
+            creates_post: Whether the call publishes; if not (e.g. preparing media),
+                failures after sending are safe to retry rather than ambiguous
+            bucket: Token bucket to wait on (defaults to the platform's)
+        """
+        waited = await (bucket or self.bucket).acquire()
+        if waited:
+            metrics.histogram(f"publish.{self.name}.throttle_seconds").observe(waited)
+        headers = {"Idempotency-Key": key, **kwargs.pop("headers", {})}
+        try:
+            async with session.request(method, f"{self.base_url}{path}", headers=headers, **kwargs) as response:
+                if response.status in (200, 201):
+                    return await response.json(content_type=None) or {}
+                detail = (await response.text())[:200]
+                if response.status == 429:
+                    raise PublishError(f"{self.name} returned HTTP 429: {detail}", retryable=True,
+                                       retry_after=_retry_after(response.headers.get("Retry-After")))
+                if response.status >= 500:
+                    raise PublishError(f"{self.name} returned HTTP {response.status}: {detail}",
+                                       retryable=not creates_post, ambiguous=creates_post)
+                raise PublishError(f"{self.name} returned HTTP {response.status}: {detail}")
+        except aiohttp.ClientConnectorError as e:
+            # The connection was never established, so nothing reached the platform
+            raise PublishError(f"{self.name} connection failed: {str(e)}", retryable=True)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            raise PublishError(f"{self.name} request failed: {str(e) or type(e).__name__}",
+                               retryable=not creates_post, ambiguous=creates_post)
+
+    async def publish(self, post: Dict[str, Any]) -> str:
+        """
+        Publish a post, retrying failures that can't have created it.
+
+        Args:
+            post: Dictionary with id, platform and content (as the scheduler passes it)
+
+        Returns:
+            The platform's id for the new post
+
+        Raises:
+            PublishError: When the post can't be published, or (``ambiguous``) when
+                it may have been created but that wasn't confirmed
+        """
+        key = idempotency_key(post)
+        session = await self.pool.session()
+        start = time.perf_counter()
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                external_id = await self.send(session, post, key)
+                metrics.counter(f"publish.{self.name}.published").inc()
+                metrics.histogram(f"publish.{self.name}.seconds").observe(time.perf_counter() - start)
+                return external_id
+            except PublishError as e:
+                error = e
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                # Outside _request (e.g. fetching a token): nothing was published
+                error = PublishError(f"{self.name} request failed: {str(e) or type(e).__name__}", retryable=True)
+            if error.ambiguous:
+                metrics.counter(f"publish.{self.name}.ambiguous").inc()
+                raise error
+            if not error.retryable or attempt == self.max_attempts:
+                metrics.counter(f"publish.{self.name}.failed").inc()
+                raise error
+            delay = backoff_delay(attempt, self.backoff_base, self.backoff_cap)
+            if error.retry_after is not None:
+                # The platform said when to come back; hold every request for this platform until then
+                metrics.counter(f"publish.{self.name}.rate_limited").inc()
+                self.bucket.pause(error.retry_after)
+                delay = 0.0
+            metrics.counter(f"publish.{self.name}.retries").inc()
+            logger.warning(f"Post {post['id']} attempt {attempt} failed ({error}); retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+class TwitterConnector(PlatformConnector):
+    """X/Twitter API v2 with an OAuth 2.0 user-context token."""
+
+    name = "twitter"
+    base_url = "https://api.twitter.com"
+
+    @property
+    def configured(self) -> bool:
+        return bool(settings.TWITTER_ACCESS_TOKEN)
+
+    async def send(self, session, post, key):
+        data = await self._request(session, "POST", "/2/tweets", key, json={"text": post["content"]},
+                                   headers={"Authorization": f"Bearer {settings.TWITTER_ACCESS_TOKEN}"})
+        return str(data["data"]["id"])
+
+class LinkedInConnector(PlatformConnector):
+    """LinkedIn UGC posts API."""
+
+    name = "linkedin"
+    base_url = "https://api.linkedin.com"
+
+    @property
+    def configured(self) -> bool:
+        return bool(settings.LINKEDIN_ACCESS_TOKEN and settings.LINKEDIN_AUTHOR_URN)
+
+    async def send(self, session, post, key):
+        payload = {
+            "author": settings.LINKEDIN_AUTHOR_URN,
+            "lifecycleState": "PUBLISHED",
+            "specificContent": {
+                "com.linkedin.ugc.ShareContent": {
+                    "shareCommentary": {"text": post["content"]},
+                    "shareMediaCategory": "NONE"
+                }
+            },
+            "visibility": {"com.linkedin.ugc.MemberNetworkVisibility": "PUBLIC"}
+        }
+        data = await self._request(session, "POST", "/v2/ugcPosts", key, json=payload, headers={
+            "Authorization": f"Bearer {settings.LINKEDIN_ACCESS_TOKEN}",
+            "X-Restli-Protocol-Version": "2.0.0"
+        })
+        return str(data["id"])
+
+class RedditConnector(PlatformConnector):
+    """Reddit self posts through a script app's password grant."""
+
+    name = "reddit"
+    base_url = "https://oauth.reddit.com"
+    token_url = "https://www.reddit.com/api/v1/access_token"
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if self.base_url != RedditConnector.base_url:
+            # Mock or proxy: the token endpoint lives on the same host
+            self.token_url = f"{self.base_url}/api/v1/access_token"
+        self._token: Optional[str] = None
+        self._token_expires = 0.0
+
+    @property
+    def configured(self) -> bool:
+        return bool(settings.REDDIT_CLIENT_ID and settings.REDDIT_CLIENT_SECRET and settings.REDDIT_USERNAME
+                    and settings.REDDIT_PASSWORD and settings.REDDIT_SUBREDDIT)
+
+    async def _access_token(self, session: aiohttp.ClientSession) -> str:
+        if self._token and time.monotonic() < self._token_expires:
+            return self._token
+        async with session.post(
+            self.token_url,
+            data={"grant_type": "password", "username": settings.REDDIT_USERNAME, "password": settings.REDDIT_PASSWORD},
+            auth=aiohttp.BasicAuth(settings.REDDIT_CLIENT_ID or "", settings.REDDIT_CLIENT_SECRET or "")
+        ) as response:
+            if response.status != 200:
+                raise PublishError(f"reddit token request returned HTTP {response.status}",
+                                   retryable=response.status == 429 or response.status >= 500)
+            data = await response.json(content_type=None)
+        self._token = data["access_token"]
+        # Renew a minute early
+        self._token_expires = time.monotonic() + float(data.get("expires_in", 3600)) - 60
+        return self._token
+
+    async def send(self, session, post, key):
+        token = await self._access_token(session)
+        title = post["content"].strip().splitlines()[0][:300] if post["content"].strip() else "Update"
+        data = await self._request(session, "POST", "/api/submit", key, data={
+            "sr": settings.REDDIT_SUBREDDIT, "kind": "self", "title": title, "text": post["content"], "api_type": "json"
+        }, headers={"Authorization": f"Bearer {token}", "User-Agent": "ai-social-poster/1.0"})
+        errors = data.get("json", {}).get("errors")
+        if errors:
+            raise PublishError(f"reddit rejected the post: {errors}")
+        return str(data["json"]["data"]["name"])
+
+class FacebookConnector(PlatformConnector):
+    """Facebook Page feed through the Graph API."""
+
+    name = "facebook"
+    base_url = "https://graph.facebook.com/v19.0"
+
+    @property
+    def configured(self) -> bool:
+        return bool(settings.FACEBOOK_ACCESS_TOKEN and settings.FACEBOOK_PAGE_ID)
+
+    async def send(self, session, post, key):
+        data = await self._request(session, "POST", f"/{settings.FACEBOOK_PAGE_ID}/feed", key, data={
+            "message": post["content"], "access_token": settings.FACEBOOK_ACCESS_TOKEN
+        })
+        return str(data["id"])
+
+class InstagramConnector(PlatformConnector):
+    """
+    Instagram business account through the Graph API.
+
+    Instagram has no text-only posts: the post's image_url, or
+    settings.INSTAGRAM_IMAGE_URL, is published with the content as caption.
+    A container is created and then published. Only publishes count toward
+    Instagram's daily limit, so containers wait on their own bucket (the
+    Graph API's hourly call limit), and a failed container call is retried
+    since it can't create a post.
+    """
+
+    name = "instagram"
+    base_url = "https://graph.facebook.com/v19.0"
+
+    def __init__(self, *args, container_rate_limit: Optional[Tuple[int, float, int]] = None, **kwargs):
+        """
+        Initialize the connector.
+
+        Args:
+            container_rate_limit: (requests, per seconds, burst) for container calls; defaults
+                to an explicit rate_limit, else the Graph API's limit
+        """
+        super().__init__(*args, **kwargs)
+        requests, period, burst = container_rate_limit or kwargs.get("rate_limit") or RATE_LIMITS["facebook"]
+        self.container_bucket = TokenBucket(requests / period, burst)
+
+    @property
+    def configured(self) -> bool:
+        return bool(settings.FACEBOOK_ACCESS_TOKEN and settings.INSTAGRAM_USER_ID)
+
+    async def send(self, session, post, key):
+        image_url = post.get("image_url") or settings.INSTAGRAM_IMAGE_URL
+        if not image_url:
+            raise PublishError("Instagram posts need an image (set INSTAGRAM_IMAGE_URL)")
+        account = settings.INSTAGRAM_USER_ID
+        container = await self._request(session, "POST", f"/{account}/media", f"{key}-media", data={
+            "image_url": image_url, "caption": post["content"], "access_token": settings.FACEBOOK_ACCESS_TOKEN
+        }, creates_post=False, bucket=self.container_bucket)
+        data = await self._request(session, "POST", f"/{account}/media_publish", key, data={
+            "creation_id": container["id"], "access_token": settings.FACEBOOK_ACCESS_TOKEN
+        })
+        return str(data["id"])
+
+CONNECTORS = {
+    connector.name: connector
+    for connector in (TwitterConnector, LinkedInConnector, RedditConnector, FacebookConnector, InstagramConnector)
+}
+
+# Shared HTTP session for every connector
+session_pool = SessionPool(timeout=settings.PUBLISH_TIMEOUT)
+
+def build_connectors(include_unconfigured: bool = False, **kwargs) -> Dict[str, PlatformConnector]:
+    """
+    One connector per platform whose credentials are configured.
+
+    With PUBLISH_API_BASE_URL set (the mock server) every platform is included.
+    """
+    connectors = {}
+    for name, connector_class in CONNECTORS.items():
+        connector = connector_class(**kwargs)
+        if include_unconfigured or settings.PUBLISH_API_BASE_URL or connector.configured:
+            connectors[name] = connector
+    return connectors
@@ -0,0 +1,170 @@
+"""
+Local stand-in for the platforms' publishing APIs.
+
+Serves the endpoints the connectors call under one prefix per platform
+(``/twitter/2/tweets``, ``/linkedin/v2/ugcPosts``, ``/reddit/api/submit``,
+``/facebook/{page}/feed``, ``/instagram/{user}/media`` and
+``media_publish``), with per-platform rate limits answered by 429 and
+Retry-After, injected failures and an artificial delay, so connectors can
+be tested and benchmarked without network access or accounts.
+
+Idempotency keys are honoured: a repeated key replays the first response
+instead of creating another post. Some injected failures happen after the
+post was created, like a real timeout would, to exercise exactly that.
+``GET /stats`` reports requests, created posts, replays, 429s and failures
+per platform.
+
+Usage:
+    python -m app.publishing.mock_server --port 8766 --latency-ms 50 --failure-rate 0.05
+
+Then set PUBLISH_API_BASE_URL=http://127.0.0.1:8766.
+"""
+import argparse
+import asyncio
+import logging
+import random
+import time
+from collections import defaultdict
+from typing import Dict, Optional, Tuple
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+# platform -> (requests per second, burst) enforced by the mock
+DEFAULT_LIMITS: Dict[str, Tuple[float, int]] = {
+    "twitter": (200.0, 50),
+    "linkedin": (100.0, 20),
+    "reddit": (60.0, 10),
+    "facebook": (150.0, 30),
+    "instagram": (50.0, 10),
+}
+
+class _Limiter:
+    """Server-side token bucket that rejects instead of waiting."""
+
+    def __init__(self, rate: float, burst: int):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def take(self) -> Optional[float]:
+        """None if the request may proceed, else seconds until a token is available."""
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return None
+        return (1 - self.tokens) / self.rate
+
+def create_app(latency_ms: float = 0.0,
+               failure_rate: float = 0.0,
+               limits: Optional[Dict[str, Tuple[float, int]]] = None,
+               seed: Optional[int] = None) -> web.Application:
+    """
+    Build the mock application.
+
+    Args:
+        latency_ms: Delay added to every publishing response
+        failure_rate: Share of requests answered with 503; half of them after creating the post
+        limits: platform -> (requests per second, burst) overriding DEFAULT_LIMITS
+        seed: Seed for the failure injection
+    """
+    limiters = {name: _Limiter(*limit) for name, limit in {**DEFAULT_LIMITS, **(limits or {})}.items()}
+    stats = defaultdict(lambda: defaultdict(int))
+    replies: Dict[Tuple[str, str], dict] = {}
+    rng = random.Random(seed)
+
+    def endpoint(platform: str, respond, counter: str = "created", limited: bool = True):
+        async def handler(request: web.Request) -> web.Response:
+            stats[platform]["requests"] += 1
+            retry_after = limiters[platform].take() if limited else None
+            if retry_after is not None:
+                stats[platform]["rate_limited"] += 1
+                return web.json_response({"error": "rate limited"}, status=429,
+                                         headers={"Retry-After": f"{retry_after:.3f}"})
+            key = request.headers.get("Idempotency-Key")
+            if key and (platform, key) in replies:
+                stats[platform]["replayed"] += 1
+                return web.json_response(replies[(platform, key)], headers={"Idempotent-Replayed": "true"})
+            if latency_ms:
+                await asyncio.sleep(latency_ms / 1000)
+            roll = rng.random()
+            if roll < failure_rate / 2:
+                stats[platform]["failed"] += 1
+                return web.json_response({"error": "unavailable"}, status=503)
+
+            payload = await request.json() if request.content_type == "application/json" else dict(await request.post())
+            stats[platform][counter] += 1
+            body = respond(request, payload, stats[platform][counter])
+            if key:
+                replies[(platform, key)] = body
+            if roll < failure_rate:
+                # Created, but the client never hears about it
+                stats[platform]["failed"] += 1
+                return web.json_response({"error": "gateway timeout"}, status=503)
+            return web.json_response(body, status=201)
+        return handler
+
+    async def reddit_token(request: web.Request) -> web.Response:
+        return web.json_response({"access_token": "mock-token", "token_type": "bearer", "expires_in": 3600})
+
+    async def get_stats(request: web.Request) -> web.Response:
+        return web.json_response({platform: dict(counts) for platform, counts in stats.items()})
+
+    app = web.Application()
+    app["stats"] = stats
+    app.router.add_post("/twitter/2/tweets", endpoint(
+        "twitter", lambda request, payload, number: {"data": {"id": str(10**15 + number), "text": payload.get("text")}}
+    ))
+    app.router.add_post("/linkedin/v2/ugcPosts", endpoint(
+        "linkedin", lambda request, payload, number: {"id": f"urn:li:share:{number}"}
+    ))
+    app.router.add_post("/reddit/api/v1/access_token", reddit_token)
+    app.router.add_post("/reddit/api/submit", endpoint(
+        "reddit", lambda request, payload, number: {"json": {"errors": [], "data": {"name": f"t3_{number:x}"}}}
+    ))
+    app.router.add_post("/facebook/{page}/feed", endpoint(
+        "facebook", lambda request, payload, number: {"id": f"{request.match_info['page']}_{number}"}
+    ))
+    # Media containers are counted apart so "created" stays one per published post, and
+    # only publishes count toward Instagram's limit
+    app.router.add_post("/instagram/{user}/media", endpoint(
+        "instagram", lambda request, payload, number: {"id": f"container_{number}"}, counter="containers",
+        limited=False
+    ))
+    app.router.add_post("/instagram/{user}/media_publish", endpoint(
+        "instagram", lambda request, payload, number: {"id": f"media_{number}"}
+    ))
+    app.router.add_get("/stats", get_stats)
+    return app
+
+async def start_mock_server(host: str = "127.0.0.1", port: int = 0, **kwargs):
+    """
+    Start the mock on the running loop (kwargs go to create_app).
+
+    Returns:
+        (runner, base_url); call ``await runner.cleanup()`` to stop it
+    """
+    runner = web.AppRunner(create_app(**kwargs), access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{bound_port}"
+
+def main():
+    """Run the mock server until interrupted."""
+    parser = argparse.ArgumentParser(description="Local mock of the platforms' publishing APIs")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every response")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests answered with 503")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    web.run_app(create_app(args.latency_ms, args.failure_rate), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
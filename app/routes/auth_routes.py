@@ -4,13 +4,12 @@ from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status, Request, Response, Form
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.responses import HTMLResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.exc import SQLAlchemyError
 from pydantic import EmailStr
 
 
-from ..database import get_db
+from ..database import get_async_db
 from ..models.user import User
 
 from ..auth import (
@@ -19,20 +18,20 @@ from ..auth import (
     ACCESS_TOKEN_EXPIRE_MINUTES, UserCreate, Token, UserResponse
 )
 from ..config import settings
+from ..templating import render_cached, templates
 
 # Configure module logger
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
 
 # API routes for authentication
 @router.post("/api/token", response_model=Token)
-async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
     """API endpoint for token-based authentication."""
     try:
         logger.info(f"API login attempt for user: {form_data.username}")
-        user = authenticate_user(db, form_data.username, form_data.password)
+        user = await authenticate_user(db, form_data.username, form_data.password)
         if not user:
             logger.warning(f"API login failed for user: {form_data.username}")
             raise HTTPException(
@@ -58,25 +57,13 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
         )
 
 @router.post("/api/register", response_model=UserResponse)
-async def register_user(user: UserCreate, db: Session = Depends(get_db)):
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_async_db)):
     """API endpoint for user registration."""
     try:
         logger.info(f"API registration attempt for user: {user.username}")
         
-        # Check if email exists
-        db_user_by_email = User.get_by_email(db, email=user.email)
-        if db_user_by_email:
-            logger.warning(f"API registration failed: Email {user.email} already registered")
-            raise HTTPException(status_code=400, detail="Email already registered")
-        
-        # Check if username exists
-        db_user_by_username = User.get_by_username(db, username=user.username)
-        if db_user_by_username:
-            logger.warning(f"API registration failed: Username {user.username} already taken")
-            raise HTTPException(status_code=400, detail="Username already taken")
-        
-        # Create the user
-        new_user = create_user(db=db, user=user)
+        # Create the user; duplicates are rejected by the unique constraints
+        new_user = await create_user(db=db, user=user)
         logger.info(f"API registration successful for user: {user.username}")
         return new_user
     except HTTPException:
@@ -108,7 +95,7 @@ async def login_page(request: Request):
     """Render the login page."""
     try:
         logger.debug("Login page requested")
-        return templates.TemplateResponse("login.html", {"request": request})
+        return render_cached(request, "login.html")
     except Exception as e:
         logger.error(f"Error rendering login page: {str(e)}")
         # Fallback to a simple error page
@@ -119,7 +106,7 @@ async def signup_page(request: Request):
     """Render the signup page."""
     try:
         logger.debug("Signup page requested")
-        return templates.TemplateResponse("signup.html", {"request": request})
+        return render_cached(request, "signup.html")
     except Exception as e:
         logger.error(f"Error rendering signup page: {str(e)}")
         # Fallback to a simple error page
@@ -130,7 +117,7 @@ async def logout_page(request: Request):
     """Render the logout confirmation page."""
     try:
         logger.debug("Logout page requested")
-        return templates.TemplateResponse("logout.html", {"request": request})
+        return render_cached(request, "logout.html")
     except Exception as e:
         logger.error(f"Error rendering logout page: {str(e)}")
         # Fallback to a direct logout
@@ -143,18 +130,18 @@ async def login_form(
     request: Request,
     username: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Handle login form submission."""
     try:
         logger.info(f"Web login attempt for user: {username}")
-        user = authenticate_user(db, username, password)
+        user = await authenticate_user(db, username, password)
         
         if not user:
             logger.warning(f"Web login failed for user: {username}")
             return templates.TemplateResponse(
-                "login.html", 
-                {"request": request, "error": "Invalid username or password"}
+                request, "login.html", 
+                {"error": "Invalid username or password"}
             )
         
         access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -176,8 +163,8 @@ async def login_form(
     except Exception as e:
         logger.error(f"Error processing login form: {str(e)}")
         return templates.TemplateResponse(
-            "login.html", 
-            {"request": request, "error": "An error occurred during login. Please try again."}
+            request, "login.html", 
+            {"error": "An error occurred during login. Please try again."}
         )
 
 @router.post("/signup")
@@ -186,7 +173,7 @@ async def signup_form(
     username: str = Form(...),
     email: str = Form(...),
     password: str = Form(...),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Handle signup form submission."""
     try:
@@ -195,49 +182,33 @@ async def signup_form(
         # Validate inputs
         if len(username) < 3:
             return templates.TemplateResponse(
-                "signup.html", 
-                {"request": request, "error": "Username must be at least 3 characters"}
+                request, "signup.html", 
+                {"error": "Username must be at least 3 characters"}
             )
         
         if len(password) < 8:
             return templates.TemplateResponse(
-                "signup.html", 
-                {"request": request, "error": "Password must be at least 8 characters"}
-            )
-        
-        # Check if email exists
-        if User.get_by_email(db, email):
-            logger.warning(f"Web signup failed: Email {email} already registered")
-            return templates.TemplateResponse(
-                "signup.html", 
-                {"request": request, "error": "Email already registered"}
-            )
-        
-        # Check if username exists
-        if User.get_by_username(db, username):
-            logger.warning(f"Web signup failed: Username {username} already taken")
-            return templates.TemplateResponse(
-                "signup.html", 
-                {"request": request, "error": "Username already taken"}
+                request, "signup.html", 
+                {"error": "Password must be at least 8 characters"}
             )
         
-        # Create the user
+        # Create the user; duplicates are rejected by the unique constraints
         user_data = UserCreate(username=username, email=email, password=password)
-        create_user(db=db, user=user_data)
+        await create_user(db=db, user=user_data)
         
         logger.info(f"Web signup successful for user: {username}")
         return RedirectResponse(url="/login", status_code=status.HTTP_303_SEE_OTHER)
     except HTTPException as he:
         logger.warning(f"Web signup failed for user {username}: {str(he)}")
         return templates.TemplateResponse(
-            "signup.html", 
-            {"request": request, "error": he.detail}
+            request, "signup.html", 
+            {"error": he.detail}
         )
     except Exception as e:
         logger.error(f"Error processing signup form: {str(e)}")
         return templates.TemplateResponse(
-            "signup.html", 
-            {"request": request, "error": "An error occurred during signup. Please try again."}
+            request, "signup.html", 
+            {"error": "An error occurred during signup. Please try again."}
         )
 
 @router.post("/logout")
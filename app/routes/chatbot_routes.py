@@ -1,79 +1,157 @@
 import logging
-from fastapi import APIRouter, Depends, HTTPException, Request, status, Cookie
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request, status, Cookie
 from fastapi.responses import JSONResponse, HTMLResponse
-from fastapi.templating import Jinja2Templates
-from sqlalchemy.orm import Session
-from typing import List, Optional
-from pydantic import BaseModel
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Literal, Optional
+from pydantic import BaseModel, Field
 
-from ..database import get_db
+from ..database import AsyncSessionLocal, get_async_db
 from ..models.user import User
-from ..services.chatbot_service import ChatbotService
 from ..auth import get_token_from_cookie, get_user_from_token, get_current_active_user
-from app.llm.engine import generate_post_with_reflexion
+from ..services.post_writer import post_writer
+from ..search.context_store import REUSE, search_context_store
+from ..search.dedup import request_dedup_index
+from ..templating import render_cached, templates
+from app.llm.critic_agent import BeamConfig
+from app.llm.engine import classify_prompt, run_generation_pipeline
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
-templates = Jinja2Templates(directory="templates")
-chatbot_service = ChatbotService()
 
 class MessageRequest(BaseModel):
     content: str
     platforms: List[str]
+    conversation_id: Optional[int] = None
+    # What to do for platforms where a stored post is a near-duplicate of this request:
+    # "seed" refines the stored post, "offer" returns it without generating, "generate" (the
+    # default, so callers opt in to the lookup) ignores it
+    on_duplicate: Literal["seed", "offer", "generate"] = "generate"
+    # Beam reflexion: rewrites per round, candidates kept between rounds and rounds.
+    # The serial critique chain runs when beam_width is unset.
+    beam_width: Optional[int] = Field(None, ge=1, le=8)
+    beam_keep: int = Field(2, ge=1, le=4)
+    beam_depth: int = Field(2, ge=1, le=5)
 
-class FeedbackRequest(BaseModel):
-    feedback: str
+    def beam_config(self) -> Optional[BeamConfig]:
+        if self.beam_width is None:
+            return None
+        return BeamConfig(width=self.beam_width, keep=self.beam_keep, depth=self.beam_depth)
+
+def schedule_search_context_save(background_tasks: BackgroundTasks, message: MessageRequest, result: dict):
+    """Store the conversation's search context after the response when a new search was made."""
+    if message.conversation_id is None or not result.get("search_results") or result.get("search_decision") == REUSE:
+        return
+    background_tasks.add_task(
+        search_context_store.save,
+        AsyncSessionLocal,
+        message.conversation_id,
+        message.content,
+        result.get("classification"),
+        result["search_results"]
+    )
 
 @router.get("/chatbot", response_class=HTMLResponse)
 async def chatbot_page(
     request: Request,
     token: Optional[str] = Depends(get_token_from_cookie),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
         if not token:
             logger.warning("No authentication token found in cookie")
-            return templates.TemplateResponse(
-                "error.html",
-                {"request": request, "error": "Not authenticated", "status_code": 401,
+            return render_cached(
+                request, "error.html",
+                {"error": "Not authenticated", "status_code": 401,
                  "message": "You need to be logged in to access this page."}
             )
 
-        current_user = get_user_from_token(db, token)
+        current_user = await get_user_from_token(db, token)
         if not current_user:
             logger.warning("Invalid authentication token")
-            return templates.TemplateResponse(
-                "error.html",
-                {"request": request, "error": "Invalid authentication", "status_code": 401,
+            return render_cached(
+                request, "error.html",
+                {"error": "Invalid authentication", "status_code": 401,
                  "message": "Your session is invalid or expired. Please log in again."}
             )
 
         logger.info(f"User {current_user.username} accessed chatbot page")
-        return templates.TemplateResponse("chatbot.html", {"request": request, "user": current_user})
+        return templates.TemplateResponse(request, "chatbot.html", {"user": current_user})
     except Exception as e:
         logger.error(f"Error rendering chatbot page: {str(e)}")
-        return templates.TemplateResponse(
-            "error.html",
-            {"request": request, "error": "Server error", "status_code": 500,
+        return render_cached(
+            request, "error.html",
+            {"error": "Server error", "status_code": 500,
              "message": "An error occurred while loading the chatbot interface."}
         )
 
 @router.post("/api/generate")
 async def generate_post(
     message: MessageRequest,
+    background_tasks: BackgroundTasks,
     token: Optional[str] = Depends(get_token_from_cookie),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
-    current_user = get_user_from_token(db, token)
+    current_user = await get_user_from_token(db, token)
     if not current_user:
         raise HTTPException(status_code=401, detail="Invalid or missing token")
 
+    stored_search = None
+    if message.conversation_id is not None:
+        try:
+            stored_search = await search_context_store.load(db, message.conversation_id, current_user.id)
+        except LookupError as e:
+            raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+        # Don't hold a pooled connection during the LLM calls
+        await db.commit()
+
     try:
         logger.info(f"Generating post for user {current_user.username}")
-        print("message.content", message.content)
-        print("message.platforms", message.platforms)
-        result = generate_post_with_reflexion(message.content, message.platforms)
-        return JSONResponse(content=result)
+        classification, duplicates = None, {}
+        if message.on_duplicate != "generate":
+            # The pipeline makes blocking OpenAI calls, so keep it off the event loop
+            classification = await run_in_threadpool(classify_prompt, message.content)
+            try:
+                duplicates = await request_dedup_index.find_duplicates(
+                    db, current_user.id, message.content, classification, message.platforms
+                )
+            except Exception as e:
+                logger.error(f"Near-duplicate lookup failed: {str(e)}")
+            await db.commit()
+
+        if message.on_duplicate == "offer" and duplicates:
+            offered = {
+                platform: f"[{platform.capitalize()}] {duplicate['content']}"
+                for platform, duplicate in duplicates.items()
+            }
+            posts = dict(offered)
+            remaining = [platform for platform in message.platforms if platform not in duplicates]
+            if remaining:
+                result = await run_in_threadpool(
+                    run_generation_pipeline, message.content, remaining, 5, stored_search, classification,
+                    None, message.beam_config()
+                )
+                post_writer.enqueue_generation(current_user.id, result, conversation_id=message.conversation_id)
+                schedule_search_context_save(background_tasks, message, result)
+                posts.update(result["posts"])
+            logger.info(f"Offered existing posts for {', '.join(duplicates)}")
+            return JSONResponse(content={
+                "posts": {platform: posts[platform] for platform in message.platforms if platform in posts},
+                "duplicates": {
+                    platform: {"post_id": duplicate["post_id"], "similarity": duplicate["similarity"]}
+                    for platform, duplicate in duplicates.items()
+                }
+            })
+
+        seed_posts = {platform: duplicate["content"] for platform, duplicate in duplicates.items()}
+        result = await run_in_threadpool(
+            run_generation_pipeline, message.content, message.platforms, 5, stored_search, classification, seed_posts,
+            message.beam_config()
+        )
+        # Persisted in the background; the response never waits on the database
+        post_writer.enqueue_generation(current_user.id, result, conversation_id=message.conversation_id)
+        schedule_search_context_save(background_tasks, message, result)
+        return JSONResponse(content=result["posts"])
 
     except Exception as e:
         logger.error(f"Error generating post: {str(e)}")
@@ -0,0 +1,162 @@
+# app/routes/post_routes.py
+import logging
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, status
+from pydantic import BaseModel
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..auth import get_current_active_user
+from ..database import get_async_db
+from ..services import post_service
+from ..services.chatbot_service import get_chatbot_service
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+class FeedbackRequest(BaseModel):
+    feedback: str
+
+class ScheduleRequest(BaseModel):
+    scheduled_at: datetime  # Naive times are taken as UTC
+
+@router.get("/api/posts")
+async def list_posts(
+    platform: Optional[str] = None,
+    created_after: Optional[datetime] = None,
+    created_before: Optional[datetime] = None,
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    current_user=Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List the current user's posts, newest first. Pass next_cursor back to get the next page."""
+    try:
+        posts, next_cursor = await post_service.list_posts(
+            db,
+            user_id=current_user.id,
+            platform=platform,
+            created_after=created_after,
+            created_before=created_before,
+            cursor=cursor,
+            limit=limit
+        )
+        return {"items": posts, "next_cursor": next_cursor}
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error listing posts for user {current_user.id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to list posts")
+
+@router.get("/api/posts/search")
+async def search_posts(
+    q: str = Query(..., min_length=1),
+    limit: int = Query(20, ge=1, le=100),
+    explain: bool = False,
+    current_user=Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """
+    Search the current user's posts.
+
+    Accepts free text plus filters, e.g. ``platform:twitter score>=8 after:2025-01-01 "product launch"``.
+    Pass explain=true to include the query plan.
+    """
+    try:
+        posts, plan = await post_service.search_posts(db, user_id=current_user.id, query=q, limit=limit)
+        response = {"items": posts}
+        if explain:
+            response["plan"] = plan
+        return response
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error searching posts for user {current_user.id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to search posts")
+
+@router.get("/api/conversations/{conversation_id}/messages")
+async def list_conversation_messages(
+    conversation_id: int,
+    cursor: Optional[str] = None,
+    limit: int = Query(50, ge=1, le=200),
+    current_user=Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """List a conversation's messages, newest first."""
+    try:
+        messages, next_cursor = await post_service.list_messages(
+            db,
+            user_id=current_user.id,
+            conversation_id=conversation_id,
+            cursor=cursor,
+            limit=limit
+        )
+        return {"items": messages, "next_cursor": next_cursor}
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error listing messages for conversation {conversation_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to list messages")
+
+@router.post("/api/posts/{post_id}/refine")
+async def refine_post(
+    post_id: int,
+    request: FeedbackRequest,
+    current_user=Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Revise one post from user feedback, reusing its stored classification and search context."""
+    if not request.feedback.strip():
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Feedback must not be empty")
+    try:
+        return await get_chatbot_service().refine_post(
+            db,
+            post_id=post_id,
+            user_id=current_user.id,
+            user_feedback=request.feedback
+        )
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error refining post {post_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to refine post")
+
+@router.post("/api/posts/{post_id}/schedule")
+async def schedule_post(
+    post_id: int,
+    request: ScheduleRequest,
+    current_user=Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Schedule (or reschedule) a post for publishing at scheduled_at."""
+    try:
+        return await post_service.schedule_post(db, current_user.id, post_id, request.scheduled_at)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error scheduling post {post_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to schedule post")
+
+@router.delete("/api/posts/{post_id}/schedule")
+async def unschedule_post(
+    post_id: int,
+    current_user=Depends(get_current_active_user),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Cancel a post's scheduled publish."""
+    try:
+        return await post_service.unschedule_post(db, current_user.id, post_id)
+    except LookupError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_409_CONFLICT, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error unscheduling post {post_id}: {str(e)}")
+        raise HTTPException(status_code=500, detail="Failed to unschedule post")
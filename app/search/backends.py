@@ -0,0 +1,233 @@
+"""
+Pluggable web-search backends.
+
+Backends are async and share one pooled aiohttp session that lives on a
+dedicated event-loop thread, so the synchronous pipeline (which runs in the
+request threadpool) can use them without creating a loop or a connection
+pool per call. A search issues one query per classified subtopic in
+parallel, then merges the hits, dropping repeats by normalized URL and by
+content hash, into the ``{"results": {"items": [...]}}`` shape that
+``SearchEngine.search`` returns.
+
+``settings.SEARCH_BACKEND`` selects the backend: "llm" keeps the LLM-only
+search, "tavily" queries the Tavily API at ``settings.TAVILY_API_URL``
+(point it at ``app.search.stub_server`` for tests and benchmarks).
+"""
+import asyncio
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+import aiohttp
+
+from ..config import settings
+from ..metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+class SearchBackendError(Exception):
+    """Raised when a backend can't complete a search."""
+
+class BackgroundLoop:
+    """Event loop on a daemon thread owning the pooled HTTP session."""
+
+    def __init__(self, connection_limit: int = 32, timeout: float = 10.0):
+        self.connection_limit = connection_limit
+        self.timeout = timeout
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._lock = threading.Lock()
+
+    def _ensure_started(self) -> asyncio.AbstractEventLoop:
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(target=self._loop.run_forever, name="search-backend-loop", daemon=True)
+                self._thread.start()
+            return self._loop
+
+    async def session(self) -> aiohttp.ClientSession:
+        """The shared session (created on first use, on the background loop)."""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connection_limit, ttl_dns_cache=300),
+                timeout=aiohttp.ClientTimeout(total=self.timeout)
+            )
+        return self._session
+
+    def run(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the background loop and wait for its result (from any thread)."""
+        loop = self._ensure_started()
+        future = asyncio.run_coroutine_threadsafe(coro, loop)
+        return future.result(timeout or self.timeout * 2)
+
+    async def run_async(self, coro):
+        """Await a coroutine on the background loop from another event loop."""
+        loop = self._ensure_started()
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(coro, loop))
+
+    def close(self):
+        """Close the session and stop the loop thread."""
+        with self._lock:
+            if self._loop is None:
+                return
+            if self._session is not None:
+                asyncio.run_coroutine_threadsafe(self._session.close(), self._loop).result(5)
+                self._session = None
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join(5)
+            self._loop.close()
+            self._loop = self._thread = None
+
+def normalize_url(url: str) -> str:
+    """Canonical form of a URL for deduplication (scheme/host case, fragment, trailing slash)."""
+    try:
+        parts = urlsplit(url.strip())
+    except ValueError:
+        return url.strip().lower()
+    path = parts.path.rstrip("/") or "/"
+    return urlunsplit((parts.scheme.lower(), parts.netloc.lower().removeprefix("www."), path, parts.query, ""))
+
+def content_hash(text: str) -> str:
+    """Hash of whitespace- and case-normalized content."""
+    return hashlib.sha1(" ".join(text.casefold().split()).encode("utf-8")).hexdigest()
+
+def merge_hits(hit_lists: List[List[Dict[str, Any]]], limit: int) -> List[Dict[str, Any]]:
+    """
+    Merge hits from several queries, dropping repeated URLs and repeated content.
+
+    Args:
+        hit_lists: Items per query, each with "fact", "source" and optional "url"/"score"
+        limit: Maximum items
+
+    Returns:
+        Items ordered by score, the best copy of each kept
+    """
+    best: Dict[str, Dict[str, Any]] = {}
+    seen_content: Dict[str, str] = {}
+    for hits in hit_lists:
+        for hit in hits:
+            fact = hit.get("fact") or ""
+            if not fact:
+                continue
+            url_key = normalize_url(hit["url"]) if hit.get("url") else f"content:{content_hash(fact)}"
+            digest = content_hash(fact)
+            key = seen_content.get(digest, url_key)
+            current = best.get(key)
+            if current is None or (hit.get("score") or 0) > (current.get("score") or 0):
+                best[key] = hit
+            seen_content.setdefault(digest, key)
+    ranked = sorted(best.values(), key=lambda hit: -(hit.get("score") or 0))
+    return ranked[:limit]
+
+def build_queries(query: str,
+                  category: Optional[str] = None,
+                  subtopics: Optional[List[str]] = None,
+                  max_subtopics: int = 3) -> List[str]:
+    """The main query plus one focused query per subtopic."""
+    main = f"{category}: {query}" if category else query
+    queries = [main]
+    for subtopic in (subtopics or [])[:max_subtopics]:
+        if subtopic and subtopic.strip():
+            queries.append(f"{query} {subtopic.strip()}")
+    return queries
+
+class SearchBackend:
+    """Base class: subclasses implement ``query`` for a single search string."""
+
+    name = "base"
+
+    def __init__(self, loop: Optional[BackgroundLoop] = None):
+        self.loop = loop or search_loop
+
+    async def query(self, session: aiohttp.ClientSession, text: str, max_results: int) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def search_async(self,
+                           query: str,
+                           category: Optional[str] = None,
+                           subtopics: Optional[List[str]] = None,
+                           num_results: int = 5) -> Dict[str, Any]:
+        """Query the main topic and every subtopic concurrently and merge the hits."""
+        session = await self.loop.session()
+        queries = build_queries(query, category, subtopics)
+        start = time.perf_counter()
+        outcomes = await asyncio.gather(
+            *(self.query(session, text, num_results) for text in queries),
+            return_exceptions=True
+        )
+        hit_lists = []
+        for text, outcome in zip(queries, outcomes):
+            if isinstance(outcome, BaseException):
+                metrics.counter(f"search.backend.{self.name}.errors").inc()
+                logger.warning(f"{self.name} query failed for '{text}': {str(outcome)}")
+            else:
+                hit_lists.append(outcome)
+        metrics.histogram(f"search.backend.{self.name}.seconds").observe(time.perf_counter() - start)
+        if not hit_lists:
+            raise SearchBackendError(f"All {len(queries)} {self.name} queries failed")
+
+        items = merge_hits(hit_lists, num_results)
+        return {
+            "original_query": query,
+            "enhanced_query": " | ".join(queries),
+            "category": category,
+            "results": {"items": items},
+            "timestamp": time.strftime("%Y-%m-%d")
+        }
+
+    def search(self,
+               query: str,
+               category: Optional[str] = None,
+               subtopics: Optional[List[str]] = None,
+               num_results: int = 5) -> Dict[str, Any]:
+        """Blocking form of search_async for the threadpool pipeline."""
+        return self.loop.run(self.search_async(query, category, subtopics, num_results))
+
+class TavilyBackend(SearchBackend):
+    """Tavily search API (or a compatible stub)."""
+
+    name = "tavily"
+
+    def __init__(self, api_key: Optional[str] = None, base_url: Optional[str] = None,
+                 loop: Optional[BackgroundLoop] = None, search_depth: str = "basic"):
+        super().__init__(loop)
+        self.api_key = api_key or settings.TAVILY_API_KEY
+        self.base_url = (base_url or settings.TAVILY_API_URL).rstrip("/")
+        self.search_depth = search_depth
+
+    async def query(self, session: aiohttp.ClientSession, text: str, max_results: int) -> List[Dict[str, Any]]:
+        async with session.post(
+            f"{self.base_url}/search",
+            json={"query": text, "max_results": max_results, "search_depth": self.search_depth},
+            headers={"Authorization": f"Bearer {self.api_key}"} if self.api_key else None
+        ) as response:
+            if response.status != 200:
+                raise SearchBackendError(f"Tavily returned HTTP {response.status}")
+            data = await response.json()
+        return [
+            {
+                "fact": (result.get("content") or "").strip(),
+                "source": result.get("title") or result.get("url") or "Unknown",
+                "url": result.get("url"),
+                "score": result.get("score")
+            }
+            for result in data.get("results") or []
+            if isinstance(result, dict)
+        ]
+
+# Shared loop/session used by every backend
+search_loop = BackgroundLoop(timeout=settings.SEARCH_BACKEND_TIMEOUT)
+
+def get_search_backend(name: Optional[str] = None) -> Optional[SearchBackend]:
+    """Backend selected by settings.SEARCH_BACKEND; None means LLM-only search."""
+    name = (name or settings.SEARCH_BACKEND).lower()
+    if name == "llm":
+        return None
+    if name == "tavily":
+        return TavilyBackend()
+    raise ValueError(f"Unknown search backend: {name}")
@@ -0,0 +1,201 @@
+"""
+Per-conversation search context store.
+
+Follow-up messages in a conversation are usually about the same topic, so
+the search results of earlier turns are kept in compact form. A cheap local
+relevance check (keyword overlap with the stored enhanced query, plus the
+category) decides whether a new message can reuse them, needs only the
+missing keywords searched, or needs a fresh search.
+"""
+import json
+import logging
+import re
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+
+from ..config import settings
+from ..models.chat import Conversation, ConversationSearchContext
+
+logger = logging.getLogger(__name__)
+
+REUSE = "reuse"
+EXTEND = "extend"
+MISS = "miss"
+
+MAX_ITEMS = 10
+MAX_FACT_CHARS = 500
+MAX_SOURCE_CHARS = 200
+
+STOPWORDS = {
+    "about", "after", "also", "been", "before", "being", "between", "both", "could", "does",
+    "doing", "each", "from", "have", "having", "here", "into", "just", "like", "make", "more",
+    "most", "much", "only", "other", "over", "post", "posts", "same", "should", "some", "such",
+    "than", "that", "their", "them", "then", "there", "these", "they", "this", "those", "through",
+    "very", "want", "what", "when", "where", "which", "while", "will", "with", "would", "write",
+    "your", "and", "the", "for", "are", "but", "not", "you", "all", "any", "can", "how", "our",
+    "out", "its", "was", "who", "why", "new", "get", "use", "via"
+}
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9+#.-]*[a-z0-9+#]|[a-z0-9]")
+
+def extract_keywords(*texts: Optional[str]) -> Set[str]:
+    """Lowercased content words (3+ characters, no stopwords) from the given texts."""
+    keywords = set()
+    for text in texts:
+        if not text:
+            continue
+        for word in _WORD.findall(text.lower()):
+            if len(word) >= 3 and word not in STOPWORDS:
+                keywords.add(word)
+    return keywords
+
+def request_keywords(prompt: str, classification: Optional[Dict[str, Any]] = None) -> Set[str]:
+    """Keywords describing a request: the prompt plus its classified focus and subtopics."""
+    classification = classification or {}
+    return extract_keywords(
+        prompt,
+        classification.get("focus"),
+        " ".join(classification.get("subtopics") or [])
+    )
+
+def assess_reuse(stored: Optional[Dict[str, Any]],
+                 prompt: str,
+                 classification: Optional[Dict[str, Any]] = None) -> Tuple[str, Set[str]]:
+    """
+    Decide whether stored search context covers a new message.
+
+    Args:
+        stored: Stored context as returned by SearchContextStore.load
+        prompt: The new message
+        classification: Classification of the new message
+
+    Returns:
+        (decision, missing_keywords) where decision is REUSE, EXTEND or MISS
+    """
+    if not stored or not stored.get("items"):
+        return MISS, set()
+
+    category = (classification or {}).get("category") or ""
+    if category and stored.get("category") and category.lower() != stored["category"].lower():
+        return MISS, set()
+
+    wanted = request_keywords(prompt, classification)
+    if not wanted:
+        return REUSE, set()
+    covered = set(stored.get("keywords") or ()) | extract_keywords(stored.get("enhanced_query"))
+    missing = wanted - covered
+    overlap = 1 - len(missing) / len(wanted)
+
+    if overlap >= settings.SEARCH_CONTEXT_REUSE_THRESHOLD:
+        return REUSE, missing
+    if overlap >= settings.SEARCH_CONTEXT_EXTEND_THRESHOLD:
+        return EXTEND, missing
+    return MISS, missing
+
+def compact_items(items: List[Dict[str, Any]]) -> List[Dict[str, str]]:
+    """Keep only fact and source, trimmed, de-duplicated and capped in number."""
+    compact, seen = [], set()
+    for item in items:
+        fact = str(item.get("fact", "")).strip()[:MAX_FACT_CHARS]
+        if not fact or fact.lower() in seen:
+            continue
+        seen.add(fact.lower())
+        compact.append({"fact": fact, "source": str(item.get("source", "Unknown"))[:MAX_SOURCE_CHARS]})
+    return compact[-MAX_ITEMS:]
+
+def merge_search_results(stored: Dict[str, Any], fresh: Dict[str, Any], missing: Set[str]) -> Dict[str, Any]:
+    """Extend stored search results with a search for the missing keywords."""
+    items = compact_items(stored.get("items", []) + fresh.get("results", {}).get("items", []))
+    enhanced_query = stored.get("enhanced_query") or ""
+    if missing:
+        enhanced_query = f"{enhanced_query} | {' '.join(sorted(missing))}".strip(" |")
+    return {
+        "original_query": fresh.get("original_query"),
+        "enhanced_query": enhanced_query,
+        "category": stored.get("category") or fresh.get("category"),
+        "results": {"items": items},
+        "timestamp": fresh.get("timestamp")
+    }
+
+def stored_as_search_results(stored: Dict[str, Any]) -> Dict[str, Any]:
+    """Present stored context in the SearchEngine.search result shape."""
+    return {
+        "original_query": stored.get("enhanced_query"),
+        "enhanced_query": stored.get("enhanced_query"),
+        "category": stored.get("category"),
+        "results": {"items": stored.get("items", [])},
+        "timestamp": stored.get("updated_at")
+    }
+
+class SearchContextStore:
+    """Loads and saves compact per-conversation search context."""
+
+    async def load(self, db, conversation_id: int, user_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Load a conversation's stored context.
+
+        Raises:
+            LookupError: If the conversation doesn't exist or belongs to another user
+        """
+        row = (await db.execute(
+            select(Conversation.id, ConversationSearchContext)
+            .outerjoin(ConversationSearchContext, ConversationSearchContext.conversation_id == Conversation.id)
+            .where(Conversation.id == conversation_id, Conversation.user_id == user_id)
+        )).first()
+        if row is None:
+            raise LookupError(f"Conversation {conversation_id} not found")
+        context = row.ConversationSearchContext
+        if context is None:
+            return None
+        try:
+            items = json.loads(context.items or "[]")
+        except ValueError:
+            items = []
+        return {
+            "enhanced_query": context.enhanced_query,
+            "category": context.category,
+            "keywords": (context.keywords or "").split(),
+            "items": items,
+            "updated_at": context.updated_at.isoformat() if context.updated_at else None
+        }
+
+    async def save(self, session_factory, conversation_id: int, prompt: str,
+                   classification: Optional[Dict[str, Any]], search_results: Dict[str, Any]):
+        """Insert or replace a conversation's stored context (run after the response is sent)."""
+        items = compact_items(search_results.get("results", {}).get("items", []))
+        keywords = request_keywords(prompt, classification) | extract_keywords(search_results.get("enhanced_query"))
+        values = {
+            "enhanced_query": search_results.get("enhanced_query"),
+            "category": search_results.get("category"),
+            "keywords": " ".join(sorted(keywords)),
+            "items": json.dumps(items, separators=(",", ":")),
+            "updated_at": datetime.utcnow()
+        }
+        try:
+            async with session_factory() as db:
+                result = await db.execute(
+                    update(ConversationSearchContext)
+                    .where(ConversationSearchContext.conversation_id == conversation_id)
+                    .values(**values)
+                )
+                if result.rowcount == 0:
+                    db.add(ConversationSearchContext(conversation_id=conversation_id, **values))
+                try:
+                    await db.commit()
+                except IntegrityError:
+                    # A concurrent request inserted first; overwrite it
+                    await db.rollback()
+                    await db.execute(
+                        update(ConversationSearchContext)
+                        .where(ConversationSearchContext.conversation_id == conversation_id)
+                        .values(**values)
+                    )
+                    await db.commit()
+            logger.debug(f"Stored search context for conversation {conversation_id} ({len(items)} items)")
+        except Exception as e:
+            logger.error(f"Failed to store search context for conversation {conversation_id}: {str(e)}")
+
+search_context_store = SearchContextStore()
@@ -0,0 +1,326 @@
+"""
+Near-duplicate detection with MinHash signatures and LSH banding.
+
+Each of a user's stored posts gets a MinHash signature of its request (the
+prompt plus the classified focus and subtopics), bucketed per platform. A
+new request is classified, signed the same way and looked up: a stored post
+on the same platform whose estimated Jaccard similarity reaches the
+threshold would almost certainly be regenerated, so it can be offered
+instead, or used as the reflexion seed. ``find_content_duplicates`` applies
+the same machinery to post contents for batch deduplication of history.
+
+Signing is CPU-bound (about a millisecond per post), so it runs in the
+threadpool. Each user's signatures catch up from the database and are
+persisted under ``settings.DEDUP_INDEX_DIR`` the same way as the search
+index (see user_indexes), so a restart doesn't re-sign their history.
+"""
+import base64
+import hashlib
+import json
+import logging
+import random
+import struct
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..metrics import metrics
+from ..models.post import SocialMediaPost
+from .parser import Analyzer
+from .user_indexes import Position, UserIndexCache, decode_position, encode_position
+
+logger = logging.getLogger(__name__)
+
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_analyzer = Analyzer()
+
+# Bump when shingling or hashing changes so persisted signatures are rebuilt
+SIGNATURE_FORMAT_VERSION = 2
+
+def shingles(text: str, size: int = 2) -> Set[str]:
+    """Word n-grams of the analyzed text (single words for texts shorter than n)."""
+    tokens = _analyzer.analyze(text or "")
+    if len(tokens) < size:
+        return set(tokens)
+    grams = {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+    if size > 1:
+        # Words too, so short prompts that reorder terms still match
+        grams.update(tokens)
+    return grams
+
+def request_text(prompt: Optional[str], classification: Optional[Dict[str, Any]] = None) -> str:
+    """Text describing a generation request: prompt, focus and subtopics."""
+    classification = classification or {}
+    parts = [prompt or "", classification.get("focus") or ""]
+    parts.extend(classification.get("subtopics") or [])
+    return " ".join(part for part in parts if isinstance(part, str))
+
+class MinHasher:
+    """MinHash signatures from universal hashes (a * x + b) mod p."""
+
+    def __init__(self, num_perm: int = 128, seed: int = 1):
+        rng = random.Random(seed)
+        self.num_perm = num_perm
+        self._permutations = [
+            (rng.randrange(1, _MERSENNE_PRIME), rng.randrange(0, _MERSENNE_PRIME))
+            for _ in range(num_perm)
+        ]
+
+    @staticmethod
+    def _hash(shingle: str) -> int:
+        return int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little")
+
+    def signature(self, features: Iterable[str]) -> Tuple[int, ...]:
+        """Signature of a feature set; empty sets get an all-max signature."""
+        hashes = [self._hash(feature) for feature in features]
+        if not hashes:
+            return tuple([_MAX_HASH] * self.num_perm)
+        return tuple(
+            min(((a * value + b) % _MERSENNE_PRIME) & _MAX_HASH for value in hashes)
+            for a, b in self._permutations
+        )
+
+    @staticmethod
+    def similarity(first: Sequence[int], second: Sequence[int]) -> float:
+        """Estimated Jaccard similarity of the sets behind two signatures."""
+        if not first:
+            return 0.0
+        return sum(1 for a, b in zip(first, second) if a == b) / len(first)
+
+class LSHIndex:
+    """Banded LSH over MinHash signatures."""
+
+    def __init__(self, num_perm: int = 128, bands: int = 16):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.bands = bands
+        self.rows = num_perm // bands
+        self._buckets: Dict[Tuple[int, Tuple[int, ...]], Set[Any]] = defaultdict(set)
+        self.signatures: Dict[Any, Tuple[int, ...]] = {}
+
+    def _band_keys(self, signature: Sequence[int]):
+        for band in range(self.bands):
+            yield band, tuple(signature[band * self.rows:(band + 1) * self.rows])
+
+    def add(self, key: Any, signature: Tuple[int, ...]):
+        """Insert or replace a signature."""
+        self.remove(key)
+        self.signatures[key] = signature
+        for band_key in self._band_keys(signature):
+            self._buckets[band_key].add(key)
+
+    def remove(self, key: Any):
+        signature = self.signatures.pop(key, None)
+        if signature is None:
+            return
+        for band_key in self._band_keys(signature):
+            bucket = self._buckets.get(band_key)
+            if bucket is not None:
+                bucket.discard(key)
+                if not bucket:
+                    del self._buckets[band_key]
+
+    def query(self, signature: Sequence[int], threshold: float) -> List[Tuple[Any, float]]:
+        """Keys whose estimated similarity to the signature reaches the threshold, best first."""
+        candidates: Set[Any] = set()
+        for band_key in self._band_keys(signature):
+            candidates.update(self._buckets.get(band_key, ()))
+        matches = [
+            (key, MinHasher.similarity(signature, self.signatures[key]))
+            for key in candidates
+        ]
+        matches = [(key, score) for key, score in matches if score >= threshold]
+        matches.sort(key=lambda item: (-item[1], str(item[0])))
+        return matches
+
+class _UserIndex:
+    def __init__(self, num_perm: int, bands: int):
+        self.num_perm = num_perm
+        self.lsh = LSHIndex(num_perm, bands)
+        self.position: Optional[Position] = None
+        self.dirty = False
+
+    def to_dict(self) -> Dict:
+        """Serializable form: signatures as base64 little-endian uint32 arrays."""
+        return {
+            "version": SIGNATURE_FORMAT_VERSION,
+            "num_perm": self.num_perm,
+            "position": encode_position(self.position),
+            "signatures": [
+                [platform, post_id, base64.b64encode(struct.pack(f"<{self.num_perm}I", *signature)).decode("ascii")]
+                for (platform, post_id), signature in self.lsh.signatures.items()
+            ]
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict, num_perm: int, bands: int) -> "_UserIndex":
+        """Rebuild an index saved with to_dict."""
+        if data.get("version") != SIGNATURE_FORMAT_VERSION or data.get("num_perm") != num_perm:
+            raise ValueError(f"Unsupported signature format: {data.get('version')}/{data.get('num_perm')}")
+        index = cls(num_perm, bands)
+        for platform, post_id, encoded in data.get("signatures", []):
+            index.lsh.add((platform, int(post_id)), struct.unpack(f"<{num_perm}I", base64.b64decode(encoded)))
+        index.position = decode_position(data.get("position"))
+        return index
+
+class RequestDedupIndex(UserIndexCache):
+    """Per-user LSH over the requests behind stored posts, keyed by (platform, post_id)."""
+
+    columns = (SocialMediaPost.platform, SocialMediaPost.prompt, SocialMediaPost.classification)
+    description = "dedup signatures"
+    load_errors = (ValueError, TypeError, KeyError, struct.error)
+
+    def __init__(self,
+                 threshold: float = 0.8,
+                 num_perm: int = 128,
+                 bands: int = 16,
+                 max_users: int = 1000,
+                 sync_batch_size: int = 1000,
+                 index_dir: Optional[str] = None):
+        """
+        Initialize the index.
+
+        Args:
+            threshold: Estimated Jaccard similarity at which a request counts as a duplicate
+            num_perm: MinHash signature length
+            bands: LSH bands
+            max_users: Indexes kept in memory; the least recently used are dropped
+            sync_batch_size: Posts fetched (and signed) per catch-up query
+            index_dir: Directory holding one signature file per user; None keeps them in memory only
+        """
+        super().__init__(index_dir, max_users=max_users, sync_batch_size=sync_batch_size)
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.bands = bands
+        self.hasher = MinHasher(num_perm)
+
+    def _new_index(self) -> _UserIndex:
+        return _UserIndex(self.num_perm, self.bands)
+
+    def _from_dict(self, data: Dict) -> _UserIndex:
+        return _UserIndex.from_dict(data, self.num_perm, self.bands)
+
+    def _contains(self, index: _UserIndex, row) -> bool:
+        return (row.platform, row.id) in index.lsh.signatures
+
+    async def _apply(self, index: _UserIndex, rows) -> int:
+        signed = await run_in_threadpool(self._sign_rows, rows)
+        for key, signature in signed:
+            index.lsh.add(key, signature)
+        return len(signed)
+
+    def sign(self, prompt: Optional[str], classification: Optional[Dict[str, Any]]) -> Tuple[int, ...]:
+        return self.hasher.signature(shingles(request_text(prompt, classification)))
+
+    def _sign_rows(self, rows) -> List[Tuple[Tuple[str, int], Tuple[int, ...]]]:
+        """((platform, post_id), signature) for stored posts that have a prompt."""
+        signed = []
+        for row in rows:
+            if not row.prompt:
+                continue
+            try:
+                classification = json.loads(row.classification) if row.classification else None
+            except ValueError:
+                classification = None
+            signed.append(((row.platform, row.id), self.sign(row.prompt, classification)))
+        return signed
+
+    async def find_duplicates(self,
+                              db: AsyncSession,
+                              user_id: int,
+                              prompt: str,
+                              classification: Optional[Dict[str, Any]],
+                              platforms: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Find stored posts that a new request would almost certainly reproduce.
+
+        Args:
+            db: Async database session
+            user_id: Requesting user
+            prompt: New request
+            classification: Classification of the new request
+            platforms: Requested platforms
+
+        Returns:
+            platform -> {"post_id", "content", "similarity"} for platforms with a match
+        """
+        index = await self.sync(db, user_id)
+        signature = await run_in_threadpool(self.sign, prompt, classification)
+        best: Dict[str, Tuple[int, float]] = {}
+        for (platform, post_id), similarity in index.lsh.query(signature, self.threshold):
+            if platform in platforms and platform not in best:
+                best[platform] = (post_id, similarity)
+        if not best:
+            return {}
+
+        rows = (await db.execute(
+            select(SocialMediaPost.id, SocialMediaPost.content)
+            .where(SocialMediaPost.user_id == user_id,
+                   SocialMediaPost.id.in_([post_id for post_id, _ in best.values()]))
+        )).all()
+        contents = {row.id: row.content for row in rows}
+        duplicates = {
+            platform: {"post_id": post_id, "content": contents[post_id], "similarity": round(similarity, 3)}
+            for platform, (post_id, similarity) in best.items()
+            if contents.get(post_id)
+        }
+        metrics.counter("dedup.requests_matched").inc(len(duplicates))
+        return duplicates
+
+def find_content_duplicates(posts: Iterable[Tuple[Any, str]],
+                            threshold: float = 0.8,
+                            num_perm: int = 128,
+                            bands: int = 16,
+                            shingle_size: int = 3) -> List[List[Any]]:
+    """
+    Group posts whose contents are near-duplicates.
+
+    Args:
+        posts: (key, content) pairs
+        threshold: Minimum estimated Jaccard similarity of content shingles
+        num_perm: Signature length
+        bands: LSH bands
+        shingle_size: Words per shingle
+
+    Returns:
+        Groups of two or more keys, each in input order
+    """
+    hasher = MinHasher(num_perm)
+    lsh = LSHIndex(num_perm, bands)
+    order: Dict[Any, int] = {}
+    parent: Dict[Any, Any] = {}
+
+    def find(key):
+        while parent[key] != key:
+            parent[key] = parent[parent[key]]
+            key = parent[key]
+        return key
+
+    for key, content in posts:
+        signature = hasher.signature(shingles(content, shingle_size))
+        order[key] = len(order)
+        parent[key] = key
+        for match, _ in lsh.query(signature, threshold):
+            root, other = find(key), find(match)
+            if root != other:
+                parent[other] = root
+        lsh.add(key, signature)
+
+    groups: Dict[Any, List[Any]] = defaultdict(list)
+    for key in order:
+        groups[find(key)].append(key)
+    return [group for group in groups.values() if len(group) > 1]
+
+# Shared request index
+request_dedup_index = RequestDedupIndex(
+    threshold=settings.DEDUP_THRESHOLD,
+    num_perm=settings.DEDUP_NUM_PERM,
+    bands=settings.DEDUP_BANDS,
+    index_dir=settings.DEDUP_INDEX_DIR
+)
@@ -1,11 +1,11 @@
 import logging
-import os
 import json
 from typing import List, Dict, Any, Optional
 from openai import OpenAI
 
-from dotenv import load_dotenv
-load_dotenv()
+from ..config import settings
+from .backends import SearchBackend, get_search_backend
+from .fact_store import FactStore, fact_store as default_fact_store
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
@@ -15,45 +15,155 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 
 class SearchEngine:
-    def __init__(self, api_key=None, model="gpt-4o"):
-        self.api_key = api_key or os.environ.get("OPENAI_API_KEY")
+    def __init__(self, api_key=None, model="gpt-4o", fact_store: Optional[FactStore] = default_fact_store,
+                 backend: Optional[SearchBackend] = None):
+        self.api_key = api_key or settings.OPENAI_API_KEY
         self.model = model
         self.client = OpenAI(api_key=self.api_key)
+        self.fact_store = fact_store
+        self.backend = backend if backend is not None else get_search_backend()
         logger.info(f"Search Engine initialized using OpenAI model: {model}")
 
     def search(self, query: str, category: Optional[str] = None, 
                subtopics: Optional[List[str]] = None, 
                intent: Optional[str] = None,
                num_results: int = 5) -> Dict[str, Any]:
+        """
+        Search for facts, answering from the local fact store first.
+
+        Only the facts the store can't supply are searched for, with the
+        configured web backend when there is one (falling back to the LLM),
+        and the new facts are added to the store for later prompts.
+        """
+        local_items = []
+        if self.fact_store is not None:
+            try:
+                local_query = " ".join([query] + list(subtopics or [])[:3])
+                local_items = self.fact_store.retrieve(
+                    local_query,
+                    category=category,
+                    limit=num_results,
+                    max_age_days=settings.FACT_STORE_MAX_AGE_DAYS
+                )
+            except Exception as e:
+                logger.error(f"Fact store lookup failed: {str(e)}")
+        if len(local_items) >= num_results:
+            logger.info(f"Search answered from the fact store ({len(local_items)} facts)")
+            return {
+                "original_query": query,
+                "enhanced_query": self._enhance_query(query, category, subtopics, intent),
+                "category": category,
+                "results": {"items": local_items},
+                "timestamp": "2025-04-21"
+            }
+
+        search_results = None
+        if self.backend is not None:
+            try:
+                search_results = self.backend.search(query, category, subtopics, num_results - len(local_items))
+                search_results["fresh"] = True
+                logger.info(f"Search answered by the {self.backend.name} backend")
+            except Exception as e:
+                logger.error(f"{self.backend.name} search failed, falling back to the LLM: {str(e)}")
+        if search_results is None:
+            search_results = self._search_llm(query, category, subtopics, intent, num_results - len(local_items),
+                                              known_facts=[item["fact"] for item in local_items])
+        fresh_items = search_results["results"]["items"]
+        if search_results.pop("fresh", False):
+            if self.fact_store is not None and fresh_items:
+                try:
+                    self.fact_store.add(fresh_items, category=category)
+                except Exception as e:
+                    logger.error(f"Failed to store search facts: {str(e)}")
+        elif local_items:
+            # Prefer the stored facts over fallback placeholders
+            fresh_items = []
+            search_results.pop("fallback", None)
+        search_results["results"]["items"] = local_items + fresh_items
+        return search_results
+
+    @staticmethod
+    def _enhance_query(query: str, category: Optional[str] = None,
+                       subtopics: Optional[List[str]] = None,
+                       intent: Optional[str] = None) -> str:
+        enhanced_query = query
+        if category:
+            enhanced_query = f"{category}: {query}"
+        if subtopics:
+            subtopics_str = ", ".join(subtopics[:3])
+            enhanced_query += f" (focusing on {subtopics_str})"
+        if intent:
+            enhanced_query += f" | Intent: {intent}"
+        return enhanced_query
+
+    def build_llm_request(self, query: str, category: Optional[str] = None,
+                          subtopics: Optional[List[str]] = None,
+                          intent: Optional[str] = None,
+                          num_results: int = 5,
+                          known_facts: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Chat completion request body for an LLM search (shared by live and batch search)."""
+        enhanced_query = self._enhance_query(query, category, subtopics, intent)
+        current_year = 2025
+        system_prompt = (
+            f"You are a web search expert with access to the latest information as of {current_year}. "
+            f"Given a query about {category or 'a topic'}, provide {num_results} distinct, factual, and recent pieces of information.\n"
+            f"Return as JSON with an array called 'results', each having 'fact' and 'source'."
+        )
+        if known_facts:
+            system_prompt += "\nThese facts are already known; do not repeat them:\n" + "\n".join(
+                f"- {fact}" for fact in known_facts
+            )
+
+        # Only change: Fixed the response_format to be a dict instead of string
+        return {
+            "model": self.model,
+            "messages": [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": f"Search query: {enhanced_query}"}
+            ],
+            "temperature": 0.5,
+            "response_format": {"type": "json_object"}  # Changed from "json_object" string
+        }
+
+    @staticmethod
+    def parse_llm_response(content: str, query: str, enhanced_query: str,
+                           category: Optional[str] = None) -> Dict[str, Any]:
+        """Search results from an LLM search response; unparseable content becomes a single fact."""
+        try:
+            results_data = json.loads(content)
+            items = [item for item in results_data.get("results") or [] if isinstance(item, dict)]
+            return {
+                "original_query": query,
+                "enhanced_query": enhanced_query,
+                "category": category,
+                "results": {"items": items},
+                "timestamp": "2025-04-21",
+                "fresh": True
+            }
+
+        except json.JSONDecodeError as e:
+            logger.warning(f"JSON decode error: {str(e)}")
+            return {
+                "original_query": query,
+                "enhanced_query": enhanced_query,
+                "category": category,
+                "results": {"items": [{"fact": content, "source": "OpenAI"}]},
+                "timestamp": "2025-04-21"
+            }
+
+    def _search_llm(self, query: str, category: Optional[str] = None,
+                    subtopics: Optional[List[str]] = None,
+                    intent: Optional[str] = None,
+                    num_results: int = 5,
+                    known_facts: Optional[List[str]] = None) -> Dict[str, Any]:
 
         try:
-            enhanced_query = query
-            if category:
-                enhanced_query = f"{category}: {query}"
-            if subtopics:
-                subtopics_str = ", ".join(subtopics[:3])
-                enhanced_query += f" (focusing on {subtopics_str})"
-            if intent:
-                enhanced_query += f" | Intent: {intent}"
+            enhanced_query = self._enhance_query(query, category, subtopics, intent)
 
             logger.info(f"Running enhanced search for: {enhanced_query}")
 
-            current_year = 2025
-            system_prompt = (
-                f"You are a web search expert with access to the latest information as of {current_year}. "
-                f"Given a query about {category or 'a topic'}, provide {num_results} distinct, factual, and recent pieces of information.\n"
-                f"Return as JSON with an array called 'results', each having 'fact' and 'source'."
-            )
-
-            # Only change: Fixed the response_format to be a dict instead of string
             response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Search query: {enhanced_query}"}
-                ],
-                temperature=0.5,
-                response_format={"type": "json_object"}  # Changed from "json_object" string
+                **self.build_llm_request(query, category, subtopics, intent, num_results, known_facts)
             )
 
             content = response.choices[0].message.content
@@ -64,26 +174,7 @@ class SearchEngine:
             print(content[:1000])
             print("🔍 End of Search Output\n")
 
-            try:
-                results_data = json.loads(content)
-                items = results_data.get("results") or []
-                return {
-                    "original_query": query,
-                    "enhanced_query": enhanced_query,
-                    "category": category,
-                    "results": {"items": items},
-                    "timestamp": "2025-04-21"
-                }
-
-            except json.JSONDecodeError as e:
-                logger.warning(f"JSON decode error: {str(e)}")
-                return {
-                    "original_query": query,
-                    "enhanced_query": enhanced_query,
-                    "category": category,
-                    "results": {"items": [{"fact": content, "source": "OpenAI"}]},
-                    "timestamp": "2025-04-21"
-                }
+            return self.parse_llm_response(content, query, enhanced_query, category)
 
         except Exception as e:
             logger.exception(f"Search via OpenAI failed: {str(e)}")
@@ -92,13 +183,15 @@ class SearchEngine:
                 "enhanced_query": query,
                 "category": category,
                 "results": {"items": self._get_fallback_results(category)},
-                "timestamp": "2025-04-21"
+                "timestamp": "2025-04-21",
+                "fallback": True
             }
 
     def _get_fallback_results(self, category: Optional[str] = None) -> List[Dict[str, str]]:
         return [{"fact": f"Fallback info for {category or 'Technology'}.", "source": "Fallback DB"}]
 
-    def format_search_context(self, search_results: Dict[str, Any]) -> str:
+    @staticmethod
+    def format_search_context(search_results: Dict[str, Any]) -> str:
         context_parts = [
             f"SEARCH CONTEXT FOR: {search_results.get('enhanced_query')}",
             f"CATEGORY: {search_results.get('category')}",
@@ -115,7 +208,7 @@ class SearchEngine:
         return "\n".join(context_parts)
 
 def query_search(prompt: str, category: Optional[str] = None, subtopics: Optional[List[str]] = None, intent: Optional[str] = None) -> str:
-    api_key = os.environ.get("OPENAI_API_KEY")
+    api_key = settings.OPENAI_API_KEY
     engine = SearchEngine(api_key=api_key)
     search_results = engine.search(prompt, category, subtopics, intent)
     print("search_results-------------------->", search_results)
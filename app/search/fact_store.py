@@ -0,0 +1,475 @@
+"""
+Local on-disk corpus of search facts with a memory-mapped BM25 index.
+
+Every fact/source pair returned by the LLM search is appended to the
+corpus so later prompts on the same topic can be answered locally. Files
+under ``settings.FACT_STORE_DIR``:
+
+    facts.dat         one JSON record per line: fact, source, category, added_at
+    facts.off         little-endian uint64 byte offset of each record
+    postings.N.bin    merged postings, (doc_id uint32, term frequency uint16)
+                      pairs grouped by term
+    doclen.N.bin      uint16 token count of each merged document
+    lexicon.N.json    term -> [first posting, posting count], plus segment totals
+    index.json        manifest naming the current generation N
+    facts.lock        lock file serializing writers across processes
+
+Postings and document lengths are memory-mapped, so only the lexicon and
+the pages touched by a query are resident. Facts added since the last merge
+live in a small in-memory delta that is folded into the files once it
+reaches ``merge_threshold``; the delta is rebuilt from facts.dat on start,
+so a crash loses nothing. A merge writes a complete new generation of the
+three index files and then atomically replaces the manifest, so a crash
+at any point leaves either the old or the new generation in use, never a
+mix of the two.
+
+Several processes (uvicorn workers, bulk_generate.py) may share the
+directory. Appends and merges hold an exclusive ``flock`` on facts.lock and
+reads hold a shared one; under the lock each process first catches up with
+the facts and index generations written by the others. Only complete
+8-byte offsets are read, so a write torn by a crash is ignored and then
+truncated by the next append.
+"""
+import fcntl
+import json
+import logging
+import math
+import mmap
+import os
+import re
+import struct
+import threading
+import time
+from array import array
+from contextlib import contextmanager
+from collections import Counter, defaultdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from ..config import settings
+from ..metrics import metrics
+from .parser import Analyzer
+
+logger = logging.getLogger(__name__)
+
+OFFSET = struct.Struct("<Q")
+POSTING = struct.Struct("<IH")
+DOC_LENGTH = struct.Struct("<H")
+MAX_FREQUENCY = 0xFFFF
+
+MANIFEST = "index.json"
+# Index files of one generation; generation 0 is the unversioned layout of older stores
+_GENERATION_FILE = re.compile(r"^(postings|doclen|lexicon)(?:\.(\d+))?\.(bin|json)$")
+
+def _normalize(text: str) -> str:
+    return " ".join(text.casefold().split())
+
+class FactStore:
+    """Append-only fact corpus with BM25 retrieval over memory-mapped postings."""
+
+    def __init__(self,
+                 directory: str,
+                 merge_threshold: int = 1000,
+                 min_coverage: float = 0.5,
+                 k1: float = 1.2,
+                 b: float = 0.75):
+        """
+        Initialize the store (files are opened on first use).
+
+        Args:
+            directory: Directory holding the corpus and index files
+            merge_threshold: Delta size at which new facts are merged into the mapped files
+            min_coverage: Fraction of query terms a fact must contain to be returned
+            k1: BM25 term frequency saturation
+            b: BM25 length normalization
+        """
+        self.directory = directory
+        self.merge_threshold = merge_threshold
+        self.min_coverage = min_coverage
+        self.k1 = k1
+        self.b = b
+        self.analyzer = Analyzer()
+        self._lock = threading.RLock()
+        self._lock_fd: Optional[int] = None
+        self._loaded = False
+
+        self._offsets = array("Q")
+        self._generation = 0
+        self._lexicon: Dict[str, Tuple[int, int]] = {}
+        self._segment_docs = 0
+        self._segment_length = 0
+        self._postings_map: Optional[mmap.mmap] = None
+        self._lengths_map: Optional[mmap.mmap] = None
+        self._delta_postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        self._delta_lengths: Dict[int, int] = {}
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @contextmanager
+    def _process_lock(self, exclusive: bool):
+        """Hold the directory's flock (exclusive for writers, shared for readers)."""
+        if self._lock_fd is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._lock_fd = os.open(self._path("facts.lock"), os.O_RDWR | os.O_CREAT, 0o644)
+        fcntl.flock(self._lock_fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(self._lock_fd, fcntl.LOCK_UN)
+
+    def _index_path(self, kind: str, generation: int) -> str:
+        """Path of one generation's postings, doclen or lexicon file."""
+        extension = "json" if kind == "lexicon" else "bin"
+        if generation == 0:
+            return self._path(f"{kind}.{extension}")
+        return self._path(f"{kind}.{generation}.{extension}")
+
+    def _remove_other_generations(self):
+        """Delete index files left by earlier generations or by a merge that crashed."""
+        for name in os.listdir(self.directory):
+            match = _GENERATION_FILE.match(name.removesuffix(".tmp"))
+            if match is None or int(match.group(2) or 0) == self._generation and not name.endswith(".tmp"):
+                continue
+            try:
+                os.remove(self._path(name))
+            except OSError as e:
+                logger.warning(f"Could not remove stale fact index file {name}: {str(e)}")
+
+    @staticmethod
+    def _write_durably(path: str, write):
+        with open(path, "wb") as out:
+            write(out)
+            out.flush()
+            os.fsync(out.fileno())
+
+    @staticmethod
+    def _map(path: str) -> Optional[mmap.mmap]:
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return None
+        with open(path, "rb") as f:
+            return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _close_maps(self):
+        for mapped in (self._postings_map, self._lengths_map):
+            if mapped is not None:
+                mapped.close()
+        self._postings_map = self._lengths_map = None
+
+    def _ensure_loaded(self):
+        if self._loaded:
+            return
+        with self._process_lock(exclusive=True):
+            self._load_segment(self._read_generation())
+            self._refresh()
+            self._remove_other_generations()
+        self._loaded = True
+        logger.info(f"Fact store loaded: {len(self._offsets)} facts "
+                    f"({self._segment_docs} merged, {len(self._delta_lengths)} pending)")
+
+    def _read_generation(self) -> int:
+        manifest_path = self._path(MANIFEST)
+        if not os.path.exists(manifest_path):
+            return 0
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            return json.load(f)["generation"]
+
+    def _load_segment(self, generation: int):
+        """Map one generation's index files and drop the delta they cover."""
+        self._close_maps()
+        self._generation = generation
+        self._lexicon = {}
+        self._segment_docs = 0
+        self._segment_length = 0
+        lexicon_path = self._index_path("lexicon", generation)
+        if os.path.exists(lexicon_path):
+            with open(lexicon_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            self._lexicon = {term: tuple(entry) for term, entry in data["terms"].items()}
+            self._segment_docs = data["docs"]
+            self._segment_length = data["total_length"]
+        self._postings_map = self._map(self._index_path("postings", generation))
+        self._lengths_map = self._map(self._index_path("doclen", generation))
+        self._delta_postings.clear()
+        self._delta_lengths.clear()
+        # Facts appended after that merge go back into the delta
+        for doc_id in range(self._segment_docs, len(self._offsets)):
+            record = self._read(doc_id)
+            if record is not None:
+                self._index_delta(doc_id, record["fact"])
+
+    def _refresh(self):
+        """
+        Catch up with facts and merges written by other processes.
+
+        Called with the process lock held.
+        """
+        offsets_path = self._path("facts.off")
+        known = len(self._offsets)
+        if os.path.exists(offsets_path) and os.path.getsize(offsets_path) >= (known + 1) * OFFSET.size:
+            with open(offsets_path, "rb") as f:
+                f.seek(known * OFFSET.size)
+                data = f.read()
+            # A torn trailing offset is ignored
+            self._offsets.frombytes(data[:len(data) - len(data) % OFFSET.size])
+        generation = self._read_generation()
+        if generation != self._generation:
+            self._load_segment(generation)
+            return
+        for doc_id in range(max(known, self._segment_docs), len(self._offsets)):
+            record = self._read(doc_id)
+            if record is not None:
+                self._index_delta(doc_id, record["fact"])
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._ensure_loaded()
+            with self._process_lock(exclusive=False):
+                self._refresh()
+            return len(self._offsets)
+
+    # --- Corpus ---------------------------------------------------------
+
+    def _read(self, doc_id: int) -> Optional[Dict[str, Any]]:
+        with open(self._path("facts.dat"), "rb") as f:
+            f.seek(self._offsets[doc_id])
+            line = f.readline()
+        try:
+            return json.loads(line)
+        except ValueError:
+            logger.warning(f"Unreadable fact record {doc_id}")
+            return None
+
+    def add(self, items: List[Dict[str, Any]], category: Optional[str] = None) -> int:
+        """
+        Append new facts to the corpus; facts already stored verbatim are skipped.
+
+        Args:
+            items: Search result items with "fact" and "source"
+            category: Category the facts were found for
+
+        Returns:
+            Number of facts added
+        """
+        with self._lock:
+            self._ensure_loaded()
+            added = 0
+            now = int(time.time())
+            with self._process_lock(exclusive=True):
+                self._refresh()
+                offsets_path = self._path("facts.off")
+                complete = len(self._offsets) * OFFSET.size
+                if os.path.exists(offsets_path) and os.path.getsize(offsets_path) != complete:
+                    # Drop the tail of an offset write torn by a crash
+                    os.truncate(offsets_path, complete)
+                with open(self._path("facts.dat"), "ab") as data_file, open(offsets_path, "ab") as offsets_file:
+                    for item in items:
+                        if not isinstance(item, dict):
+                            continue
+                        fact = str(item.get("fact") or "").strip()
+                        if not fact or self._contains(fact):
+                            continue
+                        record = {
+                            "fact": fact,
+                            "source": str(item.get("source") or "Unknown"),
+                            "category": (category or "").lower(),
+                            "added_at": now
+                        }
+                        offset = data_file.tell()
+                        data_file.write(json.dumps(record, separators=(",", ":")).encode("utf-8") + b"\n")
+                        data_file.flush()  # Later items in the batch are checked against this one
+                        offsets_file.write(OFFSET.pack(offset))
+                        doc_id = len(self._offsets)
+                        self._offsets.append(offset)
+                        self._index_delta(doc_id, fact)
+                        added += 1
+                if len(self._delta_lengths) >= self.merge_threshold:
+                    self._merge()
+            if added:
+                metrics.counter("search.fact_store.added").inc(added)
+            return added
+
+    def _contains(self, fact: str) -> bool:
+        """Whether the exact fact (ignoring case and spacing) is already stored."""
+        normalized = _normalize(fact)
+        for doc_id, _ in self._rank(fact, limit=3):
+            record = self._read(doc_id)
+            if record is not None and _normalize(record["fact"]) == normalized:
+                return True
+        return False
+
+    # --- Index ----------------------------------------------------------
+
+    def _index_delta(self, doc_id: int, text: str):
+        terms = Counter(self.analyzer.analyze(text))
+        for term, frequency in terms.items():
+            self._delta_postings[term].append((doc_id, min(frequency, MAX_FREQUENCY)))
+        self._delta_lengths[doc_id] = min(sum(terms.values()), MAX_FREQUENCY)
+
+    def _segment_postings(self, term: str) -> Iterator[Tuple[int, int]]:
+        entry = self._lexicon.get(term)
+        if entry is None or self._postings_map is None:
+            return iter(())
+        start, count = entry
+        return POSTING.iter_unpack(self._postings_map[start * POSTING.size:(start + count) * POSTING.size])
+
+    def _doc_length(self, doc_id: int) -> int:
+        if doc_id < self._segment_docs:
+            return DOC_LENGTH.unpack_from(self._lengths_map, doc_id * DOC_LENGTH.size)[0]
+        return self._delta_lengths.get(doc_id, 0)
+
+    def _rank(self, query: str, limit: int) -> List[Tuple[int, float]]:
+        """BM25 over merged and pending postings; keeps docs with enough query terms."""
+        terms = set(self.analyzer.analyze(query))
+        doc_count = len(self._offsets)
+        if not terms or not doc_count:
+            return []
+        total_length = self._segment_length + sum(self._delta_lengths.values())
+        scale = self.b / (total_length / doc_count or 1.0)
+        base = 1 - self.b
+
+        scores: Dict[int, float] = defaultdict(float)
+        matched: Dict[int, int] = defaultdict(int)
+        for term in terms:
+            delta = self._delta_postings.get(term, [])
+            document_frequency = self._lexicon.get(term, (0, 0))[1] + len(delta)
+            if not document_frequency:
+                continue
+            weight = math.log(1 + (doc_count - document_frequency + 0.5) / (document_frequency + 0.5)) * (self.k1 + 1)
+            for postings in (self._segment_postings(term), delta):
+                for doc_id, frequency in postings:
+                    length = self._doc_length(doc_id)
+                    scores[doc_id] += weight * frequency / (frequency + self.k1 * (base + scale * length))
+                    matched[doc_id] += 1
+
+        required = math.ceil(len(terms) * self.min_coverage)
+        ranked = [(doc_id, score) for doc_id, score in scores.items() if matched[doc_id] >= required]
+        ranked.sort(key=lambda item: (-item[1], -item[0]))
+        return ranked[:limit]
+
+    def merge(self):
+        """Fold the in-memory delta into the mapped postings and length files."""
+        with self._lock:
+            self._ensure_loaded()
+            with self._process_lock(exclusive=True):
+                self._refresh()
+                self._merge()
+
+    def _merge(self):
+        """Write the next generation; called with both locks held and the store refreshed."""
+        if not self._delta_lengths:
+            return
+        started = time.perf_counter()
+        merged_docs = len(self._offsets)
+        generation = self._generation + 1
+        lexicon: Dict[str, Tuple[int, int]] = {}
+
+        def write_postings(out):
+            position = 0
+            for term in sorted(set(self._lexicon) | set(self._delta_postings)):
+                count = 0
+                entry = self._lexicon.get(term)
+                if entry is not None and self._postings_map is not None:
+                    start, existing = entry
+                    out.write(self._postings_map[start * POSTING.size:(start + existing) * POSTING.size])
+                    count += existing
+                delta = self._delta_postings.get(term, [])
+                for doc_id, frequency in delta:
+                    out.write(POSTING.pack(doc_id, frequency))
+                count += len(delta)
+                lexicon[term] = (position, count)
+                position += count
+
+        def write_lengths(out):
+            if self._lengths_map is not None:
+                out.write(self._lengths_map[:self._segment_docs * DOC_LENGTH.size])
+            for doc_id in range(self._segment_docs, merged_docs):
+                out.write(DOC_LENGTH.pack(self._delta_lengths.get(doc_id, 0)))
+
+        total_length = self._segment_length + sum(self._delta_lengths.values())
+        # The new generation is written beside the current one, which stays in use until the manifest moves
+        self._write_durably(self._index_path("postings", generation), write_postings)
+        self._write_durably(self._index_path("doclen", generation), write_lengths)
+        self._write_durably(self._index_path("lexicon", generation), lambda out: out.write(json.dumps(
+            {"docs": merged_docs, "total_length": total_length, "terms": lexicon}, separators=(",", ":")
+        ).encode("utf-8")))
+        manifest_tmp = self._path(f"{MANIFEST}.tmp")
+        self._write_durably(manifest_tmp, lambda out: out.write(json.dumps({"generation": generation}).encode("utf-8")))
+        # The single switch point: readers after this see the whole new generation
+        os.replace(manifest_tmp, self._path(MANIFEST))
+
+        self._close_maps()
+        self._generation = generation
+        self._postings_map = self._map(self._index_path("postings", generation))
+        self._lengths_map = self._map(self._index_path("doclen", generation))
+        self._remove_other_generations()
+        self._lexicon = lexicon
+        self._segment_docs = merged_docs
+        self._segment_length = total_length
+        self._delta_postings.clear()
+        self._delta_lengths.clear()
+        logger.info(f"Merged fact index: {merged_docs} facts, {len(lexicon)} terms "
+                    f"in {time.perf_counter() - started:.2f}s")
+
+    # --- Retrieval ------------------------------------------------------
+
+    def retrieve(self,
+                 query: str,
+                 category: Optional[str] = None,
+                 limit: int = 5,
+                 max_age_days: Optional[float] = None) -> List[Dict[str, str]]:
+        """
+        Find stored facts relevant to a query.
+
+        Args:
+            query: Search query (prompt plus subtopics)
+            category: Only facts stored for this category (any when None)
+            limit: Maximum facts
+            max_age_days: Ignore facts older than this
+
+        Returns:
+            Items with "fact" and "source", best first
+        """
+        with self._lock:
+            self._ensure_loaded()
+            with self._process_lock(exclusive=False):
+                self._refresh()
+            started = time.perf_counter()
+            cutoff = time.time() - max_age_days * 86400 if max_age_days else None
+            category = (category or "").lower()
+            facts = []
+            for doc_id, _ in self._rank(query, limit * 4):
+                record = self._read(doc_id)
+                if record is None:
+                    continue
+                if cutoff is not None and record.get("added_at", 0) < cutoff:
+                    continue
+                if category and record.get("category") and record["category"] != category:
+                    continue
+                facts.append({"fact": record["fact"], "source": record["source"]})
+                if len(facts) >= limit:
+                    break
+            metrics.histogram("search.fact_store.retrieve_seconds").observe(time.perf_counter() - started)
+            return facts
+
+    def close(self):
+        """Merge pending facts and release the mappings."""
+        with self._lock:
+            if self._loaded:
+                self.merge()
+                self._close_maps()
+                self._loaded = False
+                self._offsets = array("Q")
+                self._lexicon = {}
+                self._generation = 0
+                self._segment_docs = 0
+                self._segment_length = 0
+            if self._lock_fd is not None:
+                os.close(self._lock_fd)
+                self._lock_fd = None
+
+# Shared store used by SearchEngine
+fact_store = FactStore(
+    settings.FACT_STORE_DIR,
+    merge_threshold=settings.FACT_STORE_MERGE_THRESHOLD,
+    min_coverage=settings.FACT_STORE_MIN_COVERAGE
+)
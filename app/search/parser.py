@@ -0,0 +1,238 @@
+"""
+Full-text search over a user's post history.
+
+An analyzer turns text into normalized terms, and an in-process inverted
+index per user ranks posts with BM25. Indexes catch up incrementally from
+the database by (updated_at, id), so refined posts are reindexed on every
+worker, and are persisted as JSON under ``settings.SEARCH_INDEX_DIR`` so
+restarts don't rebuild them from scratch (see user_indexes).
+"""
+import heapq
+import logging
+import math
+import re
+import time
+from collections import Counter, defaultdict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..metrics import metrics
+from ..models.post import SocialMediaPost
+from .user_indexes import Position, UserIndexCache, decode_position, encode_position
+
+logger = logging.getLogger(__name__)
+
+INDEX_FORMAT_VERSION = 2
+
+STOPWORDS = frozenset({
+    "a", "about", "after", "all", "also", "an", "and", "any", "are", "as", "at", "be", "been",
+    "but", "by", "can", "do", "for", "from", "has", "have", "how", "i", "if", "in", "into", "is",
+    "it", "its", "just", "more", "my", "no", "not", "of", "on", "or", "our", "out", "so", "than",
+    "that", "the", "their", "them", "then", "there", "these", "they", "this", "to", "up", "us",
+    "was", "we", "were", "what", "when", "which", "who", "will", "with", "you", "your"
+})
+
+_TOKEN = re.compile(r"[^\W_]+", re.UNICODE)
+# Longest suffix first; a stem must keep at least three characters
+_SUFFIXES = ("ations", "ation", "ness", "ings", "ing", "ies", "ied", "ers", "est", "ed", "es", "er", "ly", "s")
+
+class Analyzer:
+    """Tokenizer and normalizer shared by indexing and querying."""
+
+    def __init__(self, stopwords: Iterable[str] = STOPWORDS, min_length: int = 2):
+        self.stopwords = frozenset(stopwords)
+        self.min_length = min_length
+
+    @staticmethod
+    def tokenize(text: str) -> List[str]:
+        """Split text into casefolded word tokens (hashtags and mentions lose their sigil)."""
+        return _TOKEN.findall(text.casefold()) if text else []
+
+    @staticmethod
+    def stem(token: str) -> str:
+        """Strip one common English suffix."""
+        for suffix in _SUFFIXES:
+            if token.endswith(suffix) and len(token) - len(suffix) >= 3:
+                if suffix in ("ies", "ied"):
+                    return token[:-len(suffix)] + "y"
+                return token[:-len(suffix)]
+        return token
+
+    def analyze(self, text: str) -> List[str]:
+        """Tokens of the text as index terms, in order and with repeats."""
+        return [
+            self.stem(token)
+            for token in self.tokenize(text)
+            if len(token) >= self.min_length and token not in self.stopwords
+        ]
+
+class InvertedIndex:
+    """BM25-ranked inverted index over one user's posts."""
+
+    def __init__(self, analyzer: Optional[Analyzer] = None, k1: float = 1.2, b: float = 0.75):
+        self.analyzer = analyzer or Analyzer()
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[int, int]] = defaultdict(dict)
+        self.doc_terms: Dict[int, Dict[str, int]] = {}
+        self.doc_lengths: Dict[int, int] = {}
+        self.total_length = 0
+        self.position: Optional[Position] = None  # (updated_at, id) of the last post synced
+        self.dirty = False
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def add(self, doc_id: int, text: str):
+        """Index a document, replacing any previous version of it."""
+        self.remove(doc_id)
+        terms = Counter(self.analyzer.analyze(text))
+        for term, frequency in terms.items():
+            self.postings[term][doc_id] = frequency
+        length = sum(terms.values())
+        self.doc_terms[doc_id] = dict(terms)
+        self.doc_lengths[doc_id] = length
+        self.total_length += length
+        self.dirty = True
+
+    def remove(self, doc_id: int):
+        """Drop a document from the index if present."""
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            postings = self.postings.get(term)
+            if postings is not None:
+                postings.pop(doc_id, None)
+                if not postings:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(doc_id, 0)
+        self.dirty = True
+
+    def candidates(self, query: str) -> Set[int]:
+        """Documents containing at least one term of the query."""
+        matches: Set[int] = set()
+        for term in set(self.analyzer.analyze(query)):
+            matches.update(self.postings.get(term, ()))
+        return matches
+
+    def search(self,
+               query: str,
+               limit: Optional[int] = 20,
+               doc_ids: Optional[Set[int]] = None) -> List[Tuple[int, float]]:
+        """
+        Rank documents against a free-text query.
+
+        Args:
+            query: Free-text query
+            limit: Maximum results (None for all matches)
+            doc_ids: Optional set of documents to restrict scoring to
+
+        Returns:
+            (doc_id, score) pairs, best first
+        """
+        doc_count = len(self.doc_lengths)
+        if not doc_count:
+            return []
+        k1 = self.k1
+        lengths = self.doc_lengths
+        base = 1 - self.b
+        scale = self.b / (self.total_length / doc_count or 1.0)
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(self.analyzer.analyze(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            weight = math.log(1 + (doc_count - len(postings) + 0.5) / (len(postings) + 0.5)) * (k1 + 1)
+            if doc_ids is not None and len(doc_ids) < len(postings):
+                # Walk the smaller side when scoring is restricted
+                matches = ((doc_id, postings[doc_id]) for doc_id in doc_ids if doc_id in postings)
+            else:
+                matches = postings.items()
+            for doc_id, frequency in matches:
+                if doc_ids is not None and doc_id not in doc_ids:
+                    continue
+                scores[doc_id] += weight * frequency / (frequency + k1 * (base + scale * lengths[doc_id]))
+        if limit is None:
+            return sorted(scores.items(), key=lambda item: (-item[1], -item[0]))
+        return heapq.nlargest(limit, scores.items(), key=lambda item: (item[1], item[0]))
+
+    def to_dict(self) -> Dict:
+        """Serializable form; postings are rebuilt from per-document term counts on load."""
+        return {
+            "version": INDEX_FORMAT_VERSION,
+            "position": encode_position(self.position),
+            "docs": {str(doc_id): terms for doc_id, terms in self.doc_terms.items()}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict, analyzer: Optional[Analyzer] = None) -> "InvertedIndex":
+        """Rebuild an index saved with to_dict."""
+        index = cls(analyzer)
+        if data.get("version") != INDEX_FORMAT_VERSION:
+            raise ValueError(f"Unsupported index format: {data.get('version')}")
+        for key, terms in data.get("docs", {}).items():
+            doc_id = int(key)
+            for term, frequency in terms.items():
+                index.postings[term][doc_id] = frequency
+            length = sum(terms.values())
+            index.doc_terms[doc_id] = terms
+            index.doc_lengths[doc_id] = length
+            index.total_length += length
+        index.position = decode_position(data.get("position"))
+        return index
+
+class PostSearchIndex(UserIndexCache):
+    """Per-user inverted indexes over SocialMediaPost.content, loaded on demand."""
+
+    columns = (SocialMediaPost.content,)
+    description = "search index"
+    load_errors = (ValueError, TypeError, KeyError, AttributeError)
+
+    def __init__(self, index_dir: str, max_users: int = 1000, sync_batch_size: int = 1000):
+        """
+        Initialize the index manager.
+
+        Args:
+            index_dir: Directory holding one JSON file per user
+            max_users: Indexes kept in memory; the least recently used are dropped
+            sync_batch_size: Posts fetched per catch-up query
+        """
+        super().__init__(index_dir, max_users=max_users, sync_batch_size=sync_batch_size)
+        self.analyzer = Analyzer()
+
+    def _new_index(self) -> InvertedIndex:
+        return InvertedIndex(self.analyzer)
+
+    def _from_dict(self, data: Dict) -> InvertedIndex:
+        return InvertedIndex.from_dict(data, self.analyzer)
+
+    def _contains(self, index: InvertedIndex, row) -> bool:
+        return row.id in index.doc_lengths
+
+    async def _apply(self, index: InvertedIndex, rows) -> int:
+        for row in rows:
+            index.add(row.id, row.content or "")
+        metrics.counter("search.index.documents_added").inc(len(rows))
+        return len(rows)
+
+    async def search(self, db: AsyncSession, user_id: int, query: str, limit: int = 20) -> List[Tuple[int, float]]:
+        """
+        Search a user's posts, catching the index up first.
+
+        Returns:
+            (post_id, score) pairs, best first
+        """
+        index = await self.sync(db, user_id)
+        start = time.perf_counter()
+        results = index.search(query, limit)
+        metrics.histogram("search.index.query_seconds").observe(time.perf_counter() - start)
+        return results
+
+# Shared index manager
+post_search_index = PostSearchIndex(
+    index_dir=settings.SEARCH_INDEX_DIR,
+    max_users=settings.SEARCH_INDEX_MAX_USERS
+)
@@ -0,0 +1,332 @@
+"""
+Structured query language for post history.
+
+Queries mix filters and free text, e.g.::
+
+    platform:twitter score>=8 after:2025-01-01 "product launch" -draft
+
+Filters compile to SQLAlchemy predicates that the
+``social_media_posts`` indexes can serve. Free-text terms and quoted
+phrases go to the BM25 index in ``app.search.parser``. A small planner
+estimates how many rows each side matches and starts from the more
+selective one: it either looks up the text candidates by primary key
+("text-first"), or narrows by SQL first and scores only those rows
+("sql-first").
+
+Supported filters:
+    platform:NAME[,NAME]  (or -platform:NAME to exclude)
+    score>=N, score>N, score<=N, score<N, score:N
+    after:DATE / since:DATE, before:DATE / until:DATE  (ISO dates)
+    published:true|false
+    conversation:ID
+"""
+import logging
+import re
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..metrics import metrics
+from ..models.post import PlatformType, SocialMediaPost
+from .parser import PostSearchIndex, post_search_index
+
+logger = logging.getLogger(__name__)
+
+SQL_ONLY = "sql"
+TEXT_FIRST = "text-first"
+SQL_FIRST = "sql-first"
+
+# Rough fraction of a user's posts each kind of predicate keeps, used to
+# estimate row counts when no text is involved in the comparison
+SELECTIVITY = {
+    "conversation": 0.01,
+    "platform": 1.0 / len(PlatformType),
+    "score": 0.3,
+    "created_at": 0.5,
+    "published": 0.5,
+}
+
+# Ids per IN (...) lookup
+ID_CHUNK_SIZE = 500
+
+_COMPARISON = {
+    ":": "__eq__", "=": "__eq__", ">=": "__ge__", ">": "__gt__", "<=": "__le__", "<": "__lt__"
+}
+FILTER_NAMES = {"platform", "score", "after", "since", "before", "until", "published", "conversation"}
+
+_TOKEN = re.compile(r'(-?)(?:(\w+)(>=|<=|:|=|>|<)("[^"]*"|\S+)|"([^"]*)"|(\S+))')
+
+class QuerySyntaxError(ValueError):
+    """Raised when a query can't be parsed."""
+
+@dataclass
+class Predicate:
+    """One compiled filter with its selectivity estimate."""
+    kind: str
+    description: str
+    clause: Any
+    selectivity: float
+
+@dataclass
+class ParsedQuery:
+    """Parsed form of a query string."""
+    predicates: List[Predicate] = field(default_factory=list)
+    terms: List[str] = field(default_factory=list)
+    phrases: List[str] = field(default_factory=list)
+    excluded_terms: List[str] = field(default_factory=list)
+
+    @property
+    def text(self) -> str:
+        """Free text sent to the full-text index."""
+        return " ".join(self.terms + self.phrases)
+
+    @property
+    def has_text(self) -> bool:
+        return bool(self.terms or self.phrases)
+
+    def clauses(self) -> List[Any]:
+        """SQL predicates, most selective first."""
+        return [predicate.clause for predicate in sorted(self.predicates, key=lambda p: p.selectivity)]
+
+    def selectivity(self) -> float:
+        estimate = 1.0
+        for predicate in self.predicates:
+            estimate *= predicate.selectivity
+        return estimate
+
+@dataclass
+class QueryPlan:
+    """Chosen execution strategy and the estimates behind it."""
+    strategy: str
+    indexed_posts: int = 0
+    estimated_sql_rows: Optional[float] = None
+    text_candidates: Optional[int] = None
+    predicates: List[str] = field(default_factory=list)
+
+    def explain(self) -> Dict[str, Any]:
+        return {
+            "strategy": self.strategy,
+            "indexed_posts": self.indexed_posts,
+            "estimated_sql_rows": None if self.estimated_sql_rows is None else round(self.estimated_sql_rows, 1),
+            "text_candidates": self.text_candidates,
+            "predicates": self.predicates,
+        }
+
+def _parse_date(value: str, name: str) -> datetime:
+    try:
+        return datetime.fromisoformat(value)
+    except ValueError:
+        raise QuerySyntaxError(f"Invalid date for {name}: {value}")
+
+def _parse_filter(name: str, op: str, value: str, negated: bool) -> Optional[Predicate]:
+    """Compile one name/op/value filter; returns None for names that aren't filters."""
+    name = name.lower()
+    if name not in FILTER_NAMES:
+        return None
+    if name == "platform":
+        if op not in (":", "="):
+            raise QuerySyntaxError(f"platform only supports ':' (got '{op}')")
+        platforms = [item.strip().lower() for item in value.split(",") if item.strip()]
+        if not platforms:
+            raise QuerySyntaxError("platform needs a value")
+        if negated:
+            return Predicate("platform", f"platform not in {platforms}",
+                             SocialMediaPost.platform.notin_(platforms), 1 - SELECTIVITY["platform"] * len(platforms))
+        return Predicate("platform", f"platform in {platforms}",
+                         SocialMediaPost.platform.in_(platforms), min(1.0, SELECTIVITY["platform"] * len(platforms)))
+    if negated:
+        raise QuerySyntaxError(f"'-' is not supported for {name}")
+    if name == "score":
+        try:
+            number = float(value)
+        except ValueError:
+            raise QuerySyntaxError(f"Invalid score: {value}")
+        clause = getattr(SocialMediaPost.final_score, _COMPARISON[op])(number)
+        return Predicate("score", f"final_score {op.replace(':', '=')} {number:g}", clause,
+                         SELECTIVITY["score"] if op not in (":", "=") else SELECTIVITY["score"] / 10)
+    if name in ("after", "since", "before", "until"):
+        if op not in (":", "="):
+            raise QuerySyntaxError(f"{name} only supports ':' (got '{op}')")
+        moment = _parse_date(value, name)
+        if name in ("after", "since"):
+            return Predicate("created_at", f"created_at >= {moment.isoformat()}",
+                             SocialMediaPost.created_at >= moment, SELECTIVITY["created_at"])
+        return Predicate("created_at", f"created_at < {moment.isoformat()}",
+                         SocialMediaPost.created_at < moment, SELECTIVITY["created_at"])
+    if name == "published":
+        flag = value.lower()
+        if flag not in ("true", "false", "yes", "no", "1", "0"):
+            raise QuerySyntaxError(f"Invalid published value: {value}")
+        published = flag in ("true", "yes", "1")
+        return Predicate("published", f"is_published = {published}",
+                         SocialMediaPost.is_published == published, SELECTIVITY["published"])
+    if name == "conversation":
+        try:
+            conversation_id = int(value)
+        except ValueError:
+            raise QuerySyntaxError(f"Invalid conversation id: {value}")
+        return Predicate("conversation", f"conversation_id = {conversation_id}",
+                         SocialMediaPost.conversation_id == conversation_id, SELECTIVITY["conversation"])
+    return None
+
+def parse_query(query: str) -> ParsedQuery:
+    """
+    Parse a query string into SQL predicates and free text.
+
+    Words that look like filters but use an unknown name (e.g. URLs) are
+    treated as free text.
+
+    Raises:
+        QuerySyntaxError: For malformed filter values or unbalanced quotes
+    """
+    if query.count('"') % 2:
+        raise QuerySyntaxError("Unbalanced quotes")
+    parsed = ParsedQuery()
+    for match in _TOKEN.finditer(query):
+        negated, name, op, value, phrase, word = match.groups()
+        negated = bool(negated)
+        if name:
+            predicate = _parse_filter(name, op, value.strip('"'), negated)
+            if predicate is not None:
+                parsed.predicates.append(predicate)
+                continue
+            word = f"{name}{op}{value}"
+        if phrase is not None:
+            phrase = " ".join(phrase.split())
+            if phrase:
+                (parsed.excluded_terms if negated else parsed.phrases).append(phrase)
+        elif word:
+            (parsed.excluded_terms if negated else parsed.terms).append(word)
+    return parsed
+
+def plan_query(parsed: ParsedQuery, indexed_posts: int, text_candidates: Optional[int] = None) -> QueryPlan:
+    """
+    Choose where to start: the full-text candidates or the SQL filters.
+
+    Args:
+        parsed: Parsed query
+        indexed_posts: Number of the user's posts (from the full-text index)
+        text_candidates: Posts matching the free text, if the query has any
+
+    Returns:
+        The plan; text-first when the text matches no more rows than the filters are estimated to
+    """
+    described = [predicate.description for predicate in sorted(parsed.predicates, key=lambda p: p.selectivity)]
+    if not parsed.has_text:
+        return QueryPlan(SQL_ONLY, indexed_posts, indexed_posts * parsed.selectivity(), None, described)
+    estimated_sql_rows = indexed_posts * parsed.selectivity()
+    strategy = TEXT_FIRST if not parsed.predicates or text_candidates <= estimated_sql_rows else SQL_FIRST
+    return QueryPlan(strategy, indexed_posts, estimated_sql_rows, text_candidates, described)
+
+def _contains_phrases(content: Optional[str], phrases: Sequence[str]) -> bool:
+    normalized = " ".join((content or "").casefold().split())
+    return all(phrase.casefold() in normalized for phrase in phrases)
+
+async def _filter_ids(db: AsyncSession, user_id: int, ids: Sequence[int], clauses: List[Any]) -> Set[int]:
+    """Keep the ids that satisfy the SQL predicates, looked up by primary key."""
+    kept: Set[int] = set()
+    ids = sorted(ids)
+    for start in range(0, len(ids), ID_CHUNK_SIZE):
+        chunk = ids[start:start + ID_CHUNK_SIZE]
+        kept.update((await db.execute(
+            select(SocialMediaPost.id)
+            .where(SocialMediaPost.user_id == user_id, SocialMediaPost.id.in_(chunk), *clauses)
+        )).scalars())
+    return kept
+
+async def execute_query(db: AsyncSession,
+                        user_id: int,
+                        query: str,
+                        columns: Sequence[Any],
+                        limit: int = 20,
+                        index: PostSearchIndex = post_search_index) -> Tuple[List[Dict[str, Any]], QueryPlan]:
+    """
+    Run a query over a user's posts.
+
+    Args:
+        db: Async database session
+        user_id: Owner of the posts
+        query: Query string (see module docstring)
+        columns: Columns to return; must include SocialMediaPost.id and content
+        limit: Maximum results
+        index: Full-text index manager
+
+    Returns:
+        (rows, plan); rows carry a "score" key when the query has free text
+
+    Raises:
+        QuerySyntaxError: If the query can't be parsed
+    """
+    start = time.perf_counter()
+    parsed = parse_query(query)
+    clauses = parsed.clauses()
+
+    if not parsed.has_text and not parsed.excluded_terms:
+        plan = plan_query(parsed, 0)
+        rows = (await db.execute(
+            select(*columns)
+            .where(SocialMediaPost.user_id == user_id, *clauses)
+            .order_by(SocialMediaPost.created_at.desc(), SocialMediaPost.id.desc())
+            .limit(limit)
+        )).all()
+        metrics.histogram(f"search.query.{plan.strategy}_seconds").observe(time.perf_counter() - start)
+        return [dict(row._mapping) for row in rows], plan
+
+    user_index = await index.sync(db, user_id)
+    excluded: Set[int] = set()
+    for term in parsed.excluded_terms:
+        # A post is excluded when it contains every word of the excluded term
+        matches = [user_index.candidates(word) for word in user_index.analyzer.analyze(term)]
+        if matches:
+            excluded |= set.intersection(*matches)
+
+    if parsed.has_text:
+        candidates = user_index.candidates(parsed.text) - excluded
+    else:
+        # Only exclusions: every indexed post is a candidate
+        candidates = set(user_index.doc_lengths) - excluded
+    plan = plan_query(parsed, len(user_index), len(candidates))
+
+    if not clauses:
+        allowed = candidates
+    elif plan.strategy == SQL_FIRST:
+        narrowed = set((await db.execute(
+            select(SocialMediaPost.id).where(SocialMediaPost.user_id == user_id, *clauses)
+        )).scalars())
+        allowed = narrowed & candidates
+    else:
+        allowed = await _filter_ids(db, user_id, candidates, clauses)
+
+    if parsed.has_text:
+        # Phrase checks can drop ranked posts, so only then is the full ranking needed
+        ranked = user_index.search(parsed.text, limit=None if parsed.phrases else limit, doc_ids=allowed)
+    else:
+        ranked = [(post_id, 0.0) for post_id in sorted(allowed, reverse=True)]
+
+    # Fetch rows in rank order, dropping those that miss a quoted phrase
+    results: List[Dict[str, Any]] = []
+    step = max(limit, ID_CHUNK_SIZE // 5)
+    for offset in range(0, len(ranked), step):
+        page = ranked[offset:offset + step]
+        rows = (await db.execute(
+            select(*columns)
+            .where(SocialMediaPost.user_id == user_id, SocialMediaPost.id.in_([post_id for post_id, _ in page]))
+        )).all()
+        by_id = {row.id: dict(row._mapping) for row in rows}
+        for post_id, score in page:
+            row = by_id.get(post_id)
+            if row is None or (parsed.phrases and not _contains_phrases(row.get("content"), parsed.phrases)):
+                continue
+            results.append({**row, "score": round(score, 4)})
+            if len(results) >= limit:
+                break
+        if len(results) >= limit:
+            break
+
+    metrics.histogram(f"search.query.{plan.strategy}_seconds").observe(time.perf_counter() - start)
+    logger.debug(f"Query for user {user_id} ran {plan.strategy}: {plan.explain()}")
+    return results, plan
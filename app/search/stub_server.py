@@ -0,0 +1,92 @@
+"""
+Local stand-in for the Tavily search API.
+
+Serves ``POST /search`` with deterministic results derived from the query,
+after a configurable delay, so the search backends can be exercised and
+benchmarked without network access or an API key. Some results are
+deliberately shared between related queries (same URL or same content) to
+exercise deduplication.
+
+Usage:
+    python -m app.search.stub_server --port 8765 --latency-ms 150
+
+Then set TAVILY_API_URL=http://127.0.0.1:8765 and SEARCH_BACKEND=tavily.
+"""
+import argparse
+import asyncio
+import hashlib
+import logging
+
+from aiohttp import web
+
+logger = logging.getLogger(__name__)
+
+def fake_results(query: str, max_results: int):
+    """Deterministic results for a query; the first word's results repeat across queries."""
+    words = query.split()
+    shared_topic = words[0].strip(":").lower() if words else "topic"
+    results = [{
+        "title": f"Overview of {shared_topic}",
+        "url": f"https://example.com/{shared_topic}/",
+        "content": f"{shared_topic.capitalize()} has been widely discussed this year.",
+        "score": 0.5
+    }]
+    for rank in range(max(0, max_results - 1)):
+        digest = hashlib.sha1(f"{query}|{rank}".encode("utf-8")).hexdigest()[:10]
+        results.append({
+            "title": f"{query} result {rank + 1}",
+            "url": f"https://example.com/articles/{digest}",
+            "content": f"Finding {digest} about {query}.",
+            "score": round(0.99 - rank * 0.05, 2)
+        })
+    return results[:max_results]
+
+def create_app(latency_ms: float = 0.0, api_key: str = "") -> web.Application:
+    """Build the stub application."""
+    async def search(request: web.Request) -> web.Response:
+        if api_key and request.headers.get("Authorization") != f"Bearer {api_key}":
+            return web.json_response({"detail": "Unauthorized"}, status=401)
+        payload = await request.json()
+        if latency_ms:
+            await asyncio.sleep(latency_ms / 1000)
+        query = str(payload.get("query", ""))
+        max_results = int(payload.get("max_results", 5))
+        request.app["requests"] += 1
+        return web.json_response({
+            "query": query,
+            "results": fake_results(query, max_results),
+            "response_time": latency_ms / 1000
+        })
+
+    app = web.Application()
+    app["requests"] = 0
+    app.router.add_post("/search", search)
+    return app
+
+async def start_stub_server(host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0.0):
+    """
+    Start the stub on the running loop.
+
+    Returns:
+        (runner, base_url); call ``await runner.cleanup()`` to stop it
+    """
+    runner = web.AppRunner(create_app(latency_ms))
+    await runner.setup()
+    site = web.TCPSite(runner, host, port)
+    await site.start()
+    bound_port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://{host}:{bound_port}"
+
+def main():
+    """Run the stub server until interrupted."""
+    parser = argparse.ArgumentParser(description="Local stub of the Tavily search API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every response")
+    parser.add_argument("--api-key", default="", help="Require this bearer token when set")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    web.run_app(create_app(args.latency_ms, args.api_key), host=args.host, port=args.port)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""
+Per-user indexes over SocialMediaPost, persisted as JSON and caught up from the database.
+
+PostSearchIndex (BM25 over post contents) and RequestDedupIndex (MinHash
+over the requests behind posts) keep one small index per user and share the
+loading, catch-up and persistence here.
+
+Each index records the ``(updated_at, id)`` position of the last post it
+caught up to. A catch-up walks the user's posts in that order starting
+``settle_seconds`` before the position, so posts committed out of order
+(concurrent inserts, write-behind batches) are still picked up, and posts
+changed since (a refinement bumps ``updated_at``) are reindexed. Posts in
+the settle window that are already indexed are skipped.
+
+Several processes may share the index directory. Files are written under a
+per-process temporary name and atomically replaced, and a process reloads a
+file another process has replaced when it is further along than its own
+copy. Each file is consistent with its own position, so whichever process
+writes last loses nothing: the next catch-up resumes from that position.
+"""
+import asyncio
+import json
+import logging
+import os
+from collections import OrderedDict, defaultdict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.post import SocialMediaPost
+
+logger = logging.getLogger(__name__)
+
+# (updated_at, id) of the last post an index caught up to
+Position = Tuple[datetime, int]
+
+def encode_position(position: Optional[Position]) -> Optional[List[Any]]:
+    """JSON form of a catch-up position."""
+    if position is None:
+        return None
+    return [position[0].isoformat(), position[1]]
+
+def decode_position(value: Optional[Sequence[Any]]) -> Optional[Position]:
+    """Parse a position saved with encode_position."""
+    if not value:
+        return None
+    return datetime.fromisoformat(value[0]), int(value[1])
+
+class UserIndexCache:
+    """
+    Per-user indexes loaded on demand, caught up from SocialMediaPost and persisted.
+
+    Subclasses build the index objects, which carry ``position``, ``dirty``
+    and ``to_dict()``, and apply fetched posts to them.
+    """
+
+    # SocialMediaPost columns fetched besides id and updated_at
+    columns: Tuple[Any, ...] = ()
+    # What the files hold, for log messages
+    description = "index"
+    # Errors that mark a persisted file as unreadable
+    load_errors: Tuple[Type[Exception], ...] = (ValueError, TypeError, KeyError)
+
+    def __init__(self,
+                 index_dir: Optional[str],
+                 max_users: int = 1000,
+                 sync_batch_size: int = 1000,
+                 settle_seconds: float = 60):
+        """
+        Initialize the cache.
+
+        Args:
+            index_dir: Directory holding one JSON file per user; None keeps indexes in memory only
+            max_users: Indexes kept in memory; the least recently used are dropped
+            sync_batch_size: Posts fetched per catch-up query
+            settle_seconds: How far before its position a catch-up starts, to pick up late commits
+        """
+        self.index_dir = index_dir
+        self.max_users = max_users
+        self.sync_batch_size = sync_batch_size
+        self.settle_seconds = settle_seconds
+        self._indexes: "OrderedDict[int, Any]" = OrderedDict()
+        self._locks: Dict[int, asyncio.Lock] = defaultdict(asyncio.Lock)
+        # (mtime_ns, size) of each user's file as last loaded or saved by this process
+        self._stamps: Dict[int, Optional[Tuple[int, int]]] = {}
+
+    def _new_index(self) -> Any:
+        raise NotImplementedError
+
+    def _from_dict(self, data: Dict) -> Any:
+        raise NotImplementedError
+
+    def _contains(self, index: Any, row) -> bool:
+        """Whether a fetched post is already in the index."""
+        raise NotImplementedError
+
+    async def _apply(self, index: Any, rows) -> int:
+        """Add or replace fetched posts in the index; returns how many were indexed."""
+        raise NotImplementedError
+
+    def _path(self, user_id: int) -> str:
+        return os.path.join(self.index_dir, f"user_{user_id}.json")
+
+    def _stamp(self, user_id: int) -> Optional[Tuple[int, int]]:
+        try:
+            stat = os.stat(self._path(user_id))
+        except FileNotFoundError:
+            return None
+        return stat.st_mtime_ns, stat.st_size
+
+    def _load(self, user_id: int) -> Tuple[Any, Optional[Tuple[int, int]]]:
+        """Read a user's file; returns the index and the stamp of the file read."""
+        if self.index_dir is None:
+            return self._new_index(), None
+        path = self._path(user_id)
+        stamp = None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                stat = os.fstat(f.fileno())
+                stamp = (stat.st_mtime_ns, stat.st_size)
+                return self._from_dict(json.load(f)), stamp
+        except FileNotFoundError:
+            return self._new_index(), None
+        except self.load_errors as e:
+            logger.warning(f"Discarding unreadable {self.description} {path}: {str(e)}")
+            return self._new_index(), stamp
+
+    def _save(self, user_id: int, data: Dict) -> Tuple[int, int]:
+        os.makedirs(self.index_dir, exist_ok=True)
+        path = self._path(user_id)
+        # Per-process temporary name, so workers saving the same user don't interleave
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, separators=(",", ":"))
+        stat = os.stat(tmp_path)
+        os.replace(tmp_path, path)
+        return stat.st_mtime_ns, stat.st_size
+
+    async def _get(self, user_id: int) -> Any:
+        index = self._indexes.get(user_id)
+        if index is None:
+            index, self._stamps[user_id] = await run_in_threadpool(self._load, user_id)
+            self._indexes[user_id] = index
+            while len(self._indexes) > self.max_users:
+                evicted, _ = self._indexes.popitem(last=False)
+                self._locks.pop(evicted, None)
+                self._stamps.pop(evicted, None)
+            return index
+
+        self._indexes.move_to_end(user_id)
+        if self.index_dir is not None and await run_in_threadpool(self._stamp, user_id) != self._stamps.get(user_id):
+            # Another process saved this user; adopt its file if it is further along
+            loaded, stamp = await run_in_threadpool(self._load, user_id)
+            self._stamps[user_id] = stamp
+            if loaded.position is not None and (index.position is None or loaded.position > index.position):
+                index = self._indexes[user_id] = loaded
+        return index
+
+    async def _persist(self, user_id: int, index: Any):
+        if self.index_dir is None or not index.dirty:
+            return
+        index.dirty = False
+        try:
+            self._stamps[user_id] = await run_in_threadpool(self._save, user_id, index.to_dict())
+        except OSError as e:
+            index.dirty = True
+            logger.error(f"Failed to persist {self.description} for user {user_id}: {str(e)}")
+
+    async def sync(self, db: AsyncSession, user_id: int) -> Any:
+        """Catch the user's index up with posts saved or changed since its last sync, and persist it."""
+        async with self._locks[user_id]:
+            index = await self._get(user_id)
+            position = index.position
+            cursor = None if position is None else (position[0] - timedelta(seconds=self.settle_seconds), 0)
+            applied = 0
+            while True:
+                query = select(SocialMediaPost.id, SocialMediaPost.updated_at, *self.columns).where(
+                    SocialMediaPost.user_id == user_id, SocialMediaPost.updated_at.isnot(None)
+                )
+                if cursor is not None:
+                    query = query.where(or_(
+                        SocialMediaPost.updated_at > cursor[0],
+                        and_(SocialMediaPost.updated_at == cursor[0], SocialMediaPost.id > cursor[1])
+                    ))
+                rows = (await db.execute(
+                    query.order_by(SocialMediaPost.updated_at, SocialMediaPost.id).limit(self.sync_batch_size)
+                )).all()
+                if not rows:
+                    break
+                fresh = [
+                    row for row in rows
+                    if position is None or (row.updated_at, row.id) > position or not self._contains(index, row)
+                ]
+                if fresh:
+                    applied += await self._apply(index, fresh)
+                cursor = (rows[-1].updated_at, rows[-1].id)
+                if len(rows) < self.sync_batch_size:
+                    break
+            if cursor is not None and (position is None or cursor > position):
+                index.position = cursor
+                index.dirty = True
+            if applied:
+                index.dirty = True
+                logger.debug(f"Caught up {self.description} for user {user_id}: {applied} posts")
+            await self._persist(user_id, index)
+            return index
@@ -0,0 +1,210 @@
+# app/services/post_service.py
+import base64
+import logging
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import and_, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models.chat import Conversation, Message
+from ..models.post import SocialMediaPost
+from ..search.query import execute_query
+from .scheduler import PUBLISHED, PUBLISHING, SCHEDULED, publish_scheduler, to_utc
+
+logger = logging.getLogger(__name__)
+
+# Columns returned by history listings; large pipeline columns are left out
+POST_SUMMARY_COLUMNS = (
+    SocialMediaPost.id,
+    SocialMediaPost.conversation_id,
+    SocialMediaPost.platform,
+    SocialMediaPost.content,
+    SocialMediaPost.final_score,
+    SocialMediaPost.is_published,
+    SocialMediaPost.scheduled_at,
+    SocialMediaPost.publish_status,
+    SocialMediaPost.created_at,
+)
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode the (created_at, id) position of the last row on a page."""
+    raw = f"{created_at.isoformat()}|{row_id}".encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode a cursor produced by encode_cursor; raises ValueError if malformed."""
+    try:
+        created_at, row_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("|")
+        return datetime.fromisoformat(created_at), int(row_id)
+    except Exception as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
+
+def _before_cursor(created_at_column, id_column, cursor: str):
+    """Keyset predicate selecting rows strictly after the cursor in newest-first order."""
+    cursor_created_at, cursor_id = decode_cursor(cursor)
+    return or_(
+        created_at_column < cursor_created_at,
+        and_(created_at_column == cursor_created_at, id_column < cursor_id)
+    )
+
+def _page(rows: List[Any], limit: int) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Trim the look-ahead row and build the next cursor."""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id) if has_more else None
+    return [dict(row._mapping) for row in rows], next_cursor
+
+async def list_posts(db: AsyncSession,
+                     user_id: int,
+                     platform: Optional[str] = None,
+                     created_after: Optional[datetime] = None,
+                     created_before: Optional[datetime] = None,
+                     cursor: Optional[str] = None,
+                     limit: int = 20) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    List a user's posts newest first using keyset pagination on (created_at, id).
+
+    The query walks ix_social_media_posts_user_id_created_at from the cursor
+    position, so every page costs the same regardless of how deep it is.
+
+    Args:
+        db: Async database session
+        user_id: Owner of the posts
+        platform: Optional platform filter
+        created_after: Optional inclusive lower bound on created_at
+        created_before: Optional exclusive upper bound on created_at
+        cursor: Cursor returned with the previous page
+        limit: Page size
+
+    Returns:
+        (posts, next_cursor) where next_cursor is None on the last page
+    """
+    query = select(*POST_SUMMARY_COLUMNS).where(SocialMediaPost.user_id == user_id)
+    if platform:
+        query = query.where(SocialMediaPost.platform == platform.lower())
+    if created_after:
+        query = query.where(SocialMediaPost.created_at >= created_after)
+    if created_before:
+        query = query.where(SocialMediaPost.created_at < created_before)
+    if cursor:
+        query = query.where(_before_cursor(SocialMediaPost.created_at, SocialMediaPost.id, cursor))
+    query = query.order_by(SocialMediaPost.created_at.desc(), SocialMediaPost.id.desc()).limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+    return _page(rows, limit)
+
+async def list_messages(db: AsyncSession,
+                        user_id: int,
+                        conversation_id: int,
+                        cursor: Optional[str] = None,
+                        limit: int = 50) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """
+    List a conversation's messages newest first using keyset pagination.
+
+    Raises:
+        LookupError: If the conversation doesn't exist or belongs to another user
+    """
+    owner = await db.execute(
+        select(Conversation.id).where(Conversation.id == conversation_id, Conversation.user_id == user_id)
+    )
+    if owner.scalar_one_or_none() is None:
+        raise LookupError(f"Conversation {conversation_id} not found")
+
+    query = select(
+        Message.id, Message.role, Message.content, Message.created_at
+    ).where(Message.conversation_id == conversation_id)
+    if cursor:
+        query = query.where(_before_cursor(Message.created_at, Message.id, cursor))
+    query = query.order_by(Message.created_at.desc(), Message.id.desc()).limit(limit + 1)
+
+    rows = (await db.execute(query)).all()
+    return _page(rows, limit)
+
+async def search_posts(db: AsyncSession,
+                       user_id: int,
+                       query: str,
+                       limit: int = 20) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """
+    Search a user's posts with the query language in app.search.query.
+
+    Plain words are ranked by BM25 in the in-process index; filters such as
+    ``platform:twitter score>=8 after:2025-01-01`` run as indexed SQL.
+
+    Args:
+        db: Async database session
+        user_id: Owner of the posts
+        query: Query string
+        limit: Maximum results
+
+    Returns:
+        (posts, plan) where posts carry a "score" key for free-text queries
+        and plan explains the chosen strategy
+
+    Raises:
+        ValueError: If the query can't be parsed
+    """
+    posts, plan = await execute_query(db, user_id, query, POST_SUMMARY_COLUMNS, limit)
+    return posts, plan.explain()
+
+async def schedule_post(db: AsyncSession, user_id: int, post_id: int, scheduled_at: datetime) -> Dict[str, Any]:
+    """
+    Schedule (or reschedule) one of a user's posts for publishing.
+
+    A time in the past publishes on the scheduler's next tick. Failed posts
+    can be scheduled again, as can posts held for reconciliation once the
+    user has checked the platform doesn't already show them.
+
+    Raises:
+        LookupError: If the post doesn't exist or belongs to another user
+        ValueError: If the post is already published or being published
+    """
+    scheduled_at = to_utc(scheduled_at)
+    result = await db.execute(
+        update(SocialMediaPost)
+        .where(
+            SocialMediaPost.id == post_id,
+            SocialMediaPost.user_id == user_id,
+            or_(SocialMediaPost.publish_status.is_(None),
+                SocialMediaPost.publish_status.notin_([PUBLISHING, PUBLISHED]))
+        )
+        .values(scheduled_at=scheduled_at, publish_status=SCHEDULED, publish_error=None)
+    )
+    if not result.rowcount:
+        await _raise_not_schedulable(db, user_id, post_id)
+    await db.commit()
+    publish_scheduler.schedule(post_id, scheduled_at)
+    return {"id": post_id, "scheduled_at": scheduled_at, "publish_status": SCHEDULED}
+
+async def unschedule_post(db: AsyncSession, user_id: int, post_id: int) -> Dict[str, Any]:
+    """
+    Cancel a post's pending publish.
+
+    Raises:
+        LookupError: If the post doesn't exist or belongs to another user
+        ValueError: If the post isn't scheduled
+    """
+    result = await db.execute(
+        update(SocialMediaPost)
+        .where(SocialMediaPost.id == post_id, SocialMediaPost.user_id == user_id,
+               SocialMediaPost.publish_status == SCHEDULED)
+        .values(scheduled_at=None, publish_status=None)
+    )
+    if not result.rowcount:
+        await _raise_not_schedulable(db, user_id, post_id, expected=SCHEDULED)
+    await db.commit()
+    publish_scheduler.cancel(post_id)
+    return {"id": post_id, "scheduled_at": None, "publish_status": None}
+
+async def _raise_not_schedulable(db: AsyncSession, user_id: int, post_id: int, expected: Optional[str] = None):
+    """Raise the error explaining why a schedule update matched no row."""
+    result = await db.execute(
+        select(SocialMediaPost.publish_status)
+        .where(SocialMediaPost.id == post_id, SocialMediaPost.user_id == user_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        raise LookupError(f"Post {post_id} not found")
+    if expected:
+        raise ValueError(f"Post {post_id} is not {expected}")
+    raise ValueError(f"Post {post_id} is already {row.publish_status}")
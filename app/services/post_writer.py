@@ -0,0 +1,222 @@
+# app/services/post_writer.py
+"""
+Write-behind persistence for generation results.
+
+Request handlers enqueue rows and return immediately; a background task
+drains the bounded queue and writes each batch with one multi-row INSERT
+per table. The queue is flushed completely on shutdown.
+
+A batch that fails is retried with backoff (unless the error is a bad row
+rather than a database problem), then written row by row so one bad row
+doesn't take the rest with it. Rows that still fail are logged in full.
+"""
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+from sqlalchemy import insert
+from sqlalchemy.exc import DataError, IntegrityError
+
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..llm.constraints import strip_platform_prefix
+from ..metrics import metrics
+from ..models.chat import Message
+from ..models.post import SocialMediaPost
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+def build_post_rows(user_id: int,
+                    result: Dict[str, Any],
+                    conversation_id: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Turn a pipeline result into social_media_posts rows.
+
+    Args:
+        user_id: Owner of the generated posts
+        result: Output of LLMEngine.run_pipeline
+        conversation_id: Optional conversation the posts belong to
+
+    Returns:
+        One row per platform, all with the same keys
+    """
+    classification = json.dumps(result.get("classification") or {})
+    rows = []
+    for platform, post in result.get("posts", {}).items():
+        refinement = result.get("refinement_data", {}).get(platform, {})
+        history = [
+            {"iteration": item.get("iteration"), "score": item.get("score"), "post": item.get("post"),
+             "scored_by": item.get("scored_by", "critic")}
+            for item in refinement.get("iteration_history", [])
+        ]
+        rows.append({
+            "conversation_id": conversation_id,
+            "user_id": user_id,
+            "platform": platform,
+            "content": strip_platform_prefix(post),
+            "prompt": result.get("prompt"),
+            "classification": classification,
+            "search_context": result.get("search_context"),
+            "critic_scores": json.dumps(history),
+            "final_score": refinement.get("final_score")
+        })
+    return rows
+
+class WriteBehindQueue:
+    """Bounded in-process queue flushed to the database by a background task."""
+
+    def __init__(self,
+                 session_factory=AsyncSessionLocal,
+                 max_size: int = 10000,
+                 batch_size: int = 500,
+                 flush_interval: float = 1.0,
+                 flush_attempts: int = 3,
+                 retry_delay: float = 0.5):
+        """
+        Initialize the queue.
+
+        Args:
+            session_factory: Factory returning async sessions
+            max_size: Maximum rows held in memory; further rows are dropped
+            batch_size: Maximum rows written per flush
+            flush_interval: Seconds to wait for more rows before flushing
+            flush_attempts: Tries per batch before falling back to row-by-row inserts
+            retry_delay: Wait before the first retry; doubles on each further one
+        """
+        self.session_factory = session_factory
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.flush_attempts = flush_attempts
+        self.retry_delay = retry_delay
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_size)
+        self._task: Optional[asyncio.Task] = None
+
+    def enqueue(self, model, row: Dict[str, Any]) -> bool:
+        """Queue a row for insertion into the model's table without waiting."""
+        try:
+            self._queue.put_nowait((model, row))
+            metrics.counter("write_behind.enqueued").inc()
+            return True
+        except asyncio.QueueFull:
+            metrics.counter("write_behind.dropped").inc()
+            logger.warning(f"Write-behind queue full; dropped a {model.__tablename__} row")
+            return False
+
+    def enqueue_many(self, model, rows: List[Dict[str, Any]]) -> int:
+        """Queue several rows; returns how many were accepted."""
+        return sum(1 for row in rows if self.enqueue(model, row))
+
+    def enqueue_generation(self, user_id: int, result: Dict[str, Any], conversation_id: Optional[int] = None) -> int:
+        """Queue the posts, classification, search context and critic scores of a pipeline run."""
+        return self.enqueue_many(SocialMediaPost, build_post_rows(user_id, result, conversation_id))
+
+    def enqueue_message(self, conversation_id: int, role: str, content: str) -> bool:
+        """Queue a conversation message."""
+        return self.enqueue(Message, {"conversation_id": conversation_id, "role": role, "content": content})
+
+    async def start(self):
+        """Start the background flusher."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info("Write-behind flusher started")
+
+    async def stop(self):
+        """Flush everything still queued and stop the background task."""
+        if self._task is None:
+            return
+        await self._queue.put(_STOP)
+        await self._task
+        self._task = None
+        logger.info("Write-behind flusher stopped")
+
+    async def _run(self):
+        stopping = False
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+            batch = [item]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            await self._flush(batch)
+
+        # Drain anything enqueued before the stop marker was processed
+        remaining = []
+        while not self._queue.empty():
+            item = self._queue.get_nowait()
+            if item is not _STOP:
+                remaining.append(item)
+        for start in range(0, len(remaining), self.batch_size):
+            await self._flush(remaining[start:start + self.batch_size])
+
+    async def _write(self, batch: List[Tuple[Any, Dict[str, Any]]]):
+        rows_by_model = defaultdict(list)
+        for model, row in batch:
+            rows_by_model[model].append(row)
+        async with self.session_factory() as db:
+            for model, rows in rows_by_model.items():
+                await db.execute(insert(model), rows)
+            await db.commit()
+
+    async def _flush(self, batch: List[Tuple[Any, Dict[str, Any]]]):
+        start = time.perf_counter()
+        try:
+            for attempt in range(1, self.flush_attempts + 1):
+                try:
+                    await self._write(batch)
+                    metrics.counter("write_behind.written").inc(len(batch))
+                    logger.debug(f"Write-behind flushed {len(batch)} rows")
+                    return
+                except (IntegrityError, DataError) as e:
+                    # A bad row fails the same way every time; find it row by row
+                    logger.warning(f"Write-behind flush of {len(batch)} rows rejected: {str(e)}")
+                    break
+                except Exception as e:
+                    if attempt == self.flush_attempts:
+                        logger.error(f"Write-behind flush of {len(batch)} rows failed {attempt} times: {str(e)}")
+                        break
+                    delay = self.retry_delay * 2 ** (attempt - 1)
+                    metrics.counter("write_behind.retries").inc()
+                    logger.warning(f"Write-behind flush of {len(batch)} rows failed ({str(e)}); "
+                                   f"retrying in {delay:.1f}s")
+                    await asyncio.sleep(delay)
+            await self._flush_rows(batch)
+        finally:
+            metrics.histogram("write_behind.flush_seconds").observe(time.perf_counter() - start)
+
+    async def _flush_rows(self, batch: List[Tuple[Any, Dict[str, Any]]]):
+        """Write rows one transaction each, logging every row that can't be written."""
+        written = 0
+        for model, row in batch:
+            try:
+                await self._write([(model, row)])
+                written += 1
+            except Exception as e:
+                metrics.counter("write_behind.failed").inc()
+                logger.error(f"Write-behind could not write a {model.__tablename__} row ({str(e)}): "
+                             f"{json.dumps(row, default=str)}")
+        metrics.counter("write_behind.written").inc(written)
+        logger.info(f"Write-behind wrote {written} of {len(batch)} rows individually")
+
+# Shared queue started and stopped by the application lifespan
+post_writer = WriteBehindQueue(
+    max_size=settings.WRITE_BEHIND_MAX_QUEUE,
+    batch_size=settings.WRITE_BEHIND_BATCH_SIZE,
+    flush_interval=settings.WRITE_BEHIND_FLUSH_INTERVAL
+)
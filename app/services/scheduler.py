@@ -0,0 +1,484 @@
+# app/services/scheduler.py
+"""
+Scheduled publishing.
+
+Publish times live in ``social_media_posts.scheduled_at`` (with
+``publish_status = 'scheduled'``); the database is the source of truth. The
+scheduler keeps the jobs due within its horizon in a hierarchical timing
+wheel, so adding, cancelling and ticking cost O(1) however many posts are
+pending, and hands due jobs to a pool of publisher workers. A periodic
+refill loads only the slice of time the horizon has moved forward over,
+plus the posts whose row changed since the previous refill (by
+``updated_at``), which picks up posts scheduled, rescheduled or cancelled
+by other processes without rescanning the horizon.
+
+Before publishing, a worker claims the row by moving it from 'scheduled'
+to 'publishing' in one UPDATE that also checks the row is still due, so a
+job that was cancelled or moved later meanwhile, or claimed by another
+process, is skipped. A claim holds a lease (``claimed_at``) that the
+scheduler renews while the publish is in flight. On startup only rows whose
+lease has lapsed, i.e. left in 'publishing' by a crashed process, go back
+to 'scheduled', and everything due within the horizon (including anything
+missed while down) is reloaded.
+
+Publishing itself is delegated to per-platform publisher coroutines
+registered with ``register_publisher`` (see ``app.publishing.connectors``).
+"""
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, Dict, Hashable, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, or_, select, update
+
+from ..config import settings
+from ..database import AsyncSessionLocal
+from ..metrics import metrics
+from ..models.post import SocialMediaPost
+
+logger = logging.getLogger(__name__)
+
+# publish_status values
+SCHEDULED = "scheduled"
+PUBLISHING = "publishing"
+PUBLISHED = "published"
+FAILED = "failed"
+# The publish may or may not have reached the platform; needs checking before it is scheduled again
+RECONCILE = "reconcile"
+
+# Rows read per query when loading jobs
+LOAD_BATCH_SIZE = 5000
+# Rows whose updated_at was set up to this long before they committed are still seen as changes
+CHANGE_SLACK = timedelta(seconds=60)
+
+_EXPIRED = -1
+
+class TimingWheel:
+    """
+    Hierarchical timing wheel (Varghese and Lauck).
+
+    Level L has ``slots`` buckets each spanning slots**L ticks. A job goes
+    into the lowest level whose window covers its due tick; when the clock
+    reaches the start of a higher-level bucket, the bucket's jobs cascade
+    down a level. Every job is moved at most once per level.
+    """
+
+    def __init__(self, tick_seconds: float = 1.0, slots: int = 64, levels: int = 4, now: Optional[float] = None):
+        """
+        Initialize the wheel.
+
+        Args:
+            tick_seconds: Resolution of the wheel
+            slots: Buckets per level
+            levels: Number of levels; jobs up to (slots - 1) * slots**(levels - 1) ticks ahead always fit
+            now: Current time in epoch seconds (defaults to time.time())
+        """
+        self.tick_seconds = tick_seconds
+        self.slots = slots
+        self.levels = levels
+        self.current_tick = self._tick(time.time() if now is None else now)
+        self._buckets: List[List[Dict[Hashable, Tuple[int, Any]]]] = [
+            [{} for _ in range(slots)] for _ in range(levels)
+        ]
+        self._expired: Dict[Hashable, Tuple[int, Any]] = {}
+        # job id -> (level, bucket) for O(1) cancellation; (_EXPIRED, 0) when waiting to fire
+        self._where: Dict[Hashable, Tuple[int, int]] = {}
+
+    def _tick(self, at: float) -> int:
+        return int(at // self.tick_seconds)
+
+    @property
+    def horizon_seconds(self) -> float:
+        """How far ahead a job is always accepted."""
+        return (self.slots - 1) * self.slots ** (self.levels - 1) * self.tick_seconds
+
+    def __len__(self) -> int:
+        return len(self._where)
+
+    def __contains__(self, job_id: Hashable) -> bool:
+        return job_id in self._where
+
+    def get(self, job_id: Hashable, default: Any = None) -> Any:
+        """Payload of a job in the wheel, or default."""
+        where = self._where.get(job_id)
+        if where is None:
+            return default
+        level, bucket = where
+        entries = self._expired if level == _EXPIRED else self._buckets[level][bucket]
+        return entries[job_id][1]
+
+    def _place(self, job_id: Hashable, due_tick: int, payload: Any) -> bool:
+        if due_tick <= self.current_tick:
+            self._expired[job_id] = (due_tick, payload)
+            self._where[job_id] = (_EXPIRED, 0)
+            return True
+        for level in range(self.levels):
+            span = self.slots ** level
+            if due_tick // span < self.current_tick // span + self.slots:
+                bucket = (due_tick // span) % self.slots
+                self._buckets[level][bucket][job_id] = (due_tick, payload)
+                self._where[job_id] = (level, bucket)
+                return True
+        return False
+
+    def add(self, job_id: Hashable, due: float, payload: Any = None) -> bool:
+        """
+        Schedule (or reschedule) a job for epoch time due.
+
+        Jobs already due fire on the next advance.
+
+        Returns:
+            False when due is beyond the wheel's range
+        """
+        self.cancel(job_id)
+        return self._place(job_id, self._tick(due), payload)
+
+    def cancel(self, job_id: Hashable) -> bool:
+        """Remove a job; returns False if it wasn't in the wheel."""
+        where = self._where.pop(job_id, None)
+        if where is None:
+            return False
+        level, bucket = where
+        if level == _EXPIRED:
+            del self._expired[job_id]
+        else:
+            del self._buckets[level][bucket][job_id]
+        return True
+
+    def advance(self, now: Optional[float] = None) -> List[Tuple[Hashable, Any]]:
+        """
+        Move the clock to now and return the (job_id, payload) of every job that came due.
+        """
+        target = self._tick(time.time() if now is None else now)
+        while self.current_tick < target:
+            self.current_tick += 1
+            # Cascade every higher-level bucket that starts at this tick
+            for level in range(self.levels - 1, 0, -1):
+                span = self.slots ** level
+                if self.current_tick % span:
+                    continue
+                bucket = self._buckets[level][(self.current_tick // span) % self.slots]
+                entries = list(bucket.items())
+                bucket.clear()
+                for job_id, (due_tick, payload) in entries:
+                    self._place(job_id, due_tick, payload)
+            bucket = self._buckets[0][self.current_tick % self.slots]
+            for job_id, entry in bucket.items():
+                self._expired[job_id] = entry
+                self._where[job_id] = (_EXPIRED, 0)
+            bucket.clear()
+
+        fired = [(job_id, payload) for job_id, (_, payload) in self._expired.items()]
+        for job_id, _ in fired:
+            del self._where[job_id]
+        self._expired.clear()
+        return fired
+
+Publisher = Callable[[Dict[str, Any]], Awaitable[Optional[str]]]
+
+# platform -> coroutine function publishing a post dict and returning the platform's post id
+PUBLISHERS: Dict[str, Publisher] = {}
+
+def register_publisher(platform: str, publisher: Publisher):
+    """Register the coroutine that publishes posts for a platform."""
+    PUBLISHERS[platform.lower()] = publisher
+
+def to_utc(when: datetime) -> datetime:
+    """Naive UTC datetime (as stored in the database) for an aware or naive-UTC datetime."""
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone.utc).replace(tzinfo=None)
+    return when
+
+def _epoch(when: datetime) -> float:
+    return when.replace(tzinfo=timezone.utc).timestamp()
+
+class PublishScheduler:
+    """Loads scheduled posts into a timing wheel and publishes them when due."""
+
+    def __init__(self,
+                 session_factory=AsyncSessionLocal,
+                 publishers: Optional[Dict[str, Publisher]] = None,
+                 tick_seconds: float = 1.0,
+                 horizon_seconds: float = 86400.0,
+                 refill_seconds: float = 60.0,
+                 lease_seconds: float = 600.0,
+                 workers: int = 4,
+                 wheel: Optional[TimingWheel] = None):
+        """
+        Initialize the scheduler.
+
+        Args:
+            session_factory: Factory returning async sessions
+            publishers: platform -> publisher coroutine (defaults to the PUBLISHERS registry)
+            tick_seconds: Resolution of the timing wheel
+            horizon_seconds: How far ahead jobs are held in memory
+            refill_seconds: Interval between refills (horizon advance and changed rows)
+            lease_seconds: How long a claim stays valid without renewal before a restart may requeue it
+            workers: Concurrent claims, and concurrent publishes per platform
+            wheel: Timing wheel to use (mainly for tests)
+        """
+        self.session_factory = session_factory
+        self.publishers = PUBLISHERS if publishers is None else publishers
+        self.tick_seconds = tick_seconds
+        self.wheel = wheel or TimingWheel(tick_seconds=tick_seconds)
+        self.horizon_seconds = min(horizon_seconds, self.wheel.horizon_seconds)
+        self.refill_seconds = min(refill_seconds, self.horizon_seconds / 2)
+        self.lease_seconds = lease_seconds
+        self.workers = workers
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._tasks: List[asyncio.Task] = []
+        self._publishing: Set[asyncio.Task] = set()
+        # platform -> semaphore bounding its concurrent publishes
+        self._platform_slots: Dict[str, asyncio.Semaphore] = {}
+        # Everything scheduled up to this time has been loaded from the database
+        self._loaded_until: Optional[datetime] = None
+        # Start of the last refill; rows updated after it (less CHANGE_SLACK) are rechecked
+        self._refilled_at: Optional[datetime] = None
+        # Ids of claimed posts whose publish is in flight; their leases are renewed
+        self._claimed: Set[int] = set()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        """Recover state from the database and start the clock and the workers."""
+        if self._tasks:
+            return
+        # Live schedulers renew their leases, so only a crashed process's claims are stale
+        stale = datetime.utcnow() - timedelta(seconds=self.lease_seconds)
+        async with self.session_factory() as db:
+            result = await db.execute(
+                update(SocialMediaPost)
+                .where(
+                    SocialMediaPost.publish_status == PUBLISHING,
+                    or_(SocialMediaPost.claimed_at.is_(None), SocialMediaPost.claimed_at < stale)
+                )
+                .values(publish_status=SCHEDULED, claimed_at=None)
+            )
+            await db.commit()
+        if result.rowcount:
+            logger.warning(f"Requeued {result.rowcount} posts whose publish claim expired")
+        loaded = await self.refill()
+        self._tasks = [asyncio.create_task(self._clock())]
+        self._tasks += [asyncio.create_task(self._worker(number)) for number in range(self.workers)]
+        logger.info(f"Publish scheduler started with {loaded} pending jobs and {self.workers} workers")
+
+    async def stop(self):
+        """Stop the clock and the workers; unfinished jobs stay scheduled in the database."""
+        # Posts cut off mid-publish stay 'publishing' and are requeued once their lease lapses
+        tasks = self._tasks + list(self._publishing)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = []
+        self._claimed.clear()
+        logger.info("Publish scheduler stopped")
+
+    async def _pages(self, db, query, *key_columns):
+        """Yield the rows of query in pages, using keyset pagination on key_columns."""
+        last = None
+        while True:
+            page = query
+            if last is not None:
+                first, second = key_columns
+                page = page.where(or_(first > last[0], and_(first == last[0], second > last[1])))
+            rows = (await db.execute(page.order_by(*key_columns).limit(LOAD_BATCH_SIZE))).all()
+            if rows:
+                yield rows
+            if len(rows) < LOAD_BATCH_SIZE:
+                return
+            last = tuple(getattr(rows[-1], column.key) for column in key_columns)
+
+    def _track(self, row, until: datetime) -> bool:
+        """Put a row's job in the wheel, move it, or drop it; returns whether the wheel changed."""
+        if row.publish_status == SCHEDULED and row.scheduled_at is not None and row.scheduled_at <= until:
+            if self.wheel.get(row.id) == row.scheduled_at:
+                return False
+            self.wheel.add(row.id, _epoch(row.scheduled_at), row.scheduled_at)
+            return True
+        return self.wheel.cancel(row.id)
+
+    async def refill(self) -> int:
+        """
+        Load the posts that came within the horizon and apply schedule changes.
+
+        Only posts scheduled between the previous and the new end of the
+        horizon are read, plus the rows updated since the previous refill, so
+        posts scheduled, rescheduled or cancelled by another process are
+        picked up. The cost depends on the horizon's advance and on recent
+        changes, not on how many posts are pending.
+
+        Returns:
+            How many jobs were added, moved or dropped
+        """
+        started = datetime.utcnow()
+        until = started + timedelta(seconds=self.horizon_seconds)
+        columns = (SocialMediaPost.id, SocialMediaPost.scheduled_at, SocialMediaPost.publish_status)
+        window = select(*columns).where(
+            SocialMediaPost.publish_status == SCHEDULED,
+            SocialMediaPost.scheduled_at <= until
+        )
+        if self._loaded_until is not None:
+            window = window.where(SocialMediaPost.scheduled_at > self._loaded_until)
+        loaded = 0
+        async with self.session_factory() as db:
+            async for rows in self._pages(db, window, SocialMediaPost.scheduled_at, SocialMediaPost.id):
+                loaded += sum(self._track(row, until) for row in rows)
+            if self._refilled_at is not None:
+                changed = select(*columns, SocialMediaPost.updated_at).where(
+                    SocialMediaPost.updated_at > self._refilled_at - CHANGE_SLACK
+                )
+                async for rows in self._pages(db, changed, SocialMediaPost.updated_at, SocialMediaPost.id):
+                    loaded += sum(self._track(row, until) for row in rows)
+        self._loaded_until = until
+        self._refilled_at = started
+        metrics.counter("scheduler.loaded").inc(loaded)
+        return loaded
+
+    def schedule(self, post_id: int, scheduled_at: datetime):
+        """Track a post just scheduled (or rescheduled) in the database."""
+        scheduled_at = to_utc(scheduled_at)
+        if self._loaded_until is not None and scheduled_at <= self._loaded_until:
+            self.wheel.add(post_id, _epoch(scheduled_at), scheduled_at)
+        else:
+            # Outside the horizon: the refill picks it up later
+            self.wheel.cancel(post_id)
+
+    def cancel(self, post_id: int):
+        """Forget a post whose schedule was cancelled in the database."""
+        self.wheel.cancel(post_id)
+
+    async def _clock(self):
+        next_refill = time.monotonic() + self.refill_seconds
+        next_renewal = time.monotonic() + self.lease_seconds / 3
+        while True:
+            try:
+                for post_id, _ in self.wheel.advance():
+                    self._queue.put_nowait(post_id)
+                    metrics.counter("scheduler.fired").inc()
+                if time.monotonic() >= next_refill:
+                    await self.refill()
+                    next_refill = time.monotonic() + self.refill_seconds
+                if time.monotonic() >= next_renewal:
+                    await self.renew_leases()
+                    next_renewal = time.monotonic() + self.lease_seconds / 3
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Scheduler tick failed: {str(e)}")
+            metrics.histogram("scheduler.pending").observe(len(self.wheel))
+            await asyncio.sleep(self.tick_seconds - time.time() % self.tick_seconds)
+
+    async def _worker(self, number: int):
+        while True:
+            post_id = await self._queue.get()
+            try:
+                post = await self.claim(post_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Publisher worker {number} failed to claim post {post_id}: {str(e)}")
+                continue
+            if post is not None:
+                # Publishing may wait on a platform's rate limit; other platforms keep going meanwhile
+                task = asyncio.create_task(self._publish_claimed(post))
+                self._publishing.add(task)
+                task.add_done_callback(self._publishing.discard)
+
+    async def renew_leases(self):
+        """Extend the claims of posts this scheduler is still publishing."""
+        if not self._claimed:
+            return
+        async with self.session_factory() as db:
+            await db.execute(
+                update(SocialMediaPost)
+                .where(SocialMediaPost.id.in_(list(self._claimed)), SocialMediaPost.publish_status == PUBLISHING)
+                .values(claimed_at=datetime.utcnow())
+            )
+            await db.commit()
+
+    async def claim(self, post_id: int) -> Optional[Dict[str, Any]]:
+        """
+        Move a due post from 'scheduled' to 'publishing'.
+
+        Returns:
+            The post (id, user_id, platform, content, scheduled_at), or None if it was
+            cancelled, rescheduled to a later time or claimed elsewhere
+        """
+        now = datetime.utcnow()
+        # The wheel may fire up to one tick early; anything later was moved since it was loaded
+        due_by = now + timedelta(seconds=self.tick_seconds)
+        async with self.session_factory() as db:
+            claimed = await db.execute(
+                update(SocialMediaPost)
+                .where(SocialMediaPost.id == post_id, SocialMediaPost.publish_status == SCHEDULED,
+                       SocialMediaPost.scheduled_at <= due_by)
+                .values(publish_status=PUBLISHING, claimed_at=now)
+            )
+            await db.commit()
+            if not claimed.rowcount:
+                return None
+            self._claimed.add(post_id)
+            post = (await db.execute(
+                select(SocialMediaPost.id, SocialMediaPost.user_id, SocialMediaPost.platform,
+                       SocialMediaPost.content, SocialMediaPost.scheduled_at)
+                .where(SocialMediaPost.id == post_id)
+            )).one()
+        return dict(post._mapping)
+
+    async def publish(self, post_id: int) -> bool:
+        """
+        Claim a due post and publish it.
+
+        Returns:
+            True if the post was published
+        """
+        post = await self.claim(post_id)
+        return post is not None and await self._publish_claimed(post)
+
+    async def _publish_claimed(self, post: Dict[str, Any]) -> bool:
+        try:
+            return await self._publish_and_record(post)
+        finally:
+            self._claimed.discard(post["id"])
+
+    async def _publish_and_record(self, post: Dict[str, Any]) -> bool:
+        platform = (post["platform"] or "").lower()
+        if platform not in self._platform_slots:
+            self._platform_slots[platform] = asyncio.Semaphore(self.workers)
+        values = {}
+        start = time.perf_counter()
+        async with self._platform_slots[platform]:
+            publisher = self.publishers.get(platform)
+            try:
+                if publisher is None:
+                    raise LookupError(f"No publisher registered for {post['platform']}")
+                external_id = await publisher(post)
+                values = {"publish_status": PUBLISHED, "is_published": True, "published_at": datetime.utcnow(),
+                          "external_post_id": external_id, "publish_error": None, "claimed_at": None}
+                metrics.counter("scheduler.published").inc()
+                logger.info(f"Published post {post['id']} to {platform}")
+            except Exception as e:
+                # Publishers flag failures after which the post may exist; retrying could post it twice
+                status = RECONCILE if getattr(e, "ambiguous", False) else FAILED
+                values = {"publish_status": status, "publish_error": str(e)[:1000], "claimed_at": None}
+                metrics.counter(f"scheduler.{status}").inc()
+                logger.error(f"Publishing post {post['id']} to {platform} failed ({status}): {str(e)}")
+        metrics.histogram("scheduler.publish_seconds").observe(time.perf_counter() - start)
+        lag = time.time() - _epoch(post["scheduled_at"])
+        metrics.histogram("scheduler.lag_seconds").observe(max(0.0, lag))
+
+        async with self.session_factory() as db:
+            await db.execute(update(SocialMediaPost).where(SocialMediaPost.id == post["id"]).values(**values))
+            await db.commit()
+        return values["publish_status"] == PUBLISHED
+
+publish_scheduler = PublishScheduler(
+    tick_seconds=settings.SCHEDULER_TICK_SECONDS,
+    horizon_seconds=settings.SCHEDULER_HORIZON_SECONDS,
+    refill_seconds=settings.SCHEDULER_REFILL_SECONDS,
+    lease_seconds=settings.SCHEDULER_CLAIM_LEASE_SECONDS,
+    workers=settings.SCHEDULER_WORKERS
+)
@@ -0,0 +1,68 @@
+# app/services/user_service.py
+import asyncio
+import logging
+from typing import Dict, Iterable, List
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..auth import UserCreate
+from ..models.user import User
+from ..passwords import password_hasher
+
+logger = logging.getLogger(__name__)
+
+async def bulk_create_users(db: AsyncSession,
+                            users: Iterable[UserCreate],
+                            batch_size: int = 1000) -> Dict[str, int]:
+    """
+    Provision many users with batched multi-row INSERT statements.
+
+    Passwords for each batch are hashed in parallel on the password worker
+    pool. Rows whose username or email already exists are skipped by the
+    database (INSERT IGNORE / INSERT OR IGNORE) rather than failing the batch.
+
+    Args:
+        db: Async database session
+        users: Validated user records to create
+        batch_size: Rows per INSERT statement
+
+    Returns:
+        Dictionary with "submitted", "created" and "skipped" counts
+    """
+    users = list(users)
+    submitted = len(users)
+    created = 0
+
+    statement = (
+        insert(User.__table__)
+        .prefix_with("IGNORE", dialect="mysql")
+        .prefix_with("OR IGNORE", dialect="sqlite")
+    )
+
+    for start in range(0, submitted, batch_size):
+        batch: List[UserCreate] = users[start:start + batch_size]
+        hashes = await asyncio.gather(*(password_hasher.hash(user.password, wait=True) for user in batch))
+        rows = [
+            {
+                "username": user.username,
+                "email": user.email,
+                "hashed_password": hashed,
+                "is_active": True
+            }
+            for user, hashed in zip(batch, hashes)
+        ]
+        try:
+            result = await db.execute(statement, rows)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Bulk user insert failed at row {start}: {str(e)}")
+            raise
+        # A Core insert returns a CursorResult whose rowcount is the number of
+        # rows actually inserted, excluding ignored duplicates
+        inserted = result.rowcount
+        created += inserted
+        logger.info(f"Provisioned users {start + 1}-{start + len(batch)} of {submitted} ({inserted} created)")
+
+    return {"submitted": submitted, "created": created, "skipped": submitted - created}
@@ -0,0 +1,139 @@
+# app/templating.py
+"""
+Shared template environment and cached rendering of user-independent pages.
+
+Every router renders through the one ``templates`` instance defined here.
+Compiled templates are written to a bytecode cache on disk and
+``precompile()`` loads all of them at startup, so neither a fresh process
+nor the first visitor pays for parsing. Template files are only re-checked
+when TEMPLATE_AUTO_RELOAD is set.
+
+Pages that look the same for every visitor (landing, login, signup, logout
+and error pages) go through ``render_cached``: each distinct page is
+rendered once, kept in a bounded LRU and served with an ETag, and a
+matching If-None-Match on a successful page is answered with
+``304 Not Modified``.
+"""
+import hashlib
+import json
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+import jinja2
+from fastapi import Request
+from fastapi.responses import HTMLResponse, Response
+from fastapi.templating import Jinja2Templates
+
+from .config import settings
+from .metrics import metrics
+
+# Configure module logger
+logger = logging.getLogger(__name__)
+
+TEMPLATES_DIR = "templates"
+
+def _bytecode_cache() -> Optional[jinja2.BytecodeCache]:
+    try:
+        os.makedirs(settings.TEMPLATE_BYTECODE_CACHE_DIR, exist_ok=True)
+        return jinja2.FileSystemBytecodeCache(settings.TEMPLATE_BYTECODE_CACHE_DIR)
+    except OSError as e:
+        logger.warning(f"Template bytecode cache disabled: {str(e)}")
+        return None
+
+templates = Jinja2Templates(env=jinja2.Environment(
+    loader=jinja2.FileSystemLoader(TEMPLATES_DIR),
+    autoescape=jinja2.select_autoescape(),
+    bytecode_cache=_bytecode_cache(),
+    auto_reload=settings.TEMPLATE_AUTO_RELOAD
+))
+
+def precompile() -> int:
+    """
+    Compile every template into the environment's cache.
+
+    Returns:
+        Number of templates compiled
+    """
+    compiled = 0
+    for name in templates.env.list_templates(extensions=["html"]):
+        try:
+            templates.get_template(name)
+            compiled += 1
+        except jinja2.TemplateError as e:
+            logger.error(f"Failed to compile template {name}: {str(e)}")
+    logger.info(f"Precompiled {compiled} templates")
+    return compiled
+
+class PageCache:
+    """LRU cache of rendered pages as (body, ETag)."""
+
+    def __init__(self, max_entries: int = 256):
+        self.max_entries = max_entries
+        self._pages: "OrderedDict[str, Tuple[bytes, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[bytes, str]]:
+        """Return the cached page for a key, or None."""
+        page = self._pages.get(key)
+        if page is None:
+            metrics.counter("templates.page_cache.misses").inc()
+            return None
+        self._pages.move_to_end(key)
+        metrics.counter("templates.page_cache.hits").inc()
+        return page
+
+    def put(self, key: str, body: bytes) -> Tuple[bytes, str]:
+        """Store a rendered body and return it with its ETag."""
+        page = (body, f'"{hashlib.sha256(body).hexdigest()[:32]}"')
+        self._pages[key] = page
+        self._pages.move_to_end(key)
+        while len(self._pages) > self.max_entries:
+            self._pages.popitem(last=False)
+        return page
+
+    def clear(self):
+        """Drop every cached page."""
+        self._pages.clear()
+
+page_cache = PageCache(max_entries=settings.PAGE_CACHE_SIZE)
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # Weak comparison, as If-None-Match requires
+    return "*" in candidates or etag in (candidate.removeprefix("W/") for candidate in candidates)
+
+def render_cached(request: Request,
+                  name: str,
+                  context: Optional[Dict[str, Any]] = None,
+                  status_code: int = 200) -> Response:
+    """
+    Render a page that doesn't depend on the user, reusing an earlier rendering.
+
+    The page is keyed by template, context and base URL (``url_for`` links are
+    absolute), so the context must not hold per-user data.
+
+    Args:
+        request: Incoming request
+        name: Template name
+        context: Template variables besides ``request``
+        status_code: Status of the response
+
+    Returns:
+        The page with an ETag, or 304 when a successful page is already held by the client
+    """
+    context = context or {}
+    key = json.dumps([name, str(request.base_url), context], sort_keys=True, default=str)
+    page = page_cache.get(key)
+    if page is None:
+        body = templates.get_template(name).render({**context, "request": request}).encode("utf-8")
+        page = page_cache.put(key, body)
+    body, etag = page
+
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    # Preconditions only apply to successful responses; error pages are always sent in full
+    if 200 <= status_code < 300 and _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    return HTMLResponse(content=body, status_code=status_code, headers=headers)
@@ -0,0 +1,117 @@
+# benchmarks/publish_benchmark.py
+"""
+Throughput benchmark for the async publisher connectors.
+
+Starts the local platform mock with its per-platform rate limits, an
+artificial response delay and injected failures (half of them after the
+post was created), then publishes the same posts twice per platform:
+once with client-side token buckets matched to the mock's limits and once
+with buckets far above them, relying on 429 and Retry-After alone. Each
+run gets a fresh mock and reports throughput, 429s, posts left for
+reconciliation after an ambiguous failure, and whether any post was
+created twice.
+
+Usage:
+    python benchmarks/publish_benchmark.py --posts 200 --latency-ms 50 --failure-rate 0.05
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+async def run(posts_per_platform, latency_ms, failure_rate, concurrency, matched):
+    """Publish every post through one fresh mock and return per-platform results."""
+    from app.publishing.connectors import CONNECTORS, PublishError, SessionPool
+    from app.publishing.mock_server import DEFAULT_LIMITS, start_mock_server
+
+    runner, base_url = await start_mock_server(latency_ms=latency_ms, failure_rate=failure_rate, seed=7)
+    pool = SessionPool(connection_limit=concurrency)
+    semaphore = asyncio.Semaphore(concurrency)
+    results = {}
+    try:
+        for name, connector_class in CONNECTORS.items():
+            rate, burst = DEFAULT_LIMITS[name]
+            # Matched buckets stay just under the mock's limit; unmatched ones never wait
+            rate_limit = (rate * 0.95, 1, burst) if matched else (rate * 100, 1, 10000)
+            connector = connector_class(pool=pool, base_url=f"{base_url}/{name}", rate_limit=rate_limit,
+                                        max_attempts=8, backoff_base=0.05, backoff_cap=1.0)
+            unconfirmed = []
+            posts = [
+                {"id": number, "platform": name, "content": f"Benchmark post {number} for {name}",
+                 "image_url": "https://example.com/image.png"}
+                for number in range(posts_per_platform)
+            ]
+
+            async def publish(post):
+                async with semaphore:
+                    try:
+                        return await connector.publish(post)
+                    except PublishError as e:
+                        if e.ambiguous:
+                            unconfirmed.append(post["id"])
+                        else:
+                            logger.error(f"{name} post {post['id']} failed: {str(e)}")
+                        return None
+                    except Exception as e:
+                        logger.error(f"{name} post {post['id']} failed: {str(e)}")
+                        return None
+
+            start = time.perf_counter()
+            external_ids = await asyncio.gather(*(publish(post) for post in posts))
+            seconds = time.perf_counter() - start
+            published = [external_id for external_id in external_ids if external_id]
+            stats = runner.app["stats"][name]
+            results[name] = {
+                "published": len(published),
+                "created": stats["created"],
+                "posts_per_second": posts_per_platform / seconds,
+                "rate_limited": stats["rate_limited"],
+                "failed": stats["failed"],
+                "replayed": stats["replayed"],
+                "unconfirmed": len(unconfirmed),
+                "duplicate_ids": len(published) - len(set(published))
+            }
+    finally:
+        await pool.close()
+        await runner.cleanup()
+    return results
+
+def main():
+    """Compare matched client-side rate limiting with 429-driven backoff against the mock."""
+    parser = argparse.ArgumentParser(description="Benchmark the publisher connectors against the local mock")
+    parser.add_argument("--posts", type=int, default=200, help="Posts published per platform")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Mock response delay")
+    parser.add_argument("--failure-rate", type=float, default=0.05, help="Share of requests the mock fails")
+    parser.add_argument("--concurrency", type=int, default=32, help="Publishes in flight at once")
+    args = parser.parse_args()
+
+    sys.path.insert(0, PROJECT_ROOT)
+    success = True
+    for matched in (True, False):
+        label = "matched buckets" if matched else "429 backoff only"
+        results = asyncio.run(run(args.posts, args.latency_ms, args.failure_rate, args.concurrency, matched))
+        logger.info(f"{label}:")
+        for name, result in results.items():
+            logger.info(f"  {name:<10} {result['posts_per_second']:7.1f} posts/s, "
+                        f"{result['published']}/{args.posts} published, {result['created']} created, "
+                        f"{result['rate_limited']} 429s, {result['failed']} injected failures, "
+                        f"{result['unconfirmed']} left for reconciliation")
+            if result["created"] > args.posts or result["duplicate_ids"]:
+                logger.error(f"  {name} created duplicate posts")
+                success = False
+    return success
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
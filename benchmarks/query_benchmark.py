@@ -0,0 +1,167 @@
+# benchmarks/query_benchmark.py
+"""
+Latency benchmark for the post history query language.
+
+Seeds a SQLite database with synthetic posts (one million by default,
+spread over many users), then times representative queries through
+``app.search.query.execute_query`` for one user and compares free-text
+queries with the ``LIKE '%...%'`` scan they replace. The seeded database is
+kept and reused on later runs.
+
+Usage:
+    python benchmarks/query_benchmark.py --rows 1000000 --users 100 --runs 20
+"""
+import argparse
+import asyncio
+import logging
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+DEFAULT_DB = os.path.join(tempfile.gettempdir(), "query_benchmark.db")
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+PLATFORMS = ["linkedin", "twitter", "reddit"]
+VOCABULARY = (
+    "product launch growth team hiring remote engineering design startup funding customer "
+    "feedback roadmap release beta analytics marketing brand community event webinar "
+    "security cloud data model pipeline automation workflow productivity leadership culture "
+    "insight trend strategy partnership milestone announcement update feature platform mobile"
+).split()
+
+# Common words first; a long tail of rarer synthetic words follows a Zipf-like distribution
+WORDS = VOCABULARY + [f"topic{i}" for i in range(5000)]
+WEIGHTS = [1.0 / (rank + 1) for rank in range(len(WORDS))]
+
+QUERIES = [
+    "platform:twitter",
+    "platform:twitter score>=8 after:2025-01-01",
+    "score>=9.5",
+    "product launch",
+    '"product launch" platform:linkedin',
+    "platform:twitter score>=8 after:2025-01-01 \"product launch\"",
+    "webinar milestone -beta",
+    "topic1200 topic3400",
+]
+
+def seed(engine, rows: int, users: int, batch_size: int = 50000):
+    """Insert synthetic users and posts unless the table already has enough rows."""
+    from sqlalchemy import func, insert, select
+    from app.models import SocialMediaPost, User
+
+    with engine.begin() as conn:
+        existing = conn.execute(select(func.count()).select_from(SocialMediaPost.__table__)).scalar()
+    if existing >= rows:
+        logger.info(f"Reusing {existing} seeded posts")
+        return
+
+    rng = random.Random(42)
+    start_date = datetime(2024, 1, 1)
+    started = time.perf_counter()
+    with engine.begin() as conn:
+        conn.execute(insert(User.__table__), [
+            {"id": user_id, "username": f"bench{user_id}", "email": f"bench{user_id}@example.com",
+             "hashed_password": "x", "is_active": True}
+            for user_id in range(1, users + 1)
+        ])
+    for offset in range(0, rows, batch_size):
+        batch = []
+        for i in range(offset, min(rows, offset + batch_size)):
+            batch.append({
+                "user_id": i % users + 1,
+                "platform": rng.choice(PLATFORMS),
+                "content": " ".join(rng.choices(WORDS, WEIGHTS, k=rng.randint(12, 40))),
+                "final_score": round(rng.uniform(4, 10), 1),
+                "is_published": rng.random() < 0.3,
+                "created_at": start_date + timedelta(minutes=i),
+            })
+        with engine.begin() as conn:
+            conn.execute(insert(SocialMediaPost.__table__), batch)
+        logger.info(f"Seeded {min(rows, offset + batch_size)}/{rows} posts")
+    logger.info(f"Seeding took {time.perf_counter() - started:.1f}s")
+
+def median_ms(samples):
+    return statistics.median(samples) * 1000
+
+def p95_ms(samples):
+    ordered = sorted(samples)
+    return ordered[max(0, int(len(ordered) * 0.95) - 1)] * 1000
+
+async def run(args):
+    """Time every query for one user and compare free text with a LIKE scan."""
+    from sqlalchemy import select
+    from app.database import AsyncSessionLocal
+    from app.models import SocialMediaPost
+    from app.search.parser import PostSearchIndex
+    from app.search.query import execute_query, parse_query
+    from app.services.post_service import POST_SUMMARY_COLUMNS
+
+    index = PostSearchIndex(index_dir=tempfile.mkdtemp(prefix="query_benchmark_index_"))
+    async with AsyncSessionLocal() as db:
+        started = time.perf_counter()
+        user_index = await index.sync(db, args.user_id)
+        logger.info(f"Built index for user {args.user_id} ({len(user_index)} posts) in "
+                    f"{time.perf_counter() - started:.2f}s")
+
+        for query in QUERIES:
+            timings = []
+            for _ in range(args.runs):
+                started = time.perf_counter()
+                rows, plan = await execute_query(db, args.user_id, query, POST_SUMMARY_COLUMNS, args.limit, index)
+                timings.append(time.perf_counter() - started)
+            line = (f"{query!r:60} {plan.strategy:10} median {median_ms(timings):8.2f}ms "
+                    f"p95 {p95_ms(timings):8.2f}ms rows {len(rows)}")
+
+            parsed = parse_query(query)
+            if parsed.has_text:
+                # Baseline: substring scans, first page only and all matches (what ranking needs)
+                like = (
+                    select(*POST_SUMMARY_COLUMNS)
+                    .where(SocialMediaPost.user_id == args.user_id, *parsed.clauses(),
+                           *[SocialMediaPost.content.like(f"%{word}%") for word in parsed.terms + parsed.phrases])
+                )
+                for label, statement in (("LIKE page", like.limit(args.limit)), ("LIKE all", like)):
+                    like_timings = []
+                    for _ in range(max(1, args.runs // 4)):
+                        started = time.perf_counter()
+                        (await db.execute(statement)).all()
+                        like_timings.append(time.perf_counter() - started)
+                    line += f" | {label} {median_ms(like_timings):8.2f}ms"
+            logger.info(line)
+
+def main():
+    """Seed the benchmark database and report query latencies."""
+    parser = argparse.ArgumentParser(description="Benchmark the post history query language")
+    parser.add_argument("--db", default=DEFAULT_DB, help="SQLite file to seed and query")
+    parser.add_argument("--rows", type=int, default=1000000, help="Posts to seed")
+    parser.add_argument("--users", type=int, default=100, help="Users the posts are spread over")
+    parser.add_argument("--user-id", type=int, default=1, help="User whose history is queried")
+    parser.add_argument("--runs", type=int, default=20, help="Timed runs per query")
+    parser.add_argument("--limit", type=int, default=20, help="Results per query")
+    args = parser.parse_args()
+
+    # Must be set before app.config is imported
+    os.environ["DB_BACKEND"] = "sqlite"
+    os.environ["SQLITE_PATH"] = args.db
+    sys.path.insert(0, PROJECT_ROOT)
+
+    from app.database import Base, engine
+    import app.models  # noqa: F401  (registers the tables)
+
+    Base.metadata.create_all(bind=engine)
+    seed(engine, args.rows, args.users)
+    asyncio.run(run(args))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+# benchmarks/search_benchmark.py
+"""
+Latency benchmark for the async web-search backend.
+
+Starts the local Tavily stub with an artificial response delay, then
+compares issuing the main query and every subtopic query one after another
+with the backend's parallel fan-out over the pooled session.
+
+Usage:
+    python benchmarks/search_benchmark.py --latency-ms 200 --subtopics 3 --runs 10
+"""
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import sys
+import threading
+import time
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+def start_stub(latency_ms):
+    """Run the stub server on its own loop thread and return its base URL."""
+    from app.search.stub_server import start_stub_server
+
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, daemon=True).start()
+    _, base_url = asyncio.run_coroutine_threadsafe(start_stub_server(latency_ms=latency_ms), loop).result()
+    return base_url
+
+def main():
+    """Compare sequential and parallel subtopic queries against the stub."""
+    parser = argparse.ArgumentParser(description="Benchmark parallel subtopic search")
+    parser.add_argument("--latency-ms", type=float, default=200.0, help="Stub response delay")
+    parser.add_argument("--subtopics", type=int, default=3, help="Subtopic queries per search")
+    parser.add_argument("--runs", type=int, default=10, help="Timed searches per mode")
+    args = parser.parse_args()
+
+    sys.path.insert(0, PROJECT_ROOT)
+    from app.search.backends import TavilyBackend, build_queries, search_loop
+
+    backend = TavilyBackend(api_key="benchmark", base_url=start_stub(args.latency_ms))
+    subtopics = [f"subtopic {i}" for i in range(args.subtopics)]
+
+    async def sequential():
+        session = await search_loop.session()
+        for text in build_queries("ai regulation", "Technology", subtopics, max_subtopics=args.subtopics):
+            await backend.query(session, text, 5)
+
+    sequential_timings, parallel_timings = [], []
+    items = []
+    for _ in range(args.runs):
+        start = time.perf_counter()
+        search_loop.run(sequential())
+        sequential_timings.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        items = backend.search("ai regulation", "Technology", subtopics, 5)["results"]["items"]
+        parallel_timings.append(time.perf_counter() - start)
+
+    logger.info(f"{1 + args.subtopics} queries at {args.latency_ms:.0f}ms stub latency")
+    logger.info(f"Sequential: median {statistics.median(sequential_timings) * 1000:.1f}ms")
+    logger.info(f"Parallel:   median {statistics.median(parallel_timings) * 1000:.1f}ms "
+                f"({len(items)} merged items)")
+    search_loop.close()
+    return True
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,93 @@
+# benchmarks/startup_benchmark.py
+"""
+Cold-start benchmark for the web application.
+
+Imports ``app.main`` in fresh interpreters and reports how long the import
+takes. It fails (non-zero exit) when the median exceeds the budget or when
+any route is registered more than once, so it can guard autoscaled workers
+against startup regressions.
+
+Usage:
+    python benchmarks/startup_benchmark.py --runs 5 --max-seconds 3.0
+"""
+import argparse
+import json
+import logging
+import os
+import statistics
+import subprocess
+import sys
+
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Runs inside the child interpreter: time the import and collect route keys
+PROBE = """
+import json, time
+start = time.perf_counter()
+import app.main
+elapsed = time.perf_counter() - start
+routes = [
+    f"{','.join(sorted(getattr(r, 'methods', None) or []))} {r.path}"
+    for r in app.main.app.routes
+]
+print(json.dumps({"seconds": elapsed, "routes": routes}))
+"""
+
+def measure_once():
+    """Import the application in a fresh interpreter and return the probe result."""
+    completed = subprocess.run(
+        [sys.executable, "-c", PROBE],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True,
+        check=True
+    )
+    # The probe prints its result last; earlier lines are application logs
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def find_duplicate_routes(routes):
+    """Return route keys that were registered more than once."""
+    seen, duplicates = set(), set()
+    for route in routes:
+        if route in seen:
+            duplicates.add(route)
+        seen.add(route)
+    return sorted(duplicates)
+
+def main():
+    """Run the startup benchmark and enforce the time budget."""
+    parser = argparse.ArgumentParser(description="Measure cold-start import time of app.main")
+    parser.add_argument("--runs", type=int, default=5, help="Number of fresh interpreters to start")
+    parser.add_argument("--max-seconds", type=float, default=3.0, help="Budget for the median import time")
+    args = parser.parse_args()
+
+    timings = []
+    duplicates = []
+    for run in range(1, args.runs + 1):
+        result = measure_once()
+        timings.append(result["seconds"])
+        duplicates = find_duplicate_routes(result["routes"])
+        logger.info(f"Run {run}/{args.runs}: import app.main took {result['seconds']:.3f}s")
+
+    median = statistics.median(timings)
+    logger.info(f"Median {median:.3f}s, min {min(timings):.3f}s, max {max(timings):.3f}s")
+
+    ok = True
+    if duplicates:
+        logger.error(f"Routes registered more than once: {', '.join(duplicates)}")
+        ok = False
+    if median > args.max_seconds:
+        logger.error(f"Startup budget exceeded: {median:.3f}s > {args.max_seconds:.3f}s")
+        ok = False
+    return ok
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,324 @@
+# bulk_generate.py
+"""
+Generate posts in bulk from a CSV or JSONL file of prompts.
+
+Each record needs a prompt and platforms (a list, or a comma-separated
+string) and may carry an id; records without one are keyed by line number.
+Rows run through the LLMEngine pipeline in a bounded concurrency pool and
+each result is appended to the output JSONL as soon as it finishes.
+
+The output file is the checkpoint: on restart, rows already written are
+skipped (failed rows too, unless --retry-failed; a retried row is appended
+again, so the last line per id wins). Classification and
+search results are cached on disk by normalized prompt and shared between
+rows, so repeated prompts and resumed runs don't pay for them again. A
+stage that failed and fell back to placeholder output is not cached, and
+its row is recorded as failed so --retry-failed picks it up.
+
+With --batch the pending rows go through the OpenAI Batch API instead, one
+batch per stage (see app/llm/batch.py); the batch directory holds the
+stage checkpoint, so rerunning the same command resumes polling. --local-batch
+runs the same orchestration against an offline stand-in.
+
+Usage:
+    python bulk_generate.py campaign.csv --output posts.jsonl --concurrency 8
+    python bulk_generate.py campaign.jsonl --output posts.jsonl --retry-failed
+    python bulk_generate.py campaign.csv --output posts.jsonl --batch
+"""
+import argparse
+import asyncio
+import csv
+import hashlib
+import json
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S',
+    handlers=[
+        logging.StreamHandler(sys.stdout),
+        logging.FileHandler('bulk_generate.log')
+    ]
+)
+logger = logging.getLogger(__name__)
+
+def read_records(path):
+    """Yield raw records from a .csv or .jsonl file."""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+def load_rows(path, default_platforms):
+    """Validate records, returning (rows, number rejected)."""
+    rows, rejected, seen = [], 0, set()
+    for line_number, record in enumerate(read_records(path), 1):
+        prompt = (record.get("prompt") or "").strip()
+        platforms = record.get("platforms") or default_platforms
+        if isinstance(platforms, str):
+            platforms = [platform.strip().lower() for platform in platforms.replace(";", ",").split(",")]
+        platforms = [platform for platform in platforms if platform]
+        row_id = str(record.get("id") or f"row-{line_number}")
+        if not prompt or not platforms or row_id in seen:
+            rejected += 1
+            logger.warning(f"Skipping record {line_number}: missing prompt/platforms or duplicate id")
+            continue
+        seen.add(row_id)
+        rows.append({"id": row_id, "prompt": prompt, "platforms": platforms})
+    return rows, rejected
+
+def prompt_key(prompt):
+    """Cache key of a prompt: hash of its case- and whitespace-normalized text."""
+    return hashlib.sha1(" ".join(prompt.casefold().split()).encode("utf-8")).hexdigest()
+
+def read_checkpoint(path, retry_failed):
+    """
+    Ids already in the output file, after cutting off a line left partial by a crash.
+
+    Failed rows count as done unless retry_failed is set.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "rb+") as f:
+        data = f.read()
+        end = data.rfind(b"\n") + 1
+        if end < len(data):
+            logger.warning(f"Dropping {len(data) - end} bytes of a partial line at the end of {path}")
+            f.truncate(end)
+    for line in data[:end].decode("utf-8").splitlines():
+        try:
+            record = json.loads(line)
+        except ValueError:
+            continue
+        if record.get("status") == "ok" or not retry_failed:
+            done.add(str(record.get("id")))
+    return done
+
+def is_real_result(value):
+    """False for the placeholder results a stage returns after a failure."""
+    return not (isinstance(value, dict) and value.get("fallback"))
+
+class StageCache:
+    """
+    Disk-backed cache of one pipeline stage's results keyed by prompt.
+
+    Concurrent rows asking for the same key share a single computation.
+    Values the keep predicate rejects (fallbacks after a failure) are handed
+    to those rows but not stored, so a later request computes them again.
+    """
+
+    def __init__(self, path, keep=None):
+        self.path = path
+        self.keep = keep
+        self.values = {}
+        self.hits = self.misses = 0
+        self._inflight = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                        if keep is None or keep(entry["value"]):
+                            self.values[entry["key"]] = entry["value"]
+                    except (ValueError, KeyError):
+                        continue
+        self._file = open(path, "a", encoding="utf-8")
+
+    async def get(self, key, compute):
+        """Return the cached value for key, computing it (once) with the compute coroutine function."""
+        if key in self.values:
+            self.hits += 1
+            return self.values[key]
+        if key in self._inflight:
+            self.hits += 1
+            return await asyncio.shield(self._inflight[key])
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await compute()
+            if self.keep is None or self.keep(value):
+                self.values[key] = value
+                self._file.write(json.dumps({"key": key, "value": value}) + "\n")
+                self._file.flush()
+            future.set_result(value)
+            return value
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # waiters re-raise it; nobody else needs to see it
+            raise
+        finally:
+            self._inflight.pop(key, None)
+
+    def close(self):
+        self._file.close()
+
+async def generate(path, output, concurrency, iterations, candidates, cache_dir, retry_failed, default_platforms):
+    """Run every pending row and stream the results to the output file."""
+    from app.llm.engine import LLMEngine
+    from app.search.backends import search_loop
+    from app.search.fact_store import fact_store
+
+    rows, rejected = load_rows(path, default_platforms)
+    done = read_checkpoint(output, retry_failed)
+    pending = [row for row in rows if row["id"] not in done]
+    logger.info(f"Loaded {len(rows)} rows ({rejected} rejected): {len(rows) - len(pending)} already done, "
+                f"{len(pending)} to generate")
+    if not pending:
+        return True
+
+    os.makedirs(cache_dir, exist_ok=True)
+    classifications = StageCache(os.path.join(cache_dir, "classification.jsonl"), keep=is_real_result)
+    searches = StageCache(os.path.join(cache_dir, "search.jsonl"), keep=is_real_result)
+    engine = LLMEngine(reflexion_iterations=iterations, generation_candidates=candidates)
+    # The pipeline is blocking, so it runs on a pool sized to the concurrency limit
+    executor = ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="bulk")
+    semaphore = asyncio.Semaphore(concurrency)
+    loop = asyncio.get_running_loop()
+    counts = {"ok": 0, "error": 0}
+    started = time.perf_counter()
+
+    def run(function, *args):
+        return loop.run_in_executor(executor, function, *args)
+
+    async def search(prompt, classification):
+        results, _ = await run(engine.search, prompt, classification)
+        return results
+
+    async def process(row):
+        async with semaphore:
+            start = time.perf_counter()
+            key = prompt_key(row["prompt"])
+            record = {"id": row["id"], "prompt": row["prompt"], "platforms": row["platforms"]}
+            try:
+                # A failed stage's placeholder would only produce a placeholder post; stop early
+                classification = await classifications.get(key, lambda: run(engine.classify, row["prompt"]))
+                if not is_real_result(classification):
+                    raise RuntimeError("classification failed")
+                search_results = await searches.get(key, lambda: search(row["prompt"], classification))
+                if not is_real_result(search_results):
+                    raise RuntimeError("search failed")
+                result = await run(
+                    lambda: engine.run_pipeline(row["prompt"], row["platforms"], classification=classification,
+                                                search_results=search_results)
+                )
+                if result.get("fallbacks"):
+                    raise RuntimeError(f"pipeline fell back to placeholder output ({', '.join(result['fallbacks'])})")
+                record.update({
+                    "status": "ok",
+                    "posts": result["posts"],
+                    "final_scores": {
+                        platform: data.get("final_score")
+                        for platform, data in result.get("refinement_data", {}).items()
+                    },
+                    "classification": classification
+                })
+            except Exception as e:
+                logger.error(f"Row {row['id']} failed: {str(e)}")
+                record.update({"status": "error", "error": str(e)})
+            record["seconds"] = round(time.perf_counter() - start, 3)
+            return record
+
+    tasks = [asyncio.create_task(process(row)) for row in pending]
+    try:
+        with open(output, "a", encoding="utf-8") as out:
+            for finished, task in enumerate(asyncio.as_completed(tasks), 1):
+                record = await task
+                out.write(json.dumps(record) + "\n")
+                out.flush()
+                os.fsync(out.fileno())
+                counts[record["status"]] += 1
+                if finished % 50 == 0 or finished == len(tasks):
+                    elapsed = time.perf_counter() - started
+                    logger.info(f"{finished}/{len(tasks)} rows ({finished / elapsed:.2f}/s), "
+                                f"{counts['error']} failed")
+    finally:
+        for task in tasks:
+            task.cancel()
+        executor.shutdown(wait=True, cancel_futures=True)
+        classifications.close()
+        searches.close()
+        fact_store.close()
+        search_loop.close()
+
+    logger.info(f"Bulk generation complete: {counts['ok']} ok, {counts['error']} failed; "
+                f"classification cache {classifications.hits} hits/{classifications.misses} misses, "
+                f"search cache {searches.hits} hits/{searches.misses} misses")
+    return counts["error"] == 0
+
+def generate_batch(path, output, iterations, candidates, batch_dir, local, retry_failed, default_platforms):
+    """Run every pending row as Batch API stages and append the results to the output file."""
+    from app.llm.batch import BatchPipeline, LocalBatchClient, OpenAIBatchClient
+    from app.search.fact_store import fact_store
+
+    rows, rejected = load_rows(path, default_platforms)
+    done = read_checkpoint(output, retry_failed)
+    pending = [row for row in rows if row["id"] not in done]
+    logger.info(f"Loaded {len(rows)} rows ({rejected} rejected): {len(rows) - len(pending)} already done, "
+                f"{len(pending)} to generate")
+
+    client = LocalBatchClient(os.path.join(batch_dir, "local")) if local else OpenAIBatchClient()
+    pipeline = BatchPipeline(client, batch_dir, iterations=iterations, candidates=candidates)
+    if not pending and not pipeline.state:
+        return True
+    started = time.perf_counter()
+    try:
+        records = pipeline.run(pending)
+    finally:
+        fact_store.close()
+    # A resumed run may finish rows a later run already wrote; those are left alone
+    records = [record for record in records if record["id"] not in done]
+    with open(output, "a", encoding="utf-8") as out:
+        for record in records:
+            out.write(json.dumps(record) + "\n")
+        out.flush()
+        os.fsync(out.fileno())
+    pipeline.clear()
+    failed = sum(1 for record in records if record["status"] == "error")
+    logger.info(f"Batch generation complete: {len(records)} rows ({failed} failed) "
+                f"in {time.perf_counter() - started:.1f}s")
+    return failed == 0
+
+def main():
+    """Main function to generate posts in bulk."""
+    parser = argparse.ArgumentParser(description="Generate posts in bulk from CSV or JSONL")
+    parser.add_argument("path", help="Input file (.csv or .jsonl) with prompt, platforms and optional id")
+    parser.add_argument("--output", required=True, help="JSONL results file (also the resume checkpoint)")
+    parser.add_argument("--concurrency", type=int, default=8, help="Rows generated at once")
+    parser.add_argument("--iterations", type=int, default=5, help="Reflexion iterations per post")
+    parser.add_argument("--candidates", type=int, default=None, help="Best-of-n drafts per platform")
+    parser.add_argument("--platforms", default="linkedin,twitter", help="Platforms for rows that don't name any")
+    parser.add_argument("--cache-dir", default="data/bulk_cache", help="Shared classification/search cache")
+    parser.add_argument("--retry-failed", action="store_true", help="Re-run rows that failed in a previous run")
+    parser.add_argument("--batch", action="store_true", help="Run the stages through the OpenAI Batch API")
+    parser.add_argument("--local-batch", action="store_true", help="Run the batch stages against an offline stand-in")
+    parser.add_argument("--batch-dir", default="data/bulk_batch", help="Batch files and stage checkpoint")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+    default_platforms = [platform.strip() for platform in args.platforms.split(",") if platform.strip()]
+    try:
+        if args.batch or args.local_batch:
+            return generate_batch(args.path, args.output, args.iterations, args.candidates, args.batch_dir,
+                                  args.local_batch, args.retry_failed, default_platforms)
+        return asyncio.run(generate(args.path, args.output, args.concurrency, args.iterations, args.candidates,
+                                    args.cache_dir, args.retry_failed, default_platforms))
+    except Exception as e:
+        logger.error(f"Unexpected error during bulk generation: {str(e)}", exc_info=True)
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
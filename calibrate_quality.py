@@ -0,0 +1,148 @@
+# calibrate_quality.py
+"""
+Calibrate the local quality scorer against historical critic scores.
+
+Every critic-scored iteration stored in social_media_posts.critic_scores is
+paired with the post it scored. The script reports how well the current
+local model agrees with the critic and what the quality gate would have
+skipped, fits new weights by least squares on a training split, reports the
+fitted model on the held-out split and, with --save, writes it to
+QUALITY_MODEL_PATH.
+
+Usage:
+    python calibrate_quality.py
+    python calibrate_quality.py --platform twitter --save
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from collections import defaultdict
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S',
+    handlers=[
+        logging.StreamHandler(sys.stdout),
+        logging.FileHandler('calibrate_quality.log')
+    ]
+)
+logger = logging.getLogger(__name__)
+
+async def load_samples(platform, batch_size):
+    """Return {(platform, prompt, search_context): [(post, critic score), ...]} from stored histories."""
+    from sqlalchemy import select
+    from app.database import AsyncSessionLocal, async_engine
+    from app.models import SocialMediaPost
+
+    groups = defaultdict(list)
+    last_id = 0
+    try:
+        async with AsyncSessionLocal() as db:
+            while True:
+                query = (
+                    select(SocialMediaPost.id, SocialMediaPost.platform, SocialMediaPost.prompt,
+                           SocialMediaPost.search_context, SocialMediaPost.critic_scores)
+                    .where(SocialMediaPost.id > last_id, SocialMediaPost.critic_scores.is_not(None))
+                    .order_by(SocialMediaPost.id)
+                    .limit(batch_size)
+                )
+                if platform:
+                    query = query.where(SocialMediaPost.platform == platform)
+                rows = (await db.execute(query)).all()
+                for row in rows:
+                    try:
+                        history = json.loads(row.critic_scores)
+                    except ValueError:
+                        continue
+                    for item in history if isinstance(history, list) else []:
+                        if item.get("scored_by", "critic") != "critic" or not item.get("post"):
+                            continue
+                        if isinstance(item.get("score"), (int, float)):
+                            key = (row.platform, row.prompt or "", row.search_context or "")
+                            groups[key].append((item["post"], float(item["score"])))
+                if len(rows) < batch_size:
+                    break
+                last_id = rows[-1].id
+    finally:
+        await async_engine.dispose()
+    return groups
+
+def build_matrix(groups):
+    """Feature matrix and critic scores, extracting features one batch per stored post."""
+    import numpy as np
+    from app.llm.quality import FEATURES, extract_features
+
+    blocks, scores = [], []
+    for (platform, prompt, search_context), samples in groups.items():
+        blocks.append(extract_features([post for post, _ in samples], platform, search_context, prompt))
+        scores.extend(score for _, score in samples)
+    if not blocks:
+        return np.zeros((0, len(FEATURES))), np.zeros(0)
+    return np.vstack(blocks), np.array(scores)
+
+def log_report(label, report):
+    logger.info(f"{label}: n={report['samples']} MAE={report['mae']:.2f} r={report['pearson_r']:.2f} "
+                f"skip={report['skip_rate']:.0%} false-skip={report['false_skip_rate']:.0%}")
+
+def calibrate(platform, holdout, ridge, save, batch_size, min_samples):
+    """Compare local and critic scores, fit a model and optionally save it."""
+    import numpy as np
+    from app.config import settings
+    from app.llm.quality import FEATURES, QualityModel, compare_scores, fit_model
+
+    groups = asyncio.run(load_samples(platform, batch_size))
+    features, scores = build_matrix(groups)
+    if len(scores) < min_samples:
+        logger.error(f"Only {len(scores)} critic scores found; at least {min_samples} are needed")
+        return False
+
+    threshold = settings.QUALITY_GATE_THRESHOLD
+    current = QualityModel.load(settings.QUALITY_MODEL_PATH)
+    current_margin = current.margin if current.margin is not None else settings.QUALITY_GATE_MARGIN
+    log_report("Current model", compare_scores(current.predict(features), scores, threshold, current_margin))
+
+    order = np.random.default_rng(0).permutation(len(scores))
+    split = max(1, int(len(scores) * (1 - holdout)))
+    train, test = order[:split], order[split:]
+    model = fit_model(features[train], scores[train], ridge=ridge)
+    if len(test):
+        log_report("Fitted model (held out)", compare_scores(model.predict(features[test]), scores[test], threshold, model.margin))
+
+    # Refit on everything before saving
+    model = fit_model(features, scores, ridge=ridge)
+    log_report("Fitted model (all)", compare_scores(model.predict(features), scores, threshold, model.margin))
+    for name, weight in zip(FEATURES, model.weights):
+        logger.info(f"  {name:16s} {weight:+.3f}")
+    logger.info(f"  {'bias':16s} {model.bias:+.3f}  margin {model.margin:.2f}")
+
+    if save:
+        model.save(settings.QUALITY_MODEL_PATH)
+        logger.info(f"Saved quality model to {settings.QUALITY_MODEL_PATH}")
+    return True
+
+def main():
+    """Main function to calibrate the local quality scorer."""
+    parser = argparse.ArgumentParser(description="Calibrate the local quality scorer against critic scores")
+    parser.add_argument("--platform", help="Only use posts for this platform")
+    parser.add_argument("--holdout", type=float, default=0.2, help="Fraction of scores held out for evaluation")
+    parser.add_argument("--ridge", type=float, default=1.0, help="L2 penalty on the weights")
+    parser.add_argument("--min-samples", type=int, default=30, help="Critic scores required to fit")
+    parser.add_argument("--batch-size", type=int, default=2000, help="Posts fetched per query")
+    parser.add_argument("--save", action="store_true", help="Write the fitted model to QUALITY_MODEL_PATH")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+    try:
+        return calibrate(args.platform, args.holdout, args.ridge, args.save, args.batch_size, args.min_samples)
+    except Exception as e:
+        logger.error(f"Unexpected error during calibration: {str(e)}", exc_info=True)
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
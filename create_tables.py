@@ -30,8 +30,9 @@ def setup_path():
 def import_models():
     """Import database models and engine."""
     try:
-        # First try to import from the app module
-        from app.database import Base, engine, User
+        # Importing the models package registers every table with Base.metadata
+        from app.database import Base, engine
+        import app.models  # noqa: F401
         logger.info("Successfully imported database models")
         return Base, engine
     except ImportError as ie:
@@ -78,13 +79,19 @@ def main():
             return False
             
         # Create tables
-        if create_tables(Base, engine):
-            logger.info("Table creation complete!")
-            logger.info("Now you can run 'python -m app.main' to start the application")
-            return True
-        else:
+        if not create_tables(Base, engine):
             logger.error("Table creation failed")
             return False
+        logger.info("Table creation complete!")
+
+        # Bring existing tables up to date
+        from app.migrations import run_migrations
+        if not run_migrations(engine):
+            logger.error("Schema migration failed")
+            return False
+
+        logger.info("Now you can run 'python -m app.main' to start the application")
+        return True
             
     except Exception as e:
         logger.error(f"Unexpected error during table creation: {str(e)}", exc_info=True)
@@ -0,0 +1,65 @@
+# deactivate_users.py
+"""
+Deactivate user accounts by username.
+
+Deactivated users can no longer log in. Tokens they already hold are
+rejected once every worker's cached principal has expired, which takes at
+most PRINCIPAL_CACHE_TTL_SECONDS.
+
+Usage:
+    python deactivate_users.py alice bob
+"""
+import argparse
+import asyncio
+import logging
+import os
+import sys
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S',
+    handlers=[
+        logging.StreamHandler(sys.stdout),
+        logging.FileHandler('deactivate_users.log')
+    ]
+)
+logger = logging.getLogger(__name__)
+
+async def deactivate(usernames):
+    """Deactivate each named user; returns False if any was not found."""
+    from app.auth import deactivate_user
+    from app.database import AsyncSessionLocal, async_engine
+    from app.models.user import User
+
+    found_all = True
+    try:
+        async with AsyncSessionLocal() as db:
+            for username in usernames:
+                user = await User.get_by_username_async(db, username)
+                if user is None:
+                    logger.warning(f"User '{username}' not found")
+                    found_all = False
+                    continue
+                await deactivate_user(db, user.id)
+    finally:
+        await async_engine.dispose()
+    return found_all
+
+def main():
+    """Main function to deactivate users."""
+    parser = argparse.ArgumentParser(description="Deactivate user accounts")
+    parser.add_argument("usernames", nargs="+", help="Usernames to deactivate")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+    try:
+        return asyncio.run(deactivate(args.usernames))
+    except Exception as e:
+        logger.error(f"Unexpected error during deactivation: {str(e)}", exc_info=True)
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
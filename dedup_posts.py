@@ -0,0 +1,128 @@
+# dedup_posts.py
+"""
+Find (and optionally delete) near-duplicate posts in users' history.
+
+Posts are compared per user and platform with MinHash/LSH over word
+shingles of their content. Each group of near-duplicates is written as one
+JSONL line naming the post to keep (highest final score, then newest) and
+the duplicates.
+
+Usage:
+    python dedup_posts.py --output duplicates.jsonl
+    python dedup_posts.py --user-id 42 --threshold 0.85 --delete
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+from collections import defaultdict
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S',
+    handlers=[
+        logging.StreamHandler(sys.stdout),
+        logging.FileHandler('dedup_posts.log')
+    ]
+)
+logger = logging.getLogger(__name__)
+
+def choose_keeper(posts):
+    """The post to keep from a duplicate group: best score, then newest."""
+    return max(posts, key=lambda post: (post.final_score or 0, post.created_at or 0, post.id))
+
+async def dedup_user(db, user_id, threshold, batch_size):
+    """Return the duplicate groups of one user's posts."""
+    from sqlalchemy import select
+    from app.models import SocialMediaPost
+    from app.search.dedup import find_content_duplicates
+
+    posts_by_platform = defaultdict(list)
+    last_id = 0
+    while True:
+        rows = (await db.execute(
+            select(SocialMediaPost.id, SocialMediaPost.platform, SocialMediaPost.content,
+                   SocialMediaPost.final_score, SocialMediaPost.created_at)
+            .where(SocialMediaPost.user_id == user_id, SocialMediaPost.id > last_id)
+            .order_by(SocialMediaPost.id)
+            .limit(batch_size)
+        )).all()
+        for row in rows:
+            posts_by_platform[row.platform].append(row)
+        if len(rows) < batch_size:
+            break
+        last_id = rows[-1].id
+
+    groups = []
+    for platform, posts in posts_by_platform.items():
+        by_id = {post.id: post for post in posts}
+        for group in find_content_duplicates(((post.id, post.content or "") for post in posts), threshold=threshold):
+            keeper = choose_keeper([by_id[post_id] for post_id in group])
+            groups.append({
+                "user_id": user_id,
+                "platform": platform,
+                "keep": keeper.id,
+                "duplicates": [post_id for post_id in group if post_id != keeper.id]
+            })
+    return groups
+
+async def dedup(user_id, threshold, output, delete, batch_size):
+    """Scan users' posts for near-duplicates, report them and optionally delete them."""
+    from sqlalchemy import delete as delete_rows, select
+    from app.database import AsyncSessionLocal, async_engine
+    from app.models import SocialMediaPost
+
+    total_groups = total_duplicates = 0
+    out = open(output, "w", encoding="utf-8") if output else sys.stdout
+    try:
+        async with AsyncSessionLocal() as db:
+            if user_id is not None:
+                user_ids = [user_id]
+            else:
+                user_ids = list((await db.execute(
+                    select(SocialMediaPost.user_id).distinct().order_by(SocialMediaPost.user_id)
+                )).scalars())
+            for current_user_id in user_ids:
+                groups = await dedup_user(db, current_user_id, threshold, batch_size)
+                for group in groups:
+                    out.write(json.dumps(group) + "\n")
+                duplicate_ids = [post_id for group in groups for post_id in group["duplicates"]]
+                if delete and duplicate_ids:
+                    await db.execute(delete_rows(SocialMediaPost).where(SocialMediaPost.id.in_(duplicate_ids)))
+                    await db.commit()
+                total_groups += len(groups)
+                total_duplicates += len(duplicate_ids)
+                if groups:
+                    logger.info(f"User {current_user_id}: {len(groups)} groups, {len(duplicate_ids)} duplicates")
+    finally:
+        if output:
+            out.close()
+        await async_engine.dispose()
+    action = "deleted" if delete else "found"
+    logger.info(f"Dedup complete: {total_duplicates} duplicates {action} in {total_groups} groups")
+    return True
+
+def main():
+    """Main function to deduplicate post history."""
+    parser = argparse.ArgumentParser(description="Find near-duplicate posts in users' history")
+    parser.add_argument("--user-id", type=int, help="Only scan this user's posts")
+    parser.add_argument("--threshold", type=float, default=0.8, help="Estimated Jaccard similarity of contents")
+    parser.add_argument("--output", help="JSONL report path (stdout when omitted)")
+    parser.add_argument("--delete", action="store_true", help="Delete the duplicates, keeping one post per group")
+    parser.add_argument("--batch-size", type=int, default=5000, help="Posts fetched per query")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+    try:
+        return asyncio.run(dedup(args.user_id, args.threshold, args.output, args.delete, args.batch_size))
+    except Exception as e:
+        logger.error(f"Unexpected error during dedup: {str(e)}", exc_info=True)
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)
@@ -0,0 +1,96 @@
+# provision_users.py
+"""
+Bulk-provision user accounts from a CSV or JSONL file.
+
+Each record needs username, email and password fields. Records are
+validated with the same rules as the signup API, then inserted in batches.
+
+Usage:
+    python provision_users.py users.csv --batch-size 1000
+"""
+import argparse
+import asyncio
+import csv
+import json
+import logging
+import os
+import sys
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S',
+    handlers=[
+        logging.StreamHandler(sys.stdout),
+        logging.FileHandler('provision_users.log')
+    ]
+)
+logger = logging.getLogger(__name__)
+
+def read_records(path):
+    """Yield raw user records from a .csv or .jsonl file."""
+    if path.lower().endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            yield from csv.DictReader(f)
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    yield json.loads(line)
+
+def load_users(path):
+    """Validate records, returning the valid users and the number rejected."""
+    from app.auth import UserCreate
+
+    users, rejected = [], 0
+    for line_number, record in enumerate(read_records(path), 1):
+        try:
+            users.append(UserCreate(
+                username=record["username"],
+                email=record["email"],
+                password=record["password"]
+            ))
+        except Exception as e:
+            rejected += 1
+            logger.warning(f"Skipping record {line_number}: {str(e)}")
+    return users, rejected
+
+async def provision(path, batch_size):
+    """Insert all valid users from the file."""
+    from app.database import AsyncSessionLocal, async_engine
+    from app.passwords import password_hasher
+    from app.services.user_service import bulk_create_users
+
+    users, rejected = load_users(path)
+    logger.info(f"Loaded {len(users)} valid user records ({rejected} rejected)")
+    try:
+        async with AsyncSessionLocal() as db:
+            result = await bulk_create_users(db, users, batch_size=batch_size)
+    finally:
+        password_hasher.shutdown()
+        await async_engine.dispose()
+    logger.info(
+        f"Provisioning complete: {result['created']} created, "
+        f"{result['skipped']} skipped as duplicates, {rejected} rejected"
+    )
+    return True
+
+def main():
+    """Main function to provision users."""
+    parser = argparse.ArgumentParser(description="Bulk-provision users from CSV or JSONL")
+    parser.add_argument("path", help="Input file (.csv or .jsonl) with username, email, password")
+    parser.add_argument("--batch-size", type=int, default=1000, help="Rows per INSERT statement")
+    args = parser.parse_args()
+
+    sys.path.insert(0, os.path.abspath(os.path.dirname(__file__)))
+    try:
+        return asyncio.run(provision(args.path, args.batch_size))
+    except Exception as e:
+        logger.error(f"Unexpected error during provisioning: {str(e)}", exc_info=True)
+        return False
+
+if __name__ == "__main__":
+    success = main()
+    sys.exit(0 if success else 1)